@@ -1,25 +1,35 @@
 import streamlit as st
-from streamlit_autorefresh import st_autorefresh
 import pandas as pd
 import matplotlib.pyplot as plt
-import requests
 from datetime import datetime
 import pytz
 import os
+import io
+from nse_payload import is_new_payload
+from nse_client import option_chain, index_quote, index_constituents, equity_quote, sensex_quote, derived, freshness, quote_info
+from constituents import CONSTITUENT_INDICES
+from history_store import OI_HISTORY_FILE, OI_COLUMNS, append_row, read_history
+from history_mmap import append as mmap_append, query_day, to_frame
+from market_calendar import is_capture_window
+from pubsub import chain_updates, rerun_on_publish
+from option_metrics import PREMIUM_FIELDS, STRIKE_WINDOWS, atm_oi_table, strike_premiums
+from history_schema import compact, append_compact, clock, timestamps, frame_bytes
+from downsample import chart_frame, zoom_controls
+from profiling import profile_rerun
 
 # ---------------- TIMEZONE ----------------
 IST = pytz.timezone("Asia/Kolkata")
 
 # ---------------- STREAMLIT CONFIG ----------------
 st.set_page_config(page_title="Combined Market Dashboard", layout="wide")
-st_autorefresh(interval=180000, key="autorefresh")  # Refresh every 3 minutes
+profiled = profile_rerun("DigiDashboard")  # ?profile=rerun / DASH_PROFILE; no-op otherwise
 
-# ---------------- NSE SESSION ----------------
-session = requests.Session()
-session.headers.update({
-    "User-Agent": "Mozilla/5.0",
-    "Accept": "application/json",
-})
+# Each live section below is an st.fragment that reruns on its own on every
+# new option-chain snapshot (idle when closed); the page around it stays as drawn.
+# Sidebar widgets are read outside the fragments and passed in.
+
+# ---------------- NSE ACCESS ----------------
+# Shared process-wide client (nse_client): cached and coalesced across viewers
 
 # ---------------- STOCKS ----------------
 STOCKS = {
@@ -34,8 +44,13 @@ STOCKS = {
 
 def get_stock_details(symbol):
     try:
-        url = f"https://www.nseindia.com/api/quote-equity?symbol={symbol}"
-        res = session.get(url, timeout=5).json()
+        members = index_constituents("NIFTY 50")  # one bulk request for every watchlist name
+        if symbol in members:
+            return members.quote(symbol)
+    except:
+        pass
+    try:
+        res = equity_quote(symbol)
         last = res["priceInfo"].get("lastPrice")
         openp = res["priceInfo"].get("open")
         pct = ((last - openp)/openp*100) if last and openp else None
@@ -43,47 +58,93 @@ def get_stock_details(symbol):
     except:
         return None, None
 
+def stock_freshness(symbol):
+    members = quote_info("nse_constituents", "NIFTY 50")
+    if members is not None and symbol in members.value:
+        return freshness("nse_constituents", "NIFTY 50")
+    return freshness("nse_equity", symbol)
+
 def get_index_details(index_name):
     try:
-        r = session.get("https://www.nseindia.com/api/allIndices", timeout=5).json()
-        for idx in r["data"]:
-            if idx["index"] == index_name:
-                last = idx.get("last")
-                openp = idx.get("open")
-                pct = ((last - openp)/openp*100) if last and openp else None
-                return last, pct
+        idx = index_quote(index_name)
+        if idx is not None:
+            last = idx.get("last")
+            openp = idx.get("open")
+            pct = ((last - openp)/openp*100) if last and openp else None
+            return last, pct
     except:
         return None, None
 
 def get_sensex_details():
     try:
-        r = requests.get("https://api.bseindia.com/BseIndiaAPI/api/MktStat1/w", timeout=5).json()
-        last = r["Sensex"].get("Curvalue")
-        openp = r["Sensex"].get("Openvalue")
+        r = sensex_quote()
+        last = r.get("Curvalue")
+        openp = r.get("Openvalue")
         pct = ((last - openp)/openp*100) if last and openp else None
         return last, pct
     except:
         return None, None
 
+# ---------------- CONSTITUENTS (ONE REQUEST PER INDEX) ----------------
+def render_constituents(index):
+    try:
+        members = index_constituents(index)
+    except:
+        st.warning(f"Could not fetch {index} constituents.")
+        return
+    cols = st.columns(10)
+    for i, symbol in enumerate(members.symbols):
+        last, pct = members.quote(symbol)
+        cols[i%10].metric(symbol, f"₹{last:,.1f}" if last else "N/A", f"{pct:+.2f}%" if pct is not None else "N/A")
+    st.caption(f"{index} constituents {freshness('nse_constituents', index)}")
+
+    breadth = members.breadth()
+    cols = st.columns(4)
+    cols[0].metric("Advances", breadth["advances"])
+    cols[1].metric("Declines", breadth["declines"])
+    cols[2].metric("Unchanged", breadth["unchanged"])
+    cols[3].metric("A/D Ratio", breadth["ad_ratio"] if breadth["ad_ratio"] is not None else "—")
+
+    gainers, losers = members.movers(5)
+    cols = st.columns(2)
+    cols[0].write(f"🟢 Top Gainers ({index})")
+    cols[0].dataframe(gainers[["symbol", "last", "pct_change", "value_cr"]], hide_index=True, use_container_width=True)
+    cols[1].write(f"🔴 Top Losers ({index})")
+    cols[1].dataframe(losers[["symbol", "last", "pct_change", "value_cr"]], hide_index=True, use_container_width=True)
+
 # ---------------- TOP BANNER ----------------
 st.title("📊 Combined Market Dashboard")
-st.subheader("📌 Live Stock & Index Prices (Auto-refresh every 3 minutes)")
+st.subheader("📌 Live Stock & Index Prices (Updates on each new exchange snapshot)")
+
+banner = st.sidebar.radio("Banner", ["Watchlist"] + list(CONSTITUENT_INDICES))
+
+@st.fragment
+def live_prices(banner):
+    rerun_on_publish(chain_updates("NIFTY"))
+    if banner == "Watchlist":
+        cols = st.columns(4)
+        i = 0
+        for name, symbol in STOCKS.items():
+            last, pct = get_stock_details(symbol)
+            cols[i].metric(name, f"₹{last}" if last else "N/A", f"{pct:+.2f}%" if pct else "N/A")
+            cols[i].caption(stock_freshness(symbol))
+            i = (i+1)%4
+    else:
+        render_constituents(banner)
 
-cols = st.columns(4)
-i = 0
-for name, symbol in STOCKS.items():
-    last, pct = get_stock_details(symbol)
-    cols[i].metric(name, f"₹{last}" if last else "N/A", f"{pct:+.2f}%" if pct else "N/A")
-    i = (i+1)%4
+    nifty, pct_nifty = get_index_details("NIFTY 50")
+    banknifty, pct_bank = get_index_details("NIFTY BANK")
+    sensex, pct_sensex = get_sensex_details()
 
-nifty, pct_nifty = get_index_details("NIFTY 50")
-banknifty, pct_bank = get_index_details("NIFTY BANK")
-sensex, pct_sensex = get_sensex_details()
+    cols = st.columns(3)
+    cols[0].metric("NIFTY 50", f"₹{nifty}" if nifty else "N/A", f"{pct_nifty:+.2f}%" if pct_nifty else "N/A")
+    cols[1].metric("BANKNIFTY", f"₹{banknifty}" if banknifty else "N/A", f"{pct_bank:+.2f}%" if pct_bank else "N/A")
+    cols[2].metric("SENSEX", f"{sensex}" if sensex else "N/A", f"{pct_sensex:+.2f}%" if pct_sensex else "N/A")
+    cols[0].caption(freshness("nse_index", "allIndices"))  # quote cache age (stale-while-revalidate)
+    cols[1].caption(freshness("nse_index", "allIndices"))
+    cols[2].caption(freshness("bse", "SENSEX"))
 
-cols = st.columns(3)
-cols[0].metric("NIFTY 50", f"₹{nifty}" if nifty else "N/A", f"{pct_nifty:+.2f}%" if pct_nifty else "N/A")
-cols[1].metric("BANKNIFTY", f"₹{banknifty}" if banknifty else "N/A", f"{pct_bank:+.2f}%" if pct_bank else "N/A")
-cols[2].metric("SENSEX", f"{sensex}" if sensex else "N/A", f"{pct_sensex:+.2f}%" if pct_sensex else "N/A")
+live_prices(banner)
 
 st.markdown("---")
 
@@ -99,79 +160,90 @@ CSV_FILE_ATM = os.path.join(DATA_DIR, f"atm_compare_{today}.csv")
 
 def get_atm_prices():
     try:
-        url = "https://www.nseindia.com/api/option-chain-indices?symbol=NIFTY"
-        data = session.get(url, timeout=5).json()
+        decoded = option_chain("NIFTY").chain(fields=PREMIUM_FIELDS)  # nearest expiry, arrays only
 
-        underlying = data["records"]["underlyingValue"]
-        expiry = data["records"]["expiryDates"][0]
+        underlying = decoded["underlyingValue"]
         atm_strike = int(round(underlying / 50) * 50)
 
-        for r in data["records"]["data"]:
-            if r.get("strikePrice") == atm_strike and r.get("expiryDate") == expiry:
-                return underlying, r["CE"]["lastPrice"], r["PE"]["lastPrice"]
-
-        return None, None, None
+        ce, pe = strike_premiums(decoded, atm_strike)
+        if ce is None or pe is None:
+            return None, None, None
+        return underlying, ce, pe
     except:
         return None, None, None
 
 def update_atm_history():
     now = datetime.now(IST)
 
-    if os.path.exists(CSV_FILE_ATM):
-        df_existing = pd.read_csv(CSV_FILE_ATM, parse_dates=["time"])
-    else:
-        df_existing = pd.DataFrame()
+    arr = query_day("atm", today)  # memory-mapped, no text parsing
+    # Compact frame: int64 epoch "ts" + float32 prices
+    df_existing = compact(to_frame(arr) if len(arr) else read_history(CSV_FILE_ATM))
 
-    market_open = (now.hour >= 9 and (now.hour < 16))
+    market_open = is_capture_window(now)
 
     if market_open:
         underlying, ce, pe = get_atm_prices()
         if underlying is None:
             return df_existing
 
+    # One row per new exchange snapshot, however many viewers rerun
+    # (option_chain is served from cache once get_atm_prices succeeded)
+    payload = option_chain("NIFTY") if market_open else None
+    if market_open and is_new_payload("DigiDashboard.atm_history", payload):
+        stamp = payload.exchange_time(IST) or now  # the snapshot's own time, not when we polled
+
         entry = {
-            "time": now,
+            "time": stamp,
             "NIFTY": underlying,
             "CE": ce,
             "PE": pe
         }
 
-        if not df_existing.empty:
-            df = pd.concat([df_existing, pd.DataFrame([entry])], ignore_index=True)
-        else:
-            df = pd.DataFrame([entry])
+        # Locked single-row append instead of rewriting the whole file
+        if not append_row(CSV_FILE_ATM, entry, list(entry), key=("time",)):
+            return df_existing
+        mmap_append("atm", entry, stamp)
 
-        df.to_csv(CSV_FILE_ATM, index=False)
-        return df
+        return append_compact(df_existing, entry)
 
     return df_existing
 
-df_atm = update_atm_history()
+chart_minutes, chart_points = zoom_controls("atm")
+
+@st.fragment
+def atm_section(chart_minutes, chart_points):
+    rerun_on_publish(chain_updates("NIFTY"))
+    df_atm = update_atm_history()
+    history_bytes = frame_bytes(df_atm)
+
+    if df_atm.empty:
+        st.error("No ATM data available for today.")
+    else:
+        df_norm = df_atm.copy()
 
-if df_atm.empty:
-    st.error("No ATM data available for today.")
-else:
-    df_norm = df_atm.copy()
+        base_n = df_norm["NIFTY"].iloc[0]
+        base_ce = df_norm["CE"].iloc[0]
+        base_pe = df_norm["PE"].iloc[0]
 
-    base_n = df_norm["NIFTY"].iloc[0]
-    base_ce = df_norm["CE"].iloc[0]
-    base_pe = df_norm["PE"].iloc[0]
+        df_norm["NIFTY_norm"] = (df_norm["NIFTY"] - base_n).abs()
+        df_norm["CE_norm"] = (df_norm["CE"] - base_ce).abs()
+        df_norm["PE_norm"] = (df_norm["PE"] - base_pe).abs()
 
-    df_norm["NIFTY_norm"] = (df_norm["NIFTY"] - base_n).abs()
-    df_norm["CE_norm"] = (df_norm["CE"] - base_ce).abs()
-    df_norm["PE_norm"] = (df_norm["PE"] - base_pe).abs()
+        st.subheader("📉 Normalized Movement from 9:15 AM (Positive Movement Only)")
 
-    st.subheader("📉 Normalized Movement from 9:15 AM (Positive Movement Only)")
+        chart = chart_frame("Digi.atm", df_norm, ["NIFTY_norm", "CE_norm", "PE_norm"], df_norm["ts"], chart_points, chart_minutes)
+        st.line_chart(
+            chart.set_index(timestamps(chart))[["NIFTY_norm", "CE_norm", "PE_norm"]]
+        )
 
-    st.line_chart(
-        df_norm.set_index("time")[["NIFTY_norm", "CE_norm", "PE_norm"]]
-    )
+        latest = df_norm.iloc[-1]
+        col = st.columns(3)
+        col[0].metric("NIFTY Movement", f"{latest['NIFTY_norm']:.2f}")
+        col[1].metric("ATM CE Movement", f"{latest['CE_norm']:.2f}")
+        col[2].metric("ATM PE Movement", f"{latest['PE_norm']:.2f}")
+    return history_bytes
 
-    latest = df_norm.iloc[-1]
-    col = st.columns(3)
-    col[0].metric("NIFTY Movement", f"{latest['NIFTY_norm']:.2f}")
-    col[1].metric("ATM CE Movement", f"{latest['CE_norm']:.2f}")
-    col[2].metric("ATM PE Movement", f"{latest['PE_norm']:.2f}")
+history_bytes = atm_section(chart_minutes, chart_points)
 
 st.markdown("---")
 
@@ -179,80 +251,95 @@ st.markdown("---")
 #                     UPDATED OI TRACKER (WITH FIX)
 # ====================================================================
 st.header("📊 ATM 5 Strike OI Tracker")
-OI_FILE = "oi_history_change.csv"
+OI_FILE = OI_HISTORY_FILE  # shared with the other OI dashboards (locked appends)
 
 def load_oi_history():
-    if os.path.exists(OI_FILE):
-        df = pd.read_csv(OI_FILE)
-        if df.empty or df["date"].iloc[-1] != str(today):
-            return pd.DataFrame(columns=["date", "time", "CE_change", "PE_change", "CE_OI_total", "PE_OI_total"])
-        return df
-    return pd.DataFrame(columns=[])
-
-oi_history = load_oi_history()
+    arr = query_day("oi", today)  # memory-mapped, no text parsing
+    if len(arr):
+        return compact(to_frame(arr))
+    return compact(read_history(OI_FILE, columns=OI_COLUMNS, day=today))
 
 def fetch_oi():
     try:
-        return session.get("https://www.nseindia.com/api/option-chain-indices?symbol=NIFTY", timeout=5).json()
+        return option_chain("NIFTY")
     except:
         return None
 
-data_oi = fetch_oi()
-if data_oi:
-    records = data_oi["records"]["data"]
-    expiry = data_oi["records"]["expiryDates"][0]
-    underlying = data_oi["records"]["underlyingValue"]
-
-    rows = []
-    for r in records:
-        if r.get("expiryDate") == expiry and r.get("CE") and r.get("PE"):
-            ce = r.get("CE", {})
-            pe = r.get("PE", {})
-            rows.append({
-                "strike": r["strikePrice"],
-                "CE_change": ce.get("changeinOpenInterest", 0),
-                "PE_change": pe.get("changeinOpenInterest", 0),
-                "CE_OI": ce.get("openInterest", 0),
-                "PE_OI": pe.get("openInterest", 0),
-                "diff": abs(r["strikePrice"] - underlying)
-            })
-    df_atm = pd.DataFrame(rows).sort_values("diff").head(5)
-    st.write("### ATM 5 OI Table")
-    st.dataframe(df_atm)
-
-    # -------------------- FIX APPLIED HERE --------------------
-    now = datetime.now(IST)
-    if not (now.hour >= 9 and now.hour < 16):
-        st.warning("Outside market hours — OI data not recorded.")
-    else:
-        snap = {
-            "date": str(today),
-            "time": now.strftime("%H:%M"),
-            "CE_change": df_atm["CE_change"].sum(),
-            "PE_change": df_atm["PE_change"].sum(),
-            "CE_OI_total": df_atm["CE_OI"].sum(),
-            "PE_OI_total": df_atm["PE_OI"].sum()
-        }
-
-        oi_history = pd.concat([oi_history, pd.DataFrame([snap])], ignore_index=True)
-        oi_history.to_csv(OI_FILE, index=False)
-
-    st.metric("CE Change (ATM 5)", df_atm["CE_change"].sum())
-    st.metric("PE Change (ATM 5)", df_atm["PE_change"].sum())
-
-    if not oi_history.empty:
-        st.write("### 📈 Change in OI (CE vs PE)")
-        plt.figure(figsize=(10, 4))
-        plt.plot(oi_history["time"], oi_history["CE_change"], marker='o', label="CE Change")
-        plt.plot(oi_history["time"], oi_history["PE_change"], marker='o', label="PE Change")
-        plt.grid(True)
-        plt.legend()
-        st.pyplot(plt)
-
-        st.write("### 📉 Total OI (CE vs PE)")
-        plt.figure(figsize=(10, 4))
-        plt.plot(oi_history["time"], oi_history["CE_OI_total"], marker='o', label="CE Total OI")
-        plt.plot(oi_history["time"], oi_history["PE_OI_total"], marker='o', label="PE Total OI")
-        plt.grid(True)
-        plt.legend()
-        st.pyplot(plt)
+def build_atm_oi(payload, n=5):
+    # Only strikes quoting both legs
+    return atm_oi_table(payload.chain(), n, paired=True)
+
+def render_oi_charts(oi_history):
+    rendered = []
+    labels = clock(oi_history)
+
+    fig = plt.figure(figsize=(10, 4))
+    plt.plot(labels, oi_history["CE_change"], marker='o', label="CE Change")
+    plt.plot(labels, oi_history["PE_change"], marker='o', label="PE Change")
+    plt.grid(True)
+    plt.legend()
+    rendered.append(("### 📈 Change in OI (CE vs PE)", fig))
+
+    fig = plt.figure(figsize=(10, 4))
+    plt.plot(labels, oi_history["CE_OI_total"], marker='o', label="CE Total OI")
+    plt.plot(labels, oi_history["PE_OI_total"], marker='o', label="PE Total OI")
+    plt.grid(True)
+    plt.legend()
+    rendered.append(("### 📉 Total OI (CE vs PE)", fig))
+
+    for i, (title, fig) in enumerate(rendered):
+        buf = io.BytesIO()
+        fig.savefig(buf, format="png")
+        plt.close(fig)
+        rendered[i] = (title, buf.getvalue())
+    return rendered
+
+strike_count = st.sidebar.selectbox("Strikes around ATM (OI table)", STRIKE_WINDOWS)
+
+@st.fragment
+def oi_section(strike_count):
+    rerun_on_publish(chain_updates("NIFTY"))
+    oi_history = load_oi_history()
+    payload_oi = fetch_oi()
+    if payload_oi:
+        # Unchanged payload → no re-aggregation, no history row, no redraw.
+        # History always sums ATM 5; the table follows the sidebar window.
+        df_atm = derived("DigiDashboard.atm5", payload_oi, build_atm_oi)
+        df_window = derived(f"DigiDashboard.atm{strike_count}", payload_oi, lambda p: build_atm_oi(p, strike_count))
+        st.write(f"### ATM {strike_count} OI Table")
+        st.dataframe(df_window)
+
+        # -------------------- FIX APPLIED HERE --------------------
+        now = datetime.now(IST)
+        if not is_capture_window(now):
+            st.warning("Outside market hours — OI data not recorded.")
+        elif is_new_payload("DigiDashboard.oi", payload_oi):
+            stamp = payload_oi.exchange_time(IST) or now
+            snap = {
+                "date": str(stamp.date()),
+                "time": stamp.strftime("%H:%M:%S"),
+                "CE_change": df_atm["CE_change"].sum(),
+                "PE_change": df_atm["PE_change"].sum(),
+                "CE_OI_total": df_atm["CE_OI"].sum(),
+                "PE_OI_total": df_atm["PE_OI"].sum()
+            }
+
+            # Record each exchange timestamp once, across all dashboards
+            if append_row(OI_FILE, snap, OI_COLUMNS):
+                mmap_append("oi", snap, (snap["date"], snap["time"]))
+                oi_history = append_compact(oi_history, snap)
+
+        st.metric("CE Change (ATM 5)", df_atm["CE_change"].sum())
+        st.metric("PE Change (ATM 5)", df_atm["PE_change"].sum())
+
+        if not oi_history.empty:
+            # Keyed on the history length too: another viewer may append rows under the same payload
+            for title, png in derived(f"DigiDashboard.charts.{len(oi_history)}", payload_oi, lambda _: render_oi_charts(oi_history)):
+                st.write(title)
+                st.image(png)
+    return frame_bytes(oi_history)
+
+oi_bytes = oi_section(strike_count)
+
+st.sidebar.caption(f"History in memory: {(history_bytes + oi_bytes) / 1024:.1f} KB")
+profiled.finish()
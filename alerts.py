@@ -0,0 +1,275 @@
+import json
+import os
+import queue
+import shutil
+import subprocess
+import threading
+import time
+import urllib.request
+from collections import defaultdict, deque
+from datetime import datetime
+from urllib.parse import urlparse
+
+from market_calendar import IST
+from option_metrics import chain_snapshot, strike_decision
+
+# -------------------------------------------------
+# Rule-Based Alert Engine
+# -------------------------------------------------
+# Rules are declarative dicts (see DEFAULT_RULES / ALERT_RULES_FILE). Each
+# snapshot only touches rules whose metric changed; rules keep their own
+# state for hysteresis, and a per-rule cooldown drops repeats.
+
+ALERT_RULES_FILE = os.environ.get("ALERT_RULES_FILE", "alert_rules.json")
+ALERT_LOG = os.environ.get("ALERT_LOG", "alerts.log")
+ALERT_WEBHOOK = os.environ.get("ALERT_WEBHOOK")          # e.g. http://127.0.0.1:8080/alerts
+ALERT_DESKTOP = os.environ.get("ALERT_DESKTOP", "0") == "1"
+
+DEFAULT_COOLDOWN = 300  # seconds before the same rule may fire again
+
+DEFAULT_RULES = [
+    {"name": "PCR above 1.2", "type": "cross", "metric": "pcr", "level": 1.2, "direction": "up", "hysteresis": 0.05},
+    {"name": "PCR below 0.8", "type": "cross", "metric": "pcr", "level": 0.8, "direction": "down", "hysteresis": 0.05},
+    {"name": "CE/PE change flip", "type": "flip", "metric": "ce_pe_diff", "hysteresis": 50000},
+    {"name": "Premium decay regime", "type": "regime", "metric": "decision_atm", "value": "Premium Decay"},
+    {"name": "CE OI wall shift", "type": "change", "metric": "ce_wall"},
+    {"name": "PE OI wall shift", "type": "change", "metric": "pe_wall"},
+]
+
+
+class CrossRule:
+    """Fires when `metric` crosses `level`; re-arms once it moves back past the hysteresis band."""
+
+    def __init__(self, name, metric, level, direction="up", hysteresis=0.0, **_):
+        self.name, self.metric = name, metric
+        self.level, self.up, self.band = level, direction == "up", hysteresis
+        self.armed = None
+
+    def update(self, value):
+        beyond = value > self.level if self.up else value < self.level
+        back = value < self.level - self.band if self.up else value > self.level + self.band
+        if self.armed is None:  # first value only sets the state
+            self.armed = not beyond
+            return None
+        if self.armed and beyond:
+            self.armed = False
+            return f"{self.metric} crossed {'above' if self.up else 'below'} {self.level} ({value})"
+        if not self.armed and back:
+            self.armed = True
+        return None
+
+
+class FlipRule:
+    """Fires when the sign of `metric` flips; values inside ±hysteresis keep the old sign."""
+
+    def __init__(self, name, metric, hysteresis=0.0, **_):
+        self.name, self.metric, self.band = name, metric, hysteresis
+        self.sign = None
+
+    def update(self, value):
+        if abs(value) <= self.band:
+            return None
+        sign = 1 if value > 0 else -1
+        previous, self.sign = self.sign, sign
+        if previous is not None and previous != sign:
+            return f"{self.metric} flipped {'positive' if sign > 0 else 'negative'} ({value})"
+        return None
+
+
+class RegimeRule:
+    """Fires on entering a regime: metric equals (or, for text, contains) `value`."""
+
+    def __init__(self, name, metric, value, **_):
+        self.name, self.metric, self.value = name, metric, value
+        self.inside = None
+
+    def update(self, value):
+        inside = self.value in value if isinstance(value, str) else value == self.value
+        entered = inside and self.inside is False
+        self.inside = inside
+        return f"{self.metric} entered '{self.value}' ({value})" if entered else None
+
+
+class ChangeRule:
+    """Fires when `metric` moves by at least `min_delta` (or changes at all for labels)."""
+
+    def __init__(self, name, metric, min_delta=0, **_):
+        self.name, self.metric, self.min_delta = name, metric, min_delta
+        self.last = None
+
+    def update(self, value):
+        previous = self.last
+        if previous is None:
+            self.last = value
+            return None
+        if isinstance(value, (int, float)) and abs(value - previous) < max(self.min_delta, 1e-12):
+            return None
+        if value == previous:
+            return None
+        self.last = value
+        return f"{self.metric} moved {previous} → {value}"
+
+
+RULE_TYPES = {"cross": CrossRule, "flip": FlipRule, "regime": RegimeRule, "change": ChangeRule}
+
+
+def load_rules(path=ALERT_RULES_FILE):
+    if os.path.exists(path):
+        with open(path) as f:
+            return json.load(f)
+    return DEFAULT_RULES
+
+
+# -------------------------------------------------
+# Sinks (all local)
+# -------------------------------------------------
+class FileSink:
+    def __init__(self, path=ALERT_LOG):
+        self.path = path
+
+    def __call__(self, alert):
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(alert, ensure_ascii=False) + "\n")
+
+
+class DesktopSink:
+    def __init__(self):
+        self.cmd = shutil.which("notify-send") or shutil.which("osascript")
+
+    def __call__(self, alert):
+        if self.cmd is None:
+            return
+        if self.cmd.endswith("osascript"):
+            script = f'display notification {json.dumps(alert["message"])} with title {json.dumps(alert["rule"])}'
+            subprocess.run([self.cmd, "-e", script], timeout=5, check=False)
+        else:
+            subprocess.run([self.cmd, alert["rule"], alert["message"]], timeout=5, check=False)
+
+
+class WebhookSink:
+    def __init__(self, url):
+        if urlparse(url).hostname not in ("localhost", "127.0.0.1", "::1"):
+            raise ValueError(f"webhook must point at a local endpoint, got {url}")
+        self.url = url
+
+    def __call__(self, alert):
+        req = urllib.request.Request(
+            self.url, data=json.dumps(alert).encode(), headers={"Content-Type": "application/json"}
+        )
+        urllib.request.urlopen(req, timeout=2).close()
+
+
+def default_sinks():
+    sinks = [FileSink()]
+    if ALERT_DESKTOP:
+        sinks.append(DesktopSink())
+    if ALERT_WEBHOOK:
+        sinks.append(WebhookSink(ALERT_WEBHOOK))
+    return sinks
+
+
+# -------------------------------------------------
+# Engine
+# -------------------------------------------------
+class AlertEngine:
+    def __init__(self, rules=None, sinks=None, cooldown=DEFAULT_COOLDOWN):
+        self.rules = defaultdict(list)  # metric -> rules, so a snapshot only touches changed metrics
+        for spec in rules if rules is not None else load_rules():
+            spec = dict(spec)
+            self.rules[spec["metric"]].append(RULE_TYPES[spec.pop("type")](**spec))
+        self.sinks = sinks if sinks is not None else default_sinks()
+        self.cooldown = cooldown
+        self.recent = deque(maxlen=200)
+        self._last_values = {}
+        self._last_fired = {}
+        self._queue = queue.Queue()
+        threading.Thread(target=self._dispatch, name="alert-sinks", daemon=True).start()
+
+    def evaluate(self, snapshot, stamp=None):
+        """Run the rules for every metric that changed; returns the alerts raised."""
+        stamp = stamp or datetime.now(IST)
+        raised = []
+        for metric, value in snapshot.items():
+            if value is None or self._last_values.get(metric) == value:
+                continue
+            self._last_values[metric] = value
+            for rule in self.rules.get(metric, ()):
+                message = rule.update(value)
+                if message is None:
+                    continue
+                now = time.monotonic()
+                if now - self._last_fired.get(rule.name, -self.cooldown) < self.cooldown:
+                    continue  # dedup: same rule inside its cooldown
+                self._last_fired[rule.name] = now
+                alert = {"time": stamp.isoformat(), "rule": rule.name, "message": message}
+                raised.append(alert)
+                self.recent.append(alert)
+                self._queue.put(alert)
+        return raised
+
+    def _dispatch(self):
+        # Sinks run off the evaluation path so slow ones never delay the next snapshot
+        while True:
+            alert = self._queue.get()
+            for sink in self.sinks:
+                try:
+                    sink(alert)
+                except Exception:
+                    pass
+
+
+# -------------------------------------------------
+# Snapshot Stream
+# -------------------------------------------------
+class DecisionTracker:
+    """Keeps day-open premiums per strike so strike_decision runs incrementally."""
+
+    def __init__(self):
+        self.day = None
+        self.open = {}
+
+    def annotate(self, snapshot, stamp):
+        if stamp.date() != self.day:
+            self.day, self.open = stamp.date(), {}
+        strikes = sorted({int(k[3:]) for k in snapshot if k.startswith("CE_") and k[3:].isdigit()})
+        decay = 0
+        for k in strikes:
+            ce, pe = snapshot.get(f"CE_{k}"), snapshot.get(f"PE_{k}")
+            if ce is None or pe is None:
+                continue
+            start_ce, start_pe = self.open.setdefault(k, (ce, pe))
+            decision = strike_decision(start_ce, ce, start_pe, pe)
+            snapshot[f"decision_{k}"] = decision
+            decay += "Premium Decay" in decision
+        if strikes:
+            atm = min(strikes, key=lambda k: abs(k - snapshot["spot"]))
+            snapshot["decision_atm"] = snapshot.get(f"decision_{atm}")
+        snapshot["decay_count"] = decay
+        return snapshot
+
+
+def start_alert_feed(symbol="NIFTY", engine=None):
+    """Background poller: evaluate every new option-chain payload, viewers or not."""
+    from live_feed import LiveFeed, SKIP
+    from nse_client import option_chain
+    from nse_payload import is_new_payload
+
+    engine = engine or AlertEngine()
+    tracker = DecisionTracker()
+
+    def tick():
+        payload = option_chain(symbol)
+        if not is_new_payload(f"alerts.{symbol}", payload):
+            return SKIP
+        stamp = payload.exchange_time(IST) or datetime.now(IST)
+        snapshot = tracker.annotate(chain_snapshot(payload.chain()), stamp)
+        engine.evaluate(snapshot, stamp)
+        return {"time": stamp, **snapshot}
+
+    feed = LiveFeed(tick, name=f"alerts-{symbol}").start()
+    return engine, feed
+
+
+if __name__ == "__main__":
+    start_alert_feed()
+    threading.Event().wait()
@@ -0,0 +1,247 @@
+import argparse
+import gzip
+import hashlib
+import json
+import logging
+import os
+import threading
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+from cachetools import LRUCache
+
+import history_mmap
+from market_calendar import IST
+from nse_client import derived, limiter, option_chain, stats
+from option_metrics import chain_snapshot
+
+# -------------------------------------------------
+# Local Read-Only JSON API
+# -------------------------------------------------
+# Serves what the dashboards already compute (latest chain snapshot, ATM
+# CE/PE change + sentiment, normalized deltas, history ranges) to other local
+# tools. Snapshots come from the shared nse_client cache, so any number of
+# clients costs the same upstream calls as one dashboard. Encoded bodies are
+# cached per (request, data version); clients revalidate with If-None-Match
+# and get 304s, and large bodies are gzipped once.
+#
+# Run standalone (python api_server.py) it is its own process with its own
+# nse_client, so its chain polls add to the dashboards' upstream load and
+# budget instead of sharing their cache; start it next to the dashboards in
+# one process (serve()) to share a single client.
+#
+#   GET /snapshot?symbol=NIFTY&n=5
+#   GET /metrics?symbol=NIFTY
+#   GET /history/<oi|momentum|atm>?day=2026-10-19 | start=…&end=… [&since=ts&limit=N&fields=a,b]
+#   GET /health
+
+API_HOST = "127.0.0.1"
+API_PORT = int(os.environ.get("API_PORT", "8766"))
+GZIP_MIN_BYTES = 1024
+MAX_HISTORY_ROWS = 50000
+
+_responses = LRUCache(maxsize=256)   # (path, query) -> (version, etag, body, gzipped)
+_responses_lock = threading.Lock()
+log = logging.getLogger(__name__)
+
+
+class ApiError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def _json_default(o):
+    return o.item() if isinstance(o, np.generic) else str(o)
+
+
+def encode(obj):
+    return json.dumps(obj, default=_json_default, separators=(",", ":")).encode()
+
+
+# -------------------------------------------------
+# Resources: each returns (version, build) so unchanged data is never re-encoded
+# -------------------------------------------------
+def sentiment(ce_change, pe_change):
+    """BULLISH/BEARISH plus each side's share of the total ATM change (as on the OI dashboards)."""
+    total = abs(ce_change) + abs(pe_change)
+    return {
+        "sentiment": "BULLISH" if ce_change > pe_change else "BEARISH",
+        "CE_pct": round(ce_change / total * 100, 2) if total else 0,
+        "PE_pct": round(pe_change / total * 100, 2) if total else 0,
+    }
+
+
+def _chain_payload(symbol):
+    try:
+        return option_chain(symbol)
+    except Exception as e:
+        raise ApiError(503, f"option chain unavailable: {e}")
+
+
+def snapshot(symbol="NIFTY", n=5):
+    payload = _chain_payload(symbol)
+
+    def build():
+        def compute(p):
+            snap = chain_snapshot(p.chain(), n)
+            stamp = p.exchange_time(IST)
+            return {"symbol": symbol, "time": stamp.isoformat() if stamp else None, "fingerprint": p.fingerprint,
+                    **snap, **sentiment(snap["CE_change"], snap["PE_change"])}
+        return derived(f"api.snapshot.{symbol}.{n}", payload, compute)
+
+    return payload.fingerprint, build
+
+
+def _last_record(series):
+    arr = history_mmap.open_series(series)
+    if not len(arr):
+        return len(arr), None
+    rec = arr[-1]
+    row = {name: round(float(rec[name]), 2) if arr.dtype[name].kind == "f" else int(rec[name]) for name in arr.dtype.names}
+    row["time"] = datetime.fromtimestamp(row["ts"], IST).isoformat()
+    return len(arr), row
+
+
+def metrics(symbol="NIFTY"):
+    version, build_snapshot = snapshot(symbol)
+    n_momentum, momentum = _last_record("momentum")
+    n_oi, oi = _last_record("oi")
+
+    def build():
+        snap = build_snapshot()
+        out = {"snapshot": snap, "momentum": momentum, "oi": oi}
+        if oi:
+            out["oi_sentiment"] = sentiment(oi["CE_change"], oi["PE_change"])
+        return out
+
+    return (version, n_momentum, n_oi), build
+
+
+def history(series, day=None, start=None, end=None, since=None, limit=None, fields=None):
+    if series not in history_mmap.SERIES:
+        raise ApiError(404, f"unknown series {series!r}; one of {sorted(history_mmap.SERIES)}")
+    names = np.dtype(history_mmap.SERIES[series]).names[1:]
+    fields = [f for f in fields.split(",") if f] if fields else list(names)
+    unknown = set(fields) - set(names)
+    if unknown:
+        raise ApiError(400, f"unknown fields {sorted(unknown)}")
+    try:
+        arr = history_mmap.query_day(series, day) if day else history_mmap.query(series, start, end)
+        if since is not None:
+            arr = arr[np.searchsorted(arr["ts"], history_mmap.to_epoch(int(since)), "right"):]
+    except ValueError as e:
+        raise ApiError(400, f"bad range: {e}")
+    limit = min(int(limit), MAX_HISTORY_ROWS) if limit else MAX_HISTORY_ROWS
+    arr = arr[-limit:]  # newest rows win when a range is too long
+
+    def build():
+        # Columnar so a poll of N rows is one list per field, not N dicts
+        out = {"series": series, "rows": len(arr), "ts": arr["ts"].tolist()}
+        for name in fields:
+            col = arr[name]
+            out[name] = np.round(col.astype(float), 2).tolist() if col.dtype.kind == "f" else col.tolist()
+        return out
+
+    # Append-only files: the record count of the file is the data version
+    return len(history_mmap.open_series(series)), build
+
+
+def health():
+    return None, lambda: {"time": datetime.now(IST).isoformat(), "nse_client": dict(stats), "rate_limits": limiter.state()}
+
+
+def route(path, query):
+    q = {k: v[0] for k, v in parse_qs(query).items()}
+    parts = [p for p in path.split("/") if p]
+    try:
+        if parts == ["snapshot"]:
+            return snapshot(q.get("symbol", "NIFTY"), int(q.get("n", 5)))
+        if parts == ["metrics"]:
+            return metrics(q.get("symbol", "NIFTY"))
+        if len(parts) == 2 and parts[0] == "history":
+            return history(parts[1], q.get("day"), q.get("start"), q.get("end"), q.get("since"),
+                           q.get("limit"), q.get("fields"))
+        if parts == ["health"]:
+            return health()
+    except (TypeError, ValueError) as e:
+        raise ApiError(400, str(e))
+    raise ApiError(404, "not found")
+
+
+def respond(path, query):
+    """(etag, body, gzipped) for a request, reusing the encoding while the data version holds."""
+    version, build = route(path, query)
+    key = (path, query)
+    with _responses_lock:
+        hit = _responses.get(key)
+    if version is not None and hit and hit[0] == version:
+        return hit[1:]
+    body = encode(build())
+    etag = '"%s"' % hashlib.sha1(body).hexdigest()[:20]
+    gz = gzip.compress(body, 5) if len(body) >= GZIP_MIN_BYTES else None
+    if version is not None:
+        with _responses_lock:
+            _responses[key] = (version, etag, body, gz)
+    return etag, body, gz
+
+
+# -------------------------------------------------
+# HTTP
+# -------------------------------------------------
+class _ApiHandler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        try:
+            etag, body, gz = respond(url.path, url.query)
+        except ApiError as e:
+            self._send(e.status, encode({"error": str(e)}))
+            return
+        except Exception:  # a bad snapshot must not drop the connection
+            log.exception("GET %s failed", self.path)
+            self._send(500, encode({"error": "internal error"}))
+            return
+
+        if etag in [t.strip() for t in self.headers.get("If-None-Match", "").split(",")]:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+        use_gzip = gz is not None and "gzip" in self.headers.get("Accept-Encoding", "")
+        self._send(200, gz if use_gzip else body, etag, "gzip" if use_gzip else None)
+
+    def _send(self, status, body, etag=None, encoding=None):
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Cache-Control", "no-cache")  # always revalidate; 304 is cheap
+        self.send_header("Vary", "Accept-Encoding")
+        if etag:
+            self.send_header("ETag", etag)
+        if encoding:
+            self.send_header("Content-Encoding", encoding)
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def serve(port=API_PORT, host=API_HOST):
+    """Start the API on a daemon thread; returns the server."""
+    server = ThreadingHTTPServer((host, port), _ApiHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="json-api", daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Read-only JSON API over the computed option-chain metrics")
+    parser.add_argument("--port", type=int, default=API_PORT)
+    args = parser.parse_args()
+
+    serve(args.port)
+    print(f"serving http://{API_HOST}:{args.port}/snapshot, /metrics, /history/<series>, /health")
+    threading.Event().wait()
@@ -0,0 +1,131 @@
+import os
+import pickle
+import threading
+import time
+import zlib
+from contextlib import nullcontext
+from datetime import datetime
+
+from market_calendar import IST
+
+# -------------------------------------------------
+# Warm-Restart Checkpoints
+# -------------------------------------------------
+# Session-critical state (day-open references, rolling indicator state,
+# in-memory logs, last-seen payload fingerprints) pickled to one small
+# zlib-compressed file per page. A restarted process loads it in
+# milliseconds instead of re-basing deltas to the current tick or replaying
+# the day. A checkpoint only restores on the trading day it was written.
+
+CHECKPOINT_DIR = os.path.join("data", "checkpoints")
+CHECKPOINT_VERSION = 1
+SAVE_EVERY = 15     # seconds between writes of the same checkpoint (force=True skips)
+
+_last_save = {}
+_lock = threading.Lock()
+_pending = {}       # name -> (version, state, day, lock) waiting for the writer thread
+_written = {}       # name -> version of the last checkpoint the writer wrote
+_wakeup = threading.Condition(_lock)
+_writer = None
+_writing = None     # name the writer thread is writing right now
+
+
+def checkpoint_path(name):
+    return os.path.join(CHECKPOINT_DIR, f"{name}.ckpt")
+
+
+def _today():
+    return datetime.now(IST).date()
+
+
+def _due(name, force):
+    # Caller holds _lock
+    now = time.monotonic()
+    if not force and now - _last_save.get(name, -SAVE_EVERY) < SAVE_EVERY:
+        return False
+    _last_save[name] = now
+    return True
+
+
+def save(name, state, day=None, force=False):
+    """Atomically write picklable `state` for trading `day` (today IST); returns True if written."""
+    with _lock:
+        if not _due(name, force):
+            return False
+    _write(name, lambda: state, day)
+    return True
+
+
+def _write(name, state, day, lock=None):
+    with lock or nullcontext():  # objects other threads mutate are pickled under their lock
+        blob = pickle.dumps({"version": CHECKPOINT_VERSION, "day": str(day or _today()),
+                             "saved": time.time(), "state": state()}, protocol=pickle.HIGHEST_PROTOCOL)
+    os.makedirs(CHECKPOINT_DIR, exist_ok=True)
+    path = checkpoint_path(name)
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(zlib.compress(blob, 1))
+    os.replace(tmp, path)  # readers never see a half-written checkpoint
+
+
+def save_async(name, state, version, day=None, force=False, lock=None):
+    """Queue a checkpoint for the background writer and return at once.
+
+    `state` is a zero-argument callable building the state; it runs on the
+    writer thread, so pickling and compression never hold up the caller.
+    Only the newest queued snapshot per `name` is written, and a `version`
+    equal to the last one written is skipped. `lock`, if given, is held
+    while the state is built and pickled.
+    """
+    global _writer
+    with _lock:
+        if _pending.get(name, (_written.get(name),))[0] == version or not _due(name, force):
+            return False
+        _pending[name] = (version, state, day, lock)
+        if _writer is None:
+            _writer = threading.Thread(target=_write_loop, name="checkpoint-writer", daemon=True)
+            _writer.start()
+        _wakeup.notify()
+    return True
+
+
+def _write_loop():
+    global _writing
+    while True:
+        with _lock:
+            while not _pending:
+                _wakeup.wait()
+            name, (version, state, day, lock) = _pending.popitem()
+            _writing = name
+        try:
+            _write(name, state, day, lock)
+            written = True
+        except Exception:  # a failed write must not stop later checkpoints
+            written = False
+        with _lock:
+            _writing = None
+            if written:
+                _written[name] = version
+
+
+def flush(timeout=5.0):
+    """Wait until every queued checkpoint has been written (tests, shutdown)."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        with _lock:
+            if not _pending and _writing is None:
+                return True
+        time.sleep(0.01)
+    return False
+
+
+def load(name, day=None):
+    """State saved for trading `day` (today IST), or None if missing, from another day or unreadable."""
+    try:
+        with open(checkpoint_path(name), "rb") as f:
+            saved = pickle.loads(zlib.decompress(f.read()))
+    except Exception:  # missing, torn, or written by incompatible code
+        return None
+    if saved.get("version") != CHECKPOINT_VERSION or saved.get("day") != str(day or _today()):
+        return None
+    return saved["state"]
@@ -0,0 +1,73 @@
+import numpy as np
+import pandas as pd
+
+from nse_payload import loads
+
+# -------------------------------------------------
+# Index Constituents (one bulk request per index)
+# -------------------------------------------------
+# NSE's equity-stockIndices endpoint returns every member of an index in one
+# body. It is parsed once into symbol-indexed column arrays, so a banner of
+# 50 names, movers and breadth all come from a single request instead of one
+# quote-equity call per symbol.
+
+CONSTITUENT_INDICES = ("NIFTY 50", "NIFTY BANK")
+FIELDS = ("open", "dayHigh", "dayLow", "lastPrice", "previousClose", "pChange", "totalTradedValue")
+
+
+def _number(v):
+    try:
+        return float(v)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+class Constituents:
+    def __init__(self, index, rows, timestamp=None):
+        self.index = index
+        self.timestamp = timestamp
+        # The first row (priority 1) is the index itself, not a member
+        self.index_row = next((r for r in rows if r.get("symbol") == index), None)
+        rows = [r for r in rows if r.get("symbol") != index]
+        self.symbols = np.array([r["symbol"] for r in rows])
+        self.names = [(r.get("meta") or {}).get("companyName", r["symbol"]) for r in rows]
+        self.cols = {f: np.array([_number(r.get(f)) for r in rows]) for f in FIELDS}
+        with np.errstate(invalid="ignore", divide="ignore"):
+            self.cols["pct_open"] = (self.cols["lastPrice"] - self.cols["open"]) / self.cols["open"] * 100
+        self._pos = {s: i for i, s in enumerate(self.symbols)}
+
+    def __len__(self):
+        return len(self.symbols)
+
+    def __contains__(self, symbol):
+        return symbol in self._pos
+
+    def quote(self, symbol):
+        """(last, % from open) for one member, like get_stock_details(); (None, None) if absent."""
+        i = self._pos.get(symbol)
+        if i is None or np.isnan(self.cols["lastPrice"][i]):
+            return None, None
+        pct = self.cols["pct_open"][i]
+        return float(self.cols["lastPrice"][i]), None if np.isnan(pct) else float(pct)
+
+    def frame(self):
+        return pd.DataFrame({"symbol": self.symbols, "name": self.names,
+                             "last": self.cols["lastPrice"], "pct_open": self.cols["pct_open"],
+                             "pct_change": self.cols["pChange"], "value_cr": self.cols["totalTradedValue"] / 1e7})
+
+    def movers(self, n=5):
+        """(gainers, losers) by % change from previous close."""
+        order = np.argsort(np.nan_to_num(self.cols["pChange"], nan=0.0))
+        df = self.frame()
+        return df.iloc[order[::-1][:n]].reset_index(drop=True), df.iloc[order[:n]].reset_index(drop=True)
+
+    def breadth(self):
+        change = self.cols["pChange"]
+        adv, dec = int((change > 0).sum()), int((change < 0).sum())
+        return {"advances": adv, "declines": dec, "unchanged": len(self) - adv - dec,
+                "ad_ratio": round(adv / dec, 2) if dec else None}
+
+
+def parse_constituents(index, raw):
+    data = loads(raw)
+    return Constituents(index, data.get("data", []), data.get("timestamp"))
@@ -0,0 +1,209 @@
+import argparse
+import os
+import warnings
+from datetime import date, datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+import history_mmap
+from market_calendar import IST, MARKET_CLOSE, MARKET_OPEN
+
+# -------------------------------------------------
+# Same-Time-of-Day Daily Profiles
+# -------------------------------------------------
+# python daily_profiles.py [--include-today]   (also run by eod_summary.py)
+#
+# Every past day's intraday series (ATM-5 OI change, sentiment, normalized
+# spot/CE/PE moves) resampled onto one fixed grid of regular-session minutes
+# and stored as (days × slots) float32 matrices in data/daily_profiles.npz.
+# Comparing today with the last N days is then a row slice of a file that is
+# loaded once per change, so 30 days cost about what one does. A slot holds
+# the last value seen in that minute, carried forward until the day's last
+# observation; slots outside a day's data are NaN.
+
+PROFILES_FILE = os.path.join(history_mmap.DATA_DIR, "daily_profiles.npz")
+SLOT_MINUTES = 1
+IST_OFFSET = 5 * 3600 + 1800             # fixed, no DST: epoch seconds → IST calendar day
+SESSION_START = MARKET_OPEN.hour * 60 + MARKET_OPEN.minute
+SLOTS = ((MARKET_CLOSE.hour * 60 + MARKET_CLOSE.minute) - SESSION_START) // SLOT_MINUTES + 1
+
+METRICS = {
+    "CE_change": "ATM-5 CE OI change",
+    "PE_change": "ATM-5 PE OI change",
+    "sentiment": "Sentiment (CE − PE share of ATM change, %, > 0 = BULLISH)",
+    "spot_delta": "NIFTY move from open",
+    "ce_delta": "ATM CE premium move from open",
+    "pe_delta": "ATM PE premium move from open",
+}
+
+
+def slot_labels():
+    start = datetime.combine(date.today(), MARKET_OPEN)
+    return [(start + timedelta(minutes=i * SLOT_MINUTES)).strftime("%H:%M") for i in range(SLOTS)]
+
+
+def current_slot(now=None):
+    now = (now or datetime.now(IST)).astimezone(IST)
+    return int(np.clip((now.hour * 60 + now.minute - SESSION_START) // SLOT_MINUTES, 0, SLOTS - 1))
+
+
+def _day_slot(ts):
+    """(IST day number, minute slot or -1 outside the regular session) per epoch second."""
+    local = np.asarray(ts, dtype=np.int64) + IST_OFFSET
+    day = local // 86400
+    slot = ((local % 86400) // 60 - SESSION_START) // SLOT_MINUTES
+    return day, np.where((slot >= 0) & (slot < SLOTS), slot, -1)
+
+
+def _to_date(day_number):
+    return str(date(1970, 1, 1) + timedelta(days=int(day_number)))
+
+
+def align(arr, fields, days):
+    """{field: (len(days), SLOTS)} from time-ordered records; last value per minute, carried forward."""
+    out = {f: np.full((len(days), SLOTS), np.nan, dtype=np.float32) for f in fields}
+    if not len(arr) or not len(days):
+        return out
+    day, slot = _day_slot(arr["ts"])
+    row = np.searchsorted(days, day)
+    keep = (slot >= 0) & (row < len(days))
+    keep[keep] &= days[row[keep]] == day[keep]
+    row, slot, picked = row[keep], slot[keep], np.flatnonzero(keep)
+    # Last record per (day, slot): records are time-ordered, so keep the final occurrence
+    cell = row * SLOTS + slot
+    last = len(cell) - 1 - np.unique(cell[::-1], return_index=True)[1]
+    row, slot, picked = row[last], slot[last], picked[last]
+
+    observed = np.zeros((len(days), SLOTS), dtype=bool)
+    observed[row, slot] = True
+    carry = np.maximum.accumulate(np.where(observed, np.arange(SLOTS), -1), axis=1)
+    after_last = np.arange(SLOTS) > np.where(observed.any(axis=1), SLOTS - 1 - observed[:, ::-1].argmax(axis=1), -1)[:, None]
+    rows = np.arange(len(days))[:, None]
+    for f in fields:
+        grid = out[f]
+        grid[row, slot] = arr[f][picked]
+        grid[:] = np.where(carry >= 0, grid[rows, np.maximum(carry, 0)], np.nan)
+        grid[after_last] = np.nan
+    return out
+
+
+def _from_open(grid):
+    """Each row minus its first observed value (raw prices → moves from the day's open)."""
+    first = np.where(np.isnan(grid).all(axis=1), np.nan, grid[np.arange(len(grid)), np.argmax(~np.isnan(grid), axis=1)])
+    return grid - first[:, None]
+
+
+def profiles_for(days):
+    """{metric: (len(days), SLOTS)} straight from the binary history series."""
+    days = np.asarray(days, dtype=np.int64)
+    lo, hi = (_to_date(days[0]), _to_date(days[-1] + 1)) if len(days) else (None, None)
+    oi = align(history_mmap.query("oi", lo, hi), ("CE_change", "PE_change"), days)
+    mom = align(history_mmap.query("momentum", lo, hi), ("spot_delta", "ce_delta", "pe_delta"), days)
+    atm = align(history_mmap.query("atm", lo, hi), ("NIFTY", "CE", "PE"), days)
+
+    ce, pe = oi["CE_change"], oi["PE_change"]
+    total = np.abs(ce) + np.abs(pe)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        sentiment = np.where(total > 0, (ce - pe) / total * 100, np.where(np.isnan(total), np.nan, 0)).astype(np.float32)
+    # Days recorded only by DigiDashboard (raw ATM prices) still get normalized moves
+    missing = np.isnan(mom["spot_delta"]).all(axis=1)
+    for name, raw in (("spot_delta", "NIFTY"), ("ce_delta", "CE"), ("pe_delta", "PE")):
+        mom[name][missing] = _from_open(atm[raw][missing])
+    return {"CE_change": ce, "PE_change": pe, "sentiment": sentiment, **mom}
+
+
+def recorded_days():
+    """IST day numbers present in any history series."""
+    found = [_day_slot(history_mmap.open_series(s)["ts"])[0] for s in ("oi", "momentum", "atm")]
+    return np.unique(np.concatenate(found))
+
+
+# -------------------------------------------------
+# Build / Load
+# -------------------------------------------------
+def build(include_today=False):
+    """Recompute the whole index from the binary series (vectorized; seconds for years of data)."""
+    days = recorded_days()
+    if not include_today:
+        days = days[days != (int(datetime.now(IST).timestamp()) + IST_OFFSET) // 86400]  # today is still moving
+    grids = profiles_for(days)
+    os.makedirs(history_mmap.DATA_DIR, exist_ok=True)
+    tmp = PROFILES_FILE + ".tmp.npz"
+    np.savez(tmp, days=np.array([_to_date(d) for d in days]), **grids)
+    os.replace(tmp, PROFILES_FILE)
+    return len(days)
+
+
+class Profiles:
+    def __init__(self, days, grids):
+        self.days = list(days)
+        self.grids = grids
+
+    def recent(self, n, before=None):
+        """The last `n` indexed days before `before` (ISO date), oldest first."""
+        end = len(self.days) if before is None else int(np.searchsorted(self.days, str(before)))
+        return self.days[max(end - n, 0):end], slice(max(end - n, 0), end)
+
+
+_loaded = {}
+
+
+def load_profiles(path=PROFILES_FILE):
+    """Profiles from the index file, re-read only when the file changes."""
+    if not os.path.exists(path):
+        return Profiles([], {m: np.zeros((0, SLOTS), dtype=np.float32) for m in METRICS})
+    mtime = os.path.getmtime(path)
+    hit = _loaded.get(path)
+    if hit is None or hit[0] != mtime:
+        with np.load(path) as z:
+            hit = _loaded[path] = (mtime, Profiles(z["days"].tolist(), {m: z[m] for m in METRICS}))
+    return hit[1]
+
+
+def today_profile(today=None):
+    """Today's series on the same grid (live, from today's records only)."""
+    today = today or datetime.now(IST).date()
+    number = (today - date(1970, 1, 1)).days
+    return {m: grid[0] for m, grid in profiles_for([number]).items()}
+
+
+def compare_frame(profiles, metric, n, today=None, live=None):
+    """Slot-indexed DataFrame: today, the last n days and their median, for one metric."""
+    today = today or datetime.now(IST).date()
+    live = live if live is not None else today_profile(today)
+    days, rows = profiles.recent(n, before=today)
+    past = profiles.grids[metric][rows]
+    frame = pd.DataFrame(past.T, index=slot_labels(), columns=days)
+    if len(days):
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", RuntimeWarning)  # minutes no past day reached
+            frame["median"] = np.nanmedian(past, axis=0)
+    frame.insert(0, f"today ({today})", live[metric])
+    frame.index.name = "time"
+    return frame
+
+
+def at_slot(profiles, metric, n, slot, today=None, live=None):
+    """(slot, today's value, the same minute on each of the last n days, today's percentile).
+
+    `slot` moves back to today's latest observed minute at or before it, so
+    a snapshot that has not landed yet this minute does not blank the row.
+    """
+    today = today or datetime.now(IST).date()
+    live = live if live is not None else today_profile(today)
+    seen = np.flatnonzero(~np.isnan(live[metric][:slot + 1]))
+    slot = int(seen[-1]) if len(seen) else slot
+    days, rows = profiles.recent(n, before=today)
+    past = profiles.grids[metric][rows, slot]
+    now = live[metric][slot]
+    valid = past[~np.isnan(past)]
+    rank = float((valid < now).mean() * 100) if len(valid) and not np.isnan(now) else None
+    return slot, now, pd.Series(past, index=days, name=metric), rank
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the same-time-of-day daily profile index")
+    parser.add_argument("--include-today", action="store_true")
+    args = parser.parse_args()
+    print(f"{build(args.include_today)} days in {PROFILES_FILE}")
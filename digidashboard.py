@@ -1,11 +1,23 @@
 import streamlit as st
-from streamlit_autorefresh import st_autorefresh
 import pandas as pd
 import matplotlib.pyplot as plt
-import requests
 from datetime import datetime, date
 import os
+import io
 import pytz
+from nse_payload import is_new_payload
+from nse_client import SPOT_MAX_AGE, option_chain, index_quote, index_constituents, equity_quote, sensex_quote, derived, freshness, quote_info
+from constituents import CONSTITUENT_INDICES
+from history_store import OI_HISTORY_FILE, OI_COLUMNS, append_row, read_history
+from history_mmap import append as mmap_append, query, query_day, to_frame
+from market_calendar import is_capture_window
+from pubsub import chain_updates, rerun_on_publish
+from option_metrics import PREMIUM_FIELDS, STRIKE_WINDOWS, atm_oi_table, strike_premiums
+from history_schema import compact, append_compact, clock, timestamps, frame_bytes
+from downsample import chart_frame, zoom_controls
+from checkpoint import load as load_checkpoint, save as save_checkpoint
+from nse_payload import restore_fingerprints, seen_fingerprints
+from daily_profiles import METRICS as PROFILE_METRICS, at_slot, compare_frame, current_slot, load_profiles, slot_labels, today_profile
 
 # -------------------------------
 # TIMEZONE FIX (GUARANTEED)
@@ -19,27 +31,15 @@ IST = pytz.timezone("Asia/Kolkata")
 st.set_page_config(page_title="Combined Market Dashboard", layout="wide")
 
 # -----------------------------------------------------
-# AUTO REFRESH: EVERY 3 MINUTES
+# PUSH REFRESH: EACH LIVE SECTION BELOW IS AN st.fragment THAT RERUNS ON ITS
+# OWN WHEN A NEW OPTION-CHAIN SNAPSHOT LANDS (IDLE WHEN CLOSED); SIDEBAR
+# WIDGETS ARE READ OUTSIDE THE FRAGMENTS AND PASSED IN
 # -----------------------------------------------------
-st_autorefresh(interval=180000, key="autorefresh")
 
 # -----------------------------------------------------
-# CREATE NSE SESSION
+# NSE ACCESS: shared process-wide client (nse_client) — every viewer
+# reads the same cached, coalesced responses
 # -----------------------------------------------------
-def get_nse_session():
-    s = requests.Session()
-    s.headers.update({
-        "User-Agent": "Mozilla/5.0",
-        "Accept": "application/json",
-        "Accept-Language": "en-US,en;q=0.9",
-    })
-    try:
-        s.get("https://www.nseindia.com", timeout=5)
-    except:
-        pass
-    return s
-
-session = get_nse_session()
 
 
 # -----------------------------------------------------
@@ -56,9 +56,16 @@ STOCKS = {
 }
 
 def get_stock_details(symbol):
+    # Watchlist names are NIFTY 50 members: one bulk request covers all of them
     try:
-        url = f"https://www.nseindia.com/api/quote-equity?symbol={symbol}"
-        res = session.get(url, timeout=5).json()
+        members = index_constituents("NIFTY 50")
+        if symbol in members:
+            return members.quote(symbol)
+    except:
+        pass
+
+    try:
+        res = equity_quote(symbol)
 
         last = res["priceInfo"].get("lastPrice")
         openp = res["priceInfo"].get("open")
@@ -73,29 +80,35 @@ def get_stock_details(symbol):
         return None, None
 
 
+def stock_freshness(symbol):
+    members = quote_info("nse_constituents", "NIFTY 50")
+    if members is not None and symbol in members.value:
+        return freshness("nse_constituents", "NIFTY 50")
+    return freshness("nse_equity", symbol)
+
+
 # -----------------------------------------------------
 # INDEX DETAILS (SAFE VERSION)
 # -----------------------------------------------------
 def get_index_details(index_name):
     try:
-        r = session.get("https://www.nseindia.com/api/allIndices", timeout=5).json()
-        for idx in r["data"]:
-            if idx["index"] == index_name:
-                last = idx.get("last")
-                openp = idx.get("open")
-                if last is None or openp is None:
-                    return None, None
-                pct = ((last - openp) / openp) * 100
-                return last, pct
+        idx = index_quote(index_name)
+        if idx is not None:
+            last = idx.get("last")
+            openp = idx.get("open")
+            if last is None or openp is None:
+                return None, None
+            pct = ((last - openp) / openp) * 100
+            return last, pct
     except:
         return None, None
 
 
 def get_sensex_details():
     try:
-        r = requests.get("https://api.bseindia.com/BseIndiaAPI/api/MktStat1/w", timeout=5).json()
-        last = r["Sensex"].get("Curvalue")
-        openp = r["Sensex"].get("Openvalue")
+        r = sensex_quote()
+        last = r.get("Curvalue")
+        openp = r.get("Openvalue")
         if last is None or openp is None:
             return None, None
         pct = ((last - openp) / openp) * 100
@@ -104,43 +117,94 @@ def get_sensex_details():
         return None, None
 
 
+# -----------------------------------------------------
+# CONSTITUENTS (WHOLE INDEX FROM ONE REQUEST): BANNER, BREADTH, MOVERS
+# -----------------------------------------------------
+def render_constituents(index):
+    try:
+        members = index_constituents(index)
+    except:
+        st.warning(f"Could not fetch {index} constituents.")
+        return
+
+    cols = st.columns(10)
+    for i, symbol in enumerate(members.symbols):
+        last, pct = members.quote(symbol)
+        if last is not None and pct is not None:
+            cols[i % 10].metric(symbol, f"₹{last:,.1f}", f"{pct:+.2f}%")
+        else:
+            cols[i % 10].metric(symbol, "N/A", "N/A")
+    st.caption(f"{index} constituents {freshness('nse_constituents', index)}")
+
+    breadth = members.breadth()
+    cols = st.columns(4)
+    cols[0].metric("Advances", breadth["advances"])
+    cols[1].metric("Declines", breadth["declines"])
+    cols[2].metric("Unchanged", breadth["unchanged"])
+    cols[3].metric("A/D Ratio", breadth["ad_ratio"] if breadth["ad_ratio"] is not None else "—")
+
+    gainers, losers = members.movers(5)
+    cols = st.columns(2)
+    cols[0].write(f"🟢 Top Gainers ({index})")
+    cols[0].dataframe(gainers[["symbol", "last", "pct_change", "value_cr"]], hide_index=True, use_container_width=True)
+    cols[1].write(f"🔴 Top Losers ({index})")
+    cols[1].dataframe(losers[["symbol", "last", "pct_change", "value_cr"]], hide_index=True, use_container_width=True)
+
+
 # -----------------------------------------------------
 # TOP BANNER
 # -----------------------------------------------------
 st.title("📊 Combined Market Dashboard")
-st.subheader("📌 Live Stock & Index Prices (Auto-refresh every 3 minutes)")
+st.subheader("📌 Live Stock & Index Prices (Updates on each new exchange snapshot)")
+
+banner = st.sidebar.radio("Banner", ["Watchlist"] + list(CONSTITUENT_INDICES))
+
+@st.fragment
+def live_prices(banner):
+    rerun_on_publish(chain_updates("NIFTY"))
+    if banner == "Watchlist":
+        cols = st.columns(4)
+        i = 0
+
+        for name, symbol in STOCKS.items():
+            last, pct = get_stock_details(symbol)
+            if last is not None and pct is not None:
+                cols[i].metric(name, f"₹{last}", f"{pct:+.2f}%")
+            else:
+                cols[i].metric(name, "N/A", "N/A")
+            cols[i].caption(stock_freshness(symbol))
+            i = (i + 1) % 4
+    else:
+        render_constituents(banner)
 
-cols = st.columns(4)
-i = 0
+    nifty, pct_nifty = get_index_details("NIFTY 50")
+    banknifty, pct_bank = get_index_details("NIFTY BANK")
+    sensex, pct_sensex = get_sensex_details()
 
-for name, symbol in STOCKS.items():
-    last, pct = get_stock_details(symbol)
-    if last is not None and pct is not None:
-        cols[i].metric(name, f"₹{last}", f"{pct:+.2f}%")
-    else:
-        cols[i].metric(name, "N/A", "N/A")
-    i = (i + 1) % 4
+    cols = st.columns(3)
 
-nifty, pct_nifty = get_index_details("NIFTY 50")
-banknifty, pct_bank = get_index_details("NIFTY BANK")
-sensex, pct_sensex = get_sensex_details()
+    if nifty is not None and pct_nifty is not None:
+        cols[0].metric("NIFTY 50", f"₹{nifty}", f"{pct_nifty:+.2f}%")
+    else:
+        cols[0].metric("NIFTY 50", "N/A", "N/A")
 
-cols = st.columns(3)
+    if banknifty is not None and pct_bank is not None:
+        cols[1].metric("BANKNIFTY", f"₹{banknifty}", f"{pct_bank:+.2f}%")
+    else:
+        cols[1].metric("BANKNIFTY", "N/A", "N/A")
 
-if nifty is not None and pct_nifty is not None:
-    cols[0].metric("NIFTY 50", f"₹{nifty}", f"{pct_nifty:+.2f}%")
-else:
-    cols[0].metric("NIFTY 50", "N/A", "N/A")
+    if sensex is not None and pct_sensex is not None:
+        cols[2].metric("SENSEX", f"{sensex}", f"{pct_sensex:+.2f}%")
+    else:
+        cols[2].metric("SENSEX", "N/A", "N/A")
 
-if banknifty is not None and pct_bank is not None:
-    cols[1].metric("BANKNIFTY", f"₹{banknifty}", f"{pct_bank:+.2f}%")
-else:
-    cols[1].metric("BANKNIFTY", "N/A", "N/A")
+    # Banner values come straight from the quote cache (refreshed in the background);
+    # show how old each one is instead of silently rendering an old price
+    cols[0].caption(freshness("nse_index", "allIndices"))
+    cols[1].caption(freshness("nse_index", "allIndices"))
+    cols[2].caption(freshness("bse", "SENSEX"))
 
-if sensex is not None and pct_sensex is not None:
-    cols[2].metric("SENSEX", f"{sensex}", f"{pct_sensex:+.2f}%")
-else:
-    cols[2].metric("SENSEX", "N/A", "N/A")
+live_prices(banner)
 
 st.markdown("---")
 
@@ -152,10 +216,9 @@ st.header("📈 Option Momentum (ATM Normalized)")
 
 def get_spot_price():
     try:
-        r = session.get("https://www.nseindia.com/api/allIndices", timeout=5).json()
-        for idx in r["data"]:
-            if idx["index"] == "NIFTY 50":
-                return float(idx["last"])
+        idx = index_quote("NIFTY 50", max_age=SPOT_MAX_AGE)  # deltas need a live spot, not the banner's
+        if idx is not None:
+            return float(idx["last"])
     except:
         return None
 
@@ -164,13 +227,8 @@ def get_atm_strike(price, step=50):
 
 def get_option_chain(symbol="NIFTY", strike=None):
     try:
-        r = session.get(f"https://www.nseindia.com/api/option-chain-indices?symbol={symbol}", timeout=5).json()
-        df = pd.json_normalize(r["records"]["data"])
-        df.dropna(subset=["strikePrice"], inplace=True)
-        row = df[df["strikePrice"] == strike]
-        if row.empty:
-            return None, None
-        return row.iloc[0]["CE.lastPrice"], row.iloc[0]["PE.lastPrice"]
+        # Nearest expiry, last prices only: arrays, no dict tree kept on the payload
+        return strike_premiums(option_chain(symbol).chain(fields=PREMIUM_FIELDS), strike)
     except:
         return None, None
 
@@ -182,30 +240,28 @@ CSV_FILE = os.path.join(DATA_DIR, f"nifty_data_{today}.csv")
 
 
 # -----------------------------------------------------
-# INITIALIZE SESSION STATE (CSV IS NOW TZ-AWARE)
+# INITIALIZE SHARED STATE (ONE COPY PER PROCESS PER DAY, CSV IS TZ-AWARE)
 # -----------------------------------------------------
-if "opt_history" not in st.session_state:
-    if os.path.exists(CSV_FILE):
-        df_tmp = pd.read_csv(CSV_FILE)
-        df_tmp["time"] = pd.to_datetime(df_tmp["time"], utc=True).dt.tz_convert("Asia/Kolkata")
-        st.session_state.opt_history = df_tmp.to_dict("records")
-    else:
-        st.session_state.opt_history = []
-
-if "open_spot" not in st.session_state:
-    st.session_state.open_spot = None
-
-if "open_ce" not in st.session_state:
-    st.session_state.open_ce = None
+@st.cache_resource
+def get_option_state(day):
+    # opt_history is a compact frame (int64 epoch "ts" + float32 deltas), not a list of dicts
+    state = {"opt_history": compact(read_history(CSV_FILE)), "open_spot": None, "open_ce": None, "open_pe": None}
+    # Warm restart: the CSV holds the deltas, the checkpoint the day-open references
+    saved = load_checkpoint("digidashboard", day) or {}
+    state.update(saved.get("open", {}))
+    restore_fingerprints(saved.get("seen", {}))
+    return state
 
-if "open_pe" not in st.session_state:
-    st.session_state.open_pe = None
+opt_state = get_option_state(str(today))
 
 
 # -----------------------------------------------------
 # UPDATE OPTION HISTORY (SAVE IST AS ISO8601)
 # -----------------------------------------------------
 def update_option_history():
+    if not is_capture_window():
+        return
+
     spot = get_spot_price()
     if spot is None:
         return
@@ -215,38 +271,64 @@ def update_option_history():
     if ce is None:
         return
 
-    if st.session_state.open_spot is None:
-        st.session_state.open_spot = spot
-        st.session_state.open_ce = ce
-        st.session_state.open_pe = pe
+    # One row per new exchange snapshot, however many viewers rerun
+    payload = option_chain("NIFTY")
+    if not is_new_payload("digidashboard.opt", payload):
+        return
 
-    spot_delta = spot - st.session_state.open_spot
-    ce_delta = ce - st.session_state.open_ce
-    pe_delta = pe - st.session_state.open_pe
+    first = opt_state["open_spot"] is None
+    if first:
+        opt_state["open_spot"] = spot
+        opt_state["open_ce"] = ce
+        opt_state["open_pe"] = pe
 
-    st.session_state.opt_history.append({
-        "time": datetime.now(IST).isoformat(),
+    spot_delta = spot - opt_state["open_spot"]
+    ce_delta = ce - opt_state["open_ce"]
+    pe_delta = pe - opt_state["open_pe"]
+
+    row = {
+        "time": (payload.exchange_time(IST) or datetime.now(IST)).isoformat(),  # the snapshot's own time
         "spot_delta": spot_delta,
         "ce_delta": ce_delta,
         "pe_delta": pe_delta
-    })
-
-    pd.DataFrame(st.session_state.opt_history).to_csv(CSV_FILE, index=False)
+    }
+    opt_state["opt_history"] = append_compact(opt_state["opt_history"], row)
 
+    # Locked single-row append instead of rewriting the whole file
+    if append_row(CSV_FILE, row, list(row), key=("time",)):
+        mmap_append("momentum", row, row["time"])
 
-# Auto update once per refresh
-update_option_history()
+    save_checkpoint("digidashboard", {
+        "open": {k: opt_state[k] for k in ("open_spot", "open_ce", "open_pe")},
+        "seen": seen_fingerprints("digidashboard."),
+    }, today, force=first)
 
 
 # -----------------------------------------------------
 # DISPLAY OPTION MOMENTUM
 # -----------------------------------------------------
-if st.session_state.opt_history:
-    df_opt = pd.DataFrame(st.session_state.opt_history)
-    df_opt["time"] = pd.to_datetime(df_opt["time"], utc=True).dt.tz_convert("Asia/Kolkata")
+chart_minutes, chart_points = zoom_controls("momentum")
+
+
+@st.fragment
+def momentum_section(chart_minutes, chart_points):
+    rerun_on_publish(chain_updates("NIFTY"))
+
+    # Update once per new snapshot (dedup by fingerprint inside)
+    update_option_history()
 
-    st.line_chart(df_opt.set_index("time")[["spot_delta", "ce_delta", "pe_delta"]])
-    st.dataframe(df_opt.tail(20))
+    opt_arr = query_day("momentum", today)  # memory-mapped slice, no per-rerun parsing
+
+    if len(opt_arr) or not opt_state["opt_history"].empty:
+        df_opt = compact(to_frame(opt_arr)) if len(opt_arr) else opt_state["opt_history"]
+
+        chart = chart_frame("digi.momentum", df_opt, ["spot_delta", "ce_delta", "pe_delta"], df_opt["ts"], chart_points, chart_minutes)
+        st.line_chart(chart.set_index(timestamps(chart))[["spot_delta", "ce_delta", "pe_delta"]])
+        tail = df_opt.tail(20)
+        st.dataframe(tail.drop(columns="ts").set_index(clock(tail).rename("time")))
+
+
+momentum_section(chart_minutes, chart_points)
 
 st.markdown("---")
 
@@ -256,82 +338,131 @@ st.markdown("---")
 # -----------------------------------------------------
 st.header("📊 ATM 5 Strike OI Tracker")
 
-OI_FILE = "oi_history_change.csv"
+OI_FILE = OI_HISTORY_FILE  # shared with the other OI dashboards (locked appends)
 
 
 def load_oi_history():
-    if os.path.exists(OI_FILE):
-        df = pd.read_csv(OI_FILE)
-        return df
-    return pd.DataFrame(columns=["date","time","CE_change","PE_change","CE_OI_total","PE_OI_total"])
-
-
-oi_history = load_oi_history()
+    arr = query("oi")  # whole memory-mapped series, no text parsing
+    if len(arr):
+        return compact(to_frame(arr))
+    return compact(read_history(OI_FILE, columns=OI_COLUMNS))
 
 
 def fetch_oi():
     try:
-        return session.get("https://www.nseindia.com/api/option-chain-indices?symbol=NIFTY", timeout=5).json()
+        return option_chain("NIFTY")
     except:
         return None
 
 
-data_oi = fetch_oi()
-
-if data_oi:
-    records = data_oi["records"]["data"]
-    expiry = data_oi["records"]["expiryDates"][0]
-    underlying = data_oi["records"]["underlyingValue"]
-
-    rows = []
-    for r in records:
-        if r.get("expiryDate") == expiry:
-            ce = r.get("CE", {})
-            pe = r.get("PE", {})
-            rows.append({
-                "strike": r["strikePrice"],
-                "CE_change": ce.get("changeinOpenInterest", 0),
-                "PE_change": pe.get("changeinOpenInterest", 0),
-                "CE_OI": ce.get("openInterest", 0),
-                "PE_OI": pe.get("openInterest", 0),
-                "diff": abs(r["strikePrice"] - underlying)
-            })
-
-    df_atm = pd.DataFrame(rows).sort_values("diff").head(5)
-    st.write("### ATM 5 OI Table")
-    st.dataframe(df_atm)
-
-    snap = {
-        "date": str(today),
-        "time": datetime.now(IST).strftime("%H:%M"),
-        "CE_change": df_atm["CE_change"].sum(),
-        "PE_change": df_atm["PE_change"].sum(),
-        "CE_OI_total": df_atm["CE_OI"].sum(),
-        "PE_OI_total": df_atm["PE_OI"].sum()
-    }
-
-    oi_history = pd.concat([oi_history, pd.DataFrame([snap])], ignore_index=True)
-    oi_history.to_csv(OI_FILE, index=False)
+def build_atm_oi(payload, n=5):
+    return atm_oi_table(payload.chain(), n)
 
-    st.metric("CE Change (ATM 5)", snap["CE_change"])
-    st.metric("PE Change (ATM 5)", snap["PE_change"])
 
+def render_oi_charts(oi_history):
+    rendered = []
+    labels = clock(oi_history)
 
     # Change OI Chart
-    st.write("### 📈 Change in OI (CE vs PE)")
-    plt.figure(figsize=(10, 4))
-    plt.plot(oi_history["time"], oi_history["CE_change"], marker='o', label="CE Change")
-    plt.plot(oi_history["time"], oi_history["PE_change"], marker='o', label="PE Change")
+    fig = plt.figure(figsize=(10, 4))
+    plt.plot(labels, oi_history["CE_change"], marker='o', label="CE Change")
+    plt.plot(labels, oi_history["PE_change"], marker='o', label="PE Change")
     plt.grid(True)
     plt.legend()
-    st.pyplot(plt)
-
+    rendered.append(("### 📈 Change in OI (CE vs PE)", fig))
 
     # Total OI Chart
-    st.write("### 📉 Total OI (CE vs PE)")
-    plt.figure(figsize=(10, 4))
-    plt.plot(oi_history["time"], oi_history["CE_OI_total"], marker='o', label="CE Total OI")
-    plt.plot(oi_history["time"], oi_history["PE_OI_total"], marker='o', label="PE Total OI")
+    fig = plt.figure(figsize=(10, 4))
+    plt.plot(labels, oi_history["CE_OI_total"], marker='o', label="CE Total OI")
+    plt.plot(labels, oi_history["PE_OI_total"], marker='o', label="PE Total OI")
     plt.grid(True)
     plt.legend()
-    st.pyplot(plt)
+    rendered.append(("### 📉 Total OI (CE vs PE)", fig))
+
+    for i, (title, fig) in enumerate(rendered):
+        buf = io.BytesIO()
+        fig.savefig(buf, format="png")
+        plt.close(fig)
+        rendered[i] = (title, buf.getvalue())
+    return rendered
+
+
+strike_count = st.sidebar.selectbox("Strikes around ATM (OI table)", STRIKE_WINDOWS)
+
+
+@st.fragment
+def oi_section(strike_count):
+    rerun_on_publish(chain_updates("NIFTY"))
+    oi_history = load_oi_history()
+    payload_oi = fetch_oi()
+
+    if payload_oi:
+        # Unchanged payload → no re-aggregation, no history row, no redraw.
+        # History always sums ATM 5; the table follows the sidebar window.
+        df_atm = derived("digidashboard.atm5", payload_oi, build_atm_oi)
+        df_window = derived(f"digidashboard.atm{strike_count}", payload_oi, lambda p: build_atm_oi(p, strike_count))
+        st.write(f"### ATM {strike_count} OI Table")
+        st.dataframe(df_window)
+
+        stamp = payload_oi.exchange_time(IST) or datetime.now(IST)
+        snap = {
+            "date": str(stamp.date()),
+            "time": stamp.strftime("%H:%M:%S"),
+            "CE_change": df_atm["CE_change"].sum(),
+            "PE_change": df_atm["PE_change"].sum(),
+            "CE_OI_total": df_atm["CE_OI"].sum(),
+            "PE_OI_total": df_atm["PE_OI"].sum()
+        }
+
+        if is_capture_window() and is_new_payload("digidashboard.oi", payload_oi):
+            # Locked append; skipped if another dashboard already wrote this timestamp
+            if append_row(OI_FILE, snap, OI_COLUMNS):
+                mmap_append("oi", snap, (snap["date"], snap["time"]))
+                oi_history = append_compact(oi_history, snap)
+
+        st.metric("CE Change (ATM 5)", snap["CE_change"])
+        st.metric("PE Change (ATM 5)", snap["PE_change"])
+
+        # Keyed on the history length too: another viewer may append rows under the same payload
+        for title, png in derived(f"digidashboard.charts.{len(oi_history)}", payload_oi, lambda _: render_oi_charts(oi_history)):
+            st.write(title)
+            st.image(png)
+    return oi_history
+
+
+oi_history = oi_section(strike_count)
+
+st.markdown("---")
+
+
+# -----------------------------------------------------
+# MULTI-DAY COMPARISON (SAME TIME OF DAY, PRECOMPUTED DAILY INDEX)
+# -----------------------------------------------------
+st.header("📅 Today vs Previous Days")
+
+@st.fragment
+def compare_section():
+    rerun_on_publish(chain_updates("NIFTY"))
+    profiles = load_profiles()  # data/daily_profiles.npz, re-read only when rebuilt
+
+    if not profiles.days:
+        st.info("No past days indexed yet. Run `python eod_summary.py` (or `python daily_profiles.py`) after the close.")
+    else:
+        c1, c2 = st.columns([2, 1])
+        metric = c1.selectbox("Series", list(PROFILE_METRICS), format_func=PROFILE_METRICS.get, key="compare.metric")
+        n_days = c2.slider("Past days", 1, min(60, len(profiles.days)), min(5, len(profiles.days)), key="compare.days")
+
+        live = today_profile(today)
+        st.line_chart(compare_frame(profiles, metric, n_days, today, live))
+
+        slot, now_value, past, rank = at_slot(profiles, metric, n_days, current_slot(), today, live)
+        label = slot_labels()[slot]
+        m1, m2, m3 = st.columns(3)
+        m1.metric(f"Today at {label}", "—" if pd.isna(now_value) else f"{now_value:,.1f}")
+        m2.metric(f"Median of {past.count()} days at {label}", "—" if not past.count() else f"{past.median():,.1f}")
+        m3.metric("Today's percentile", "—" if rank is None else f"{rank:.0f}")
+
+
+compare_section()
+
+st.sidebar.caption(f"History in memory: {frame_bytes(opt_state['opt_history'], oi_history) / 1024:.1f} KB")
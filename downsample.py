@@ -0,0 +1,94 @@
+import numpy as np
+from cachetools import LRUCache
+
+# -------------------------------------------------
+# Chart Downsampling (min/max buckets, bounded points)
+# -------------------------------------------------
+# `points` is a per-series budget (two per pixel column of the chart) however
+# long the history is. Rows are split into equal buckets and each bucket
+# keeps its first row plus the rows holding every series' min and max, so
+# spikes survive and lines keep their shape. The bucket count does not shrink
+# with the number of series: a 42-line chart gets the same time resolution
+# as a 3-line one, and the frame grows to at most ~(2k + 1) / 3 × points
+# rows for k series. Results are cached per (chart, data version, range,
+# width), so a zoom level someone already viewed is not recomputed until new
+# data lands.
+
+MAX_POINTS = 4000
+CHART_WIDTHS = (600, 900, 1200, 1600, 2000)   # px; two points per pixel column
+VISIBLE_RANGES = {"Full history": None, "Last 2 h": 120, "Last 1 h": 60, "Last 30 min": 30}
+
+_cache = LRUCache(maxsize=64)
+
+
+def chart_points(width=1200):
+    return min(2 * int(width), MAX_POINTS)
+
+
+def minmax_indices(values, points):
+    """Sorted row indices keeping each bucket's first row and every column's min/max.
+
+    `points` budgets each column: (points - 1) // 3 buckets, so one column
+    alone yields <= points rows and k columns <= min(n, buckets * (2k + 1) + 1).
+    """
+    values = np.asarray(values, dtype=float)
+    if values.ndim == 1:
+        values = values[:, None]
+    n, k = values.shape
+    buckets = max((points - 1) // 3, 1)  # first + min + max per bucket and column
+    if n <= points:
+        return np.arange(n)
+    edges = np.linspace(0, n, buckets + 1).astype(int)
+    width = int(np.diff(edges).max())
+    rows = edges[:-1, None] + np.arange(width)[None, :]          # (buckets, width)
+    valid = rows < edges[1:, None]
+    rows = np.minimum(rows, n - 1)
+
+    block = values[rows]                                         # (buckets, width, k)
+    missing = ~valid[..., None] | np.isnan(block)
+    lo = np.where(missing, np.inf, block).argmin(axis=1)         # (buckets, k)
+    hi = np.where(missing, -np.inf, block).argmax(axis=1)
+    picked = np.concatenate([
+        edges[:-1],
+        np.take_along_axis(rows, lo, axis=1).ravel(),
+        np.take_along_axis(rows, hi, axis=1).ravel(),
+        [n - 1],
+    ])
+    return np.unique(picked)
+
+
+def visible_slice(x, minutes=None):
+    """(lo, hi) rows of ascending epoch-second `x` within the last `minutes` (None = all)."""
+    if minutes is None or not len(x):
+        return 0, len(x)
+    return int(np.searchsorted(x, x[-1] - minutes * 60, "left")), len(x)
+
+
+def chart_frame(key, df, columns, x, points=None, minutes=None):
+    """`df[columns]` cut to the visible range and min/max-downsampled to ~points rows per column.
+
+    `x` is epoch seconds per row (e.g. df["ts"]); the last x and the row
+    count version the cache, so append-only history recomputes once per tick.
+    """
+    x = np.asarray(x)
+    points = points or chart_points()
+    version = (len(x), int(x[-1]) if len(x) else None)
+    cache_key = (key, version, minutes, points, tuple(columns))
+    hit = _cache.get(cache_key)
+    if hit is not None:
+        return hit
+    lo, hi = visible_slice(x, minutes)
+    view = df.iloc[lo:hi]
+    keep = minmax_indices(view[columns].to_numpy(dtype=float), points)
+    out = view.iloc[keep]
+    _cache[cache_key] = out
+    return out
+
+
+def zoom_controls(key="chart"):
+    """Streamlit sidebar: visible range + chart width → (minutes, points)."""
+    import streamlit as st
+
+    label = st.sidebar.selectbox("Chart range", list(VISIBLE_RANGES), key=f"{key}.range")
+    width = st.sidebar.select_slider("Chart width (px)", CHART_WIDTHS, value=1200, key=f"{key}.width")
+    return VISIBLE_RANGES[label], chart_points(width)
@@ -0,0 +1,138 @@
+import argparse
+import glob
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+from daily_profiles import PROFILES_FILE, build as build_profiles
+from history_store import OI_HISTORY_FILE, OI_COLUMNS, read_history
+from option_metrics import strike_decision
+
+# -------------------------------------------------
+# End-of-Day Aggregation
+# -------------------------------------------------
+# python eod_summary.py [--rebuild] [--workers N] [--include-today]
+#
+# One row per trading day in data/daily_index.csv, computed in parallel from
+# data/atm_compare_{day}.csv, data/nifty_data_{day}.csv and the shared
+# oi_history_change.csv. Days already in the index are skipped unless --rebuild;
+# a row for today (--include-today) is recomputed on every run.
+# The same-time-of-day profiles (daily_profiles.py) are rebuilt afterwards.
+
+DATA_DIR = "data"
+DAILY_INDEX = os.path.join(DATA_DIR, "daily_index.csv")
+DAY_FILE_RE = re.compile(r"(?:atm_compare|nifty_data)_(\d{4}-\d{2}-\d{2})\.csv$")
+
+
+def _ohlc(prefix, s):
+    s = pd.to_numeric(s, errors="coerce").dropna()
+    if s.empty:
+        return {}
+    return {f"{prefix}_open": s.iloc[0], f"{prefix}_high": s.max(),
+            f"{prefix}_low": s.min(), f"{prefix}_close": s.iloc[-1]}
+
+
+def _flip_count(diff):
+    sign = np.sign(diff[diff != 0])
+    return int((sign[1:] != sign[:-1]).sum()) if len(sign) > 1 else 0
+
+
+def summarize_day(day, oi_rows):
+    """Summary dict for one day; runs in a worker process."""
+    out = {"date": day}
+
+    atm_path = os.path.join(DATA_DIR, f"atm_compare_{day}.csv")
+    if os.path.exists(atm_path):
+        atm = pd.read_csv(atm_path)
+        out["atm_points"] = len(atm)
+        for col, prefix in (("NIFTY", "spot"), ("CE", "ce"), ("PE", "pe")):
+            if col in atm.columns:
+                out.update(_ohlc(prefix, atm[col]))
+        if {"ce_open", "pe_open"} <= out.keys():
+            straddle_open = out["ce_open"] + out["pe_open"]
+            straddle_close = out["ce_close"] + out["pe_close"]
+            out["premium_decay"] = straddle_close - straddle_open
+            out["premium_decay_pct"] = (straddle_close / straddle_open - 1) * 100 if straddle_open else None
+            out["decision"] = strike_decision(out["ce_open"], out["ce_close"], out["pe_open"], out["pe_close"])
+
+    mom_path = os.path.join(DATA_DIR, f"nifty_data_{day}.csv")
+    if os.path.exists(mom_path):
+        mom = pd.read_csv(mom_path)
+        out["momentum_points"] = len(mom)
+        for col in ("spot_delta", "ce_delta", "pe_delta"):
+            if col in mom.columns and not mom.empty:
+                out[f"{col}_close"] = mom[col].iloc[-1]
+
+    if oi_rows:
+        oi = pd.DataFrame(oi_rows)
+        ce = pd.to_numeric(oi["CE_change"], errors="coerce").fillna(0).to_numpy()
+        pe = pd.to_numeric(oi["PE_change"], errors="coerce").fillna(0).to_numpy()
+        out["oi_points"] = len(oi)
+        out["CE_change_close"] = ce[-1]
+        out["PE_change_close"] = pe[-1]
+        out["sentiment_close"] = "BULLISH" if ce[-1] > pe[-1] else "BEARISH"
+        out["sentiment_flips"] = _flip_count(ce - pe)
+
+    return out
+
+
+def discover_days():
+    days = set()
+    for path in glob.glob(os.path.join(DATA_DIR, "*.csv")):
+        m = DAY_FILE_RE.search(os.path.basename(path))
+        if m:
+            days.add(m.group(1))
+    return days
+
+
+def run(rebuild=False, workers=None, include_today=False):
+    oi = read_history(OI_HISTORY_FILE, columns=OI_COLUMNS)
+    oi_by_day = {str(d): g.to_dict("records") for d, g in oi.groupby("date")} if not oi.empty else {}
+
+    today = str(date.today())
+    days = discover_days() | set(oi_by_day)
+    if not include_today:
+        days.discard(today)  # today's session is still moving
+
+    index = pd.read_csv(DAILY_INDEX) if os.path.exists(DAILY_INDEX) and not rebuild else pd.DataFrame()
+    # A row for today (from --include-today) was a partial session: never reuse it
+    stale = not index.empty and (index["date"].astype(str) >= today).any()
+    if stale:
+        index = index[index["date"].astype(str) < today]
+    done = set(index["date"].astype(str)) if not index.empty else set()
+    todo = sorted(days - done)
+    if not todo and not stale:
+        return index
+
+    rows = []
+    if todo:
+        with ProcessPoolExecutor(max_workers=workers) as pool:  # defaults to all cores
+            rows = list(pool.map(summarize_day, todo, [oi_by_day.get(d, []) for d in todo], chunksize=8))
+
+    index = pd.concat([index, pd.DataFrame(rows)], ignore_index=True).sort_values("date")
+    os.makedirs(DATA_DIR, exist_ok=True)
+    tmp = DAILY_INDEX + ".tmp"
+    index.to_csv(tmp, index=False)
+    os.replace(tmp, DAILY_INDEX)
+    return index
+
+
+def load_daily_index():
+    if not os.path.exists(DAILY_INDEX):
+        return pd.DataFrame()
+    return pd.read_csv(DAILY_INDEX)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the per-day summary index")
+    parser.add_argument("--rebuild", action="store_true", help="recompute every day")
+    parser.add_argument("--workers", type=int, default=None, help="process count (default: all cores)")
+    parser.add_argument("--include-today", action="store_true")
+    args = parser.parse_args()
+    index = run(args.rebuild, args.workers, args.include_today)
+    print(f"{len(index)} days in {DAILY_INDEX}")
+    print(f"{build_profiles(args.include_today)} days in {PROFILES_FILE}")
@@ -0,0 +1,185 @@
+import json
+import os
+import sys
+from datetime import datetime, date, time as dt_time, timedelta
+
+import numpy as np
+import pandas as pd
+
+from history_store import locked
+from market_calendar import IST
+
+# -------------------------------------------------
+# Memory-Mapped Binary History
+# -------------------------------------------------
+# Fixed-width records (epoch-second int64 timestamp + int32/float32 columns)
+# after a small JSON header. Files are append-only and time-ordered, so a
+# date range is two np.searchsorted calls on a read-only np.memmap: no text
+# parsing and no copy until a caller asks for a DataFrame.
+
+DATA_DIR = "data"
+MAGIC = b"DIGIHIST"
+HEADER_SIZE = 256
+
+SERIES = {
+    # ATM-5 OI change / totals (oi_history_change.csv)
+    "oi": [("ts", "<i8"), ("CE_change", "<i4"), ("PE_change", "<i4"),
+           ("CE_OI_total", "<i4"), ("PE_OI_total", "<i4")],
+    # ATM normalized momentum (data/nifty_data_*.csv)
+    "momentum": [("ts", "<i8"), ("spot_delta", "<f4"), ("ce_delta", "<f4"), ("pe_delta", "<f4")],
+    # ATM raw prices (data/atm_compare_*.csv)
+    "atm": [("ts", "<i8"), ("NIFTY", "<f4"), ("CE", "<f4"), ("PE", "<f4")],
+}
+
+
+def series_path(series):
+    return os.path.join(DATA_DIR, f"{series}.bin")
+
+
+def _dtype(series):
+    return np.dtype(SERIES[series])
+
+
+def _write_header(f, series):
+    meta = json.dumps({"series": series, "fields": SERIES[series]}).encode()
+    f.write((MAGIC + meta).ljust(HEADER_SIZE, b"\0"))
+
+
+def to_epoch(value):
+    """datetime / ISO string / (date, time) strings → epoch seconds (naive = IST)."""
+    if isinstance(value, (int, np.integer)):
+        return int(value)
+    if isinstance(value, tuple):
+        value = f"{value[0]} {value[1]}"
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    if isinstance(value, date) and not isinstance(value, datetime):
+        value = datetime.combine(value, dt_time(0))
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=IST)
+    return int(value.timestamp())
+
+
+# -------------------------------------------------
+# Write
+# -------------------------------------------------
+def append(series, row, ts):
+    """Append one record; ignored unless `ts` is newer than the last record."""
+    os.makedirs(DATA_DIR, exist_ok=True)
+    path = series_path(series)
+    dtype = _dtype(series)
+    rec = np.zeros(1, dtype=dtype)
+    rec["ts"] = to_epoch(ts)
+    for name in dtype.names[1:]:
+        v = row.get(name)
+        rec[name] = 0 if v is None or v != v else v
+
+    with locked(path):
+        if not os.path.exists(path) or os.path.getsize(path) < HEADER_SIZE:
+            with open(path, "wb") as f:
+                _write_header(f, series)
+        with open(path, "r+b") as f:
+            size = f.seek(0, os.SEEK_END)
+            n = (size - HEADER_SIZE) // dtype.itemsize
+            if n:
+                f.seek(HEADER_SIZE + (n - 1) * dtype.itemsize)
+                last = np.frombuffer(f.read(dtype.itemsize), dtype=dtype)
+                if last["ts"][0] >= rec["ts"][0]:
+                    return False
+            f.seek(HEADER_SIZE + n * dtype.itemsize)  # overwrites any torn trailing bytes
+            f.write(rec.tobytes())
+        return True
+
+
+# -------------------------------------------------
+# Read
+# -------------------------------------------------
+_maps = {}
+
+
+def open_series(series):
+    """Read-only memmap of every complete record (re-mapped when the file grows)."""
+    path = series_path(series)
+    if not os.path.exists(path):
+        return np.zeros(0, dtype=_dtype(series))
+    dtype = _dtype(series)
+    n = (os.path.getsize(path) - HEADER_SIZE) // dtype.itemsize
+    cached = _maps.get(path)
+    if cached is None or cached[0] != n:
+        arr = np.memmap(path, dtype=dtype, mode="r", offset=HEADER_SIZE, shape=(n,)) if n > 0 \
+            else np.zeros(0, dtype=dtype)
+        _maps[path] = cached = (n, arr)
+    return cached[1]
+
+
+def query(series, start=None, end=None):
+    """Records with start <= ts < end as a zero-copy view."""
+    arr = open_series(series)
+    ts = arr["ts"]
+    lo = 0 if start is None else np.searchsorted(ts, to_epoch(start), "left")
+    hi = len(arr) if end is None else np.searchsorted(ts, to_epoch(end), "left")
+    return arr[lo:hi]
+
+
+def query_day(series, day):
+    day = date.fromisoformat(str(day))
+    return query(series, day, day + timedelta(days=1))
+
+
+def to_frame(arr, clock=False):
+    """DataFrame with tz-aware "time"; clock=True adds "date"/"time" strings like the CSVs."""
+    df = pd.DataFrame({name: arr[name] for name in arr.dtype.names[1:]})
+    stamps = pd.to_datetime(np.asarray(arr["ts"]), unit="s", utc=True).tz_convert(IST)
+    if clock:
+        df.insert(0, "date", stamps.strftime("%Y-%m-%d"))
+        df.insert(1, "time", stamps.strftime("%H:%M:%S"))
+    else:
+        df.insert(0, "time", stamps)
+    return df
+
+
+# -------------------------------------------------
+# Backfill from CSV
+# -------------------------------------------------
+def import_csv(series, csv_path):
+    """python history_mmap.py import <series> <csv> — merge existing CSV history."""
+    df = pd.read_csv(csv_path)
+    if "date" in df.columns:
+        # Older rows carry "%H:%M", newer ones "%H:%M:%S": parse each row on its own
+        stamps = pd.to_datetime(df["date"].astype(str) + " " + df["time"].astype(str), errors="coerce", format="mixed")
+    else:
+        stamps = pd.to_datetime(df["time"], errors="coerce", utc=True, format="mixed")
+    if stamps.dt.tz is None:
+        stamps = stamps.dt.tz_localize(IST)
+    df = df[stamps.notna()]
+    stamps = stamps[stamps.notna()]
+
+    dtype = _dtype(series)
+    incoming = np.zeros(len(df), dtype=dtype)
+    incoming["ts"] = stamps.astype("int64") // 10**9
+    for name in dtype.names[1:]:
+        if name in df.columns:
+            incoming[name] = pd.to_numeric(df[name], errors="coerce").fillna(0).to_numpy()
+
+    os.makedirs(DATA_DIR, exist_ok=True)
+    path = series_path(series)
+    with locked(path):
+        existing = np.array(open_series(series))
+        merged = np.concatenate([existing, incoming])
+        merged = merged[np.argsort(merged["ts"], kind="stable")]
+        _, first = np.unique(merged["ts"], return_index=True)  # existing rows win on ties
+        merged = merged[first]
+        tmp = f"{path}.tmp{os.getpid()}"
+        with open(tmp, "wb") as f:
+            _write_header(f, series)
+            f.write(merged.tobytes())
+        _maps.pop(path, None)
+        os.replace(tmp, path)
+    return len(merged) - len(existing)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 4 and sys.argv[1] == "import":
+        print(f"imported {import_csv(sys.argv[2], sys.argv[3])} records into {series_path(sys.argv[2])}")
+    else:
+        print("usage: python history_mmap.py import <oi|momentum|atm> <file.csv>")
@@ -0,0 +1,95 @@
+import numpy as np
+import pandas as pd
+
+from market_calendar import IST
+
+# -------------------------------------------------
+# Compact Dtype Policy for In-Memory History
+# -------------------------------------------------
+# Every history frame kept in memory goes through compact(): epoch-second
+# int64 "ts" instead of date/time strings, int32 OI, float32 prices and
+# categorical labels. Display code turns "ts" back into clock labels or
+# timestamps only when it draws.
+
+CATEGORY_COLUMNS = {"date", "expiry", "expiryDate", "symbol", "source"}
+TIME_COLUMNS = ("timestamp", "time")
+
+
+def column_dtype(name):
+    if name == "ts":
+        return "int64"
+    if name in CATEGORY_COLUMNS:
+        return "category"
+    if "OI" in name or name.endswith("_change") or name in ("openInterest", "changeinOpenInterest"):
+        return "int32"
+    return "float32"  # prices, deltas, spot
+
+
+def _epoch(df):
+    if "date" in df.columns and "time" in df.columns:
+        # Writers differ in clock precision ("%H:%M" and "%H:%M:%S"): parse each row on its own
+        stamps = pd.to_datetime(df["date"].astype(str) + " " + df["time"].astype(str), errors="coerce", format="mixed")
+    else:
+        col = next(c for c in TIME_COLUMNS if c in df.columns)
+        stamps = df[col]
+        if not pd.api.types.is_datetime64_any_dtype(stamps):
+            stamps = pd.to_datetime(stamps, errors="coerce", utc=True, format="mixed")
+    if stamps.dt.tz is None:
+        stamps = stamps.dt.tz_localize(IST)
+    return (stamps.astype("int64") // 10**9).astype("int64")
+
+
+def compact(df):
+    """Copy of `df` with "ts" (int64 epoch seconds) and policy dtypes; time strings dropped."""
+    if df is None or df.empty:
+        return pd.DataFrame({"ts": np.zeros(0, dtype="int64")})
+    out = {}
+    if "ts" not in df.columns and any(c in df.columns for c in TIME_COLUMNS):
+        out["ts"] = _epoch(df).to_numpy()
+    for name in df.columns:
+        if name in TIME_COLUMNS or (name == "date" and "ts" in out):
+            continue
+        kind = column_dtype(name)
+        col = df[name]
+        if kind == "category":
+            out[name] = col.astype("category")
+        elif kind == "int64":
+            out[name] = col.astype("int64").to_numpy()
+        else:
+            num = pd.to_numeric(col, errors="coerce")
+            if num.isna().sum() > col.isna().sum():
+                out[name] = col  # free text (e.g. decisions) stays as is
+            else:
+                out[name] = num.fillna(0).astype(kind).to_numpy() if kind == "int32" else num.astype(kind).to_numpy()
+    frame = pd.DataFrame(out)
+    if "ts" in frame.columns:
+        frame = frame[frame["ts"] > 0].reset_index(drop=True)  # unparseable times
+    return frame
+
+
+def append_compact(df, row):
+    """`df` plus one row (dict), keeping the compact dtypes."""
+    new = compact(pd.DataFrame([row]))
+    if df is None or df.empty:
+        return new
+    out = pd.concat([df, new], ignore_index=True)
+    for name in df.columns:
+        kind = df[name].dtype
+        if out[name].dtype != kind:  # concat widens on mismatched categories / missing values
+            out[name] = out[name].astype(column_dtype(name)) if kind != "int32" else out[name].fillna(0).astype(kind)
+    return out
+
+
+def timestamps(df):
+    """tz-aware IST timestamps for "ts" (chart index)."""
+    return pd.to_datetime(df["ts"], unit="s", utc=True).dt.tz_convert(IST)
+
+
+def clock(df, fmt="%H:%M:%S"):
+    """Clock labels for "ts" (matplotlib x-axis, tables)."""
+    return timestamps(df).dt.strftime(fmt)
+
+
+def frame_bytes(*frames):
+    """Deep memory of the given frames in bytes."""
+    return int(sum(f.memory_usage(deep=True).sum() for f in frames if f is not None))
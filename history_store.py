@@ -0,0 +1,149 @@
+import csv
+import io
+import os
+import time
+from contextlib import contextmanager
+
+import pandas as pd
+
+# -------------------------------------------------
+# Shared History Store (multi-process safe CSV)
+# -------------------------------------------------
+# Writers take an exclusive lock on a sidecar "<file>.lock" and append one
+# complete line; they never rewrite the file in place. Readers take no lock:
+# they only parse up to the last newline, so a half-written row is never
+# seen. Schema migrations rewrite to a temp file and os.replace() it.
+
+OI_HISTORY_FILE = "oi_history_change.csv"
+OI_COLUMNS = ["date", "time", "CE_change", "PE_change", "CE_OI_total", "PE_OI_total"]
+
+LOCK_TIMEOUT = 10          # seconds
+DEDUP_TAIL_BYTES = 64 * 1024
+
+if os.name == "nt":
+    import msvcrt
+
+    def _lock(f):
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+
+    def _unlock(f):
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+else:
+    import fcntl
+
+    def _lock(f):
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+
+    def _unlock(f):
+        fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+@contextmanager
+def locked(path, timeout=LOCK_TIMEOUT):
+    deadline = time.monotonic() + timeout
+    with open(path + ".lock", "a+b") as f:
+        while True:
+            try:
+                _lock(f)
+                break
+            except OSError:
+                if time.monotonic() > deadline:
+                    raise TimeoutError(f"could not lock {path} within {timeout}s")
+                time.sleep(0.01)
+        try:
+            yield
+        finally:
+            _unlock(f)
+
+
+def _read_header(path):
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
+        return None
+    with open(path, newline="") as f:
+        return next(csv.reader(f), None)
+
+
+def _tail_lines(path, nbytes=DEDUP_TAIL_BYTES):
+    with open(path, "rb") as f:
+        f.seek(0, os.SEEK_END)
+        f.seek(max(0, f.tell() - nbytes))
+        chunk = f.read()
+    return chunk.decode("utf-8", "replace").splitlines()[1:]  # header or a partial row
+
+
+def _migrate(path, columns):
+    """Rewrite with a wider header (atomic replace), keeping existing rows."""
+    df = pd.read_csv(path)
+    df = df.reindex(columns=columns)
+    tmp = f"{path}.tmp{os.getpid()}"
+    df.to_csv(tmp, index=False)
+    os.replace(tmp, path)
+
+
+def append_row(path, row, columns, key=("date", "time")):
+    """Append `row` unless a row with the same key is already in the file's tail.
+
+    Returns True when the row was written.
+    """
+    with locked(path):
+        header = _read_header(path)
+        if header is None:
+            with open(path, "w", newline="") as f:
+                csv.writer(f, lineterminator="\n").writerow(columns)
+            header = list(columns)
+        elif any(c not in header for c in columns):
+            columns_all = header + [c for c in columns if c not in header]
+            _migrate(path, columns_all)
+            header = columns_all
+
+        if key:
+            idx = [header.index(k) for k in key]
+            want = [str(row.get(k, "")) for k in key]
+            for rec in csv.reader(_tail_lines(path)):
+                if len(rec) == len(header) and [rec[i] for i in idx] == want:
+                    return False
+
+        line = io.StringIO()
+        csv.writer(line, lineterminator="\n").writerow(["" if row.get(c) is None else row.get(c) for c in header])
+        with open(path, "a", newline="") as f:
+            f.write(line.getvalue())  # one write per complete row
+            f.flush()
+            os.fsync(f.fileno())
+        return True
+
+
+def read_history(path, columns=None, day=None):
+    """Lock-free read of all complete rows (optionally only `day`)."""
+    if not os.path.exists(path):
+        return pd.DataFrame(columns=columns or [])
+    with open(path, "rb") as f:
+        data = f.read()
+    data = data[: data.rfind(b"\n") + 1]  # ignore a row still being written
+    if not data.strip():
+        return pd.DataFrame(columns=columns or [])
+    df = pd.read_csv(io.BytesIO(data))
+    if columns is not None:
+        df = df.reindex(columns=columns)
+    if day is not None and "date" in df.columns:
+        df = df[df["date"].astype(str) == str(day)].reset_index(drop=True)
+    return df
+
+
+def tail_history(path, offset=0):
+    """Rows appended since byte `offset`; returns (rows as dicts, new offset)."""
+    if not os.path.exists(path):
+        return [], 0
+    header = _read_header(path)
+    with open(path, "rb") as f:
+        if offset > os.path.getsize(path):
+            offset = 0  # file was replaced by a migration
+        f.seek(offset)
+        data = f.read()
+    end = data.rfind(b"\n") + 1
+    lines = data[:end].decode("utf-8").splitlines()
+    if offset == 0:
+        lines = lines[1:]
+    rows = [dict(zip(header, rec)) for rec in csv.reader(lines)]
+    return rows, offset + end
@@ -0,0 +1,253 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+from nse_payload import EXCHANGE_TS_FORMAT
+from option_metrics import DECISIONS, decision_codes, strike_decisions
+
+# -------------------------------------------------
+# Incremental Intraday Indicators
+# -------------------------------------------------
+# One update per new option-chain snapshot, vectorized over every strike of
+# the expiry: premium VWAP from traded-volume increments, OI velocity and
+# acceleration (contracts/minute), price-vs-OI buildup and the day-open
+# decision. State is a handful of arrays, so nothing is ever recomputed from
+# the first/last rows of the full history.
+
+INDICATOR_FIELDS = ("lastPrice", "openInterest", "totalTradedVolume")
+
+BUILDUP = np.array(["Long Buildup", "Short Buildup", "Short Covering", "Long Unwinding", "Neutral"])
+
+
+def buildup(price_change, oi_change):
+    """Vectorized price-vs-OI classification."""
+    return BUILDUP[np.select(
+        [(price_change > 0) & (oi_change > 0), (price_change < 0) & (oi_change > 0),
+         (price_change > 0) & (oi_change < 0), (price_change < 0) & (oi_change < 0)],
+        [0, 1, 2, 3], default=4)]
+
+
+def _align(old_strikes, values, strikes):
+    """Re-key per-strike `values` onto `strikes` (NaN for strikes not seen before)."""
+    out = np.full(len(strikes), np.nan)
+    if len(old_strikes):
+        pos = np.searchsorted(old_strikes, strikes).clip(0, len(old_strikes) - 1)
+        hit = old_strikes[pos] == strikes
+        out[hit] = values[pos[hit]]
+    return out
+
+
+class _Leg:
+    STATE = ("open_price", "open_oi", "oi", "velocity", "volume", "pv", "vol")
+
+    def __init__(self):
+        for name in self.STATE:
+            setattr(self, name, np.zeros(0))
+
+    def realign(self, old_strikes, strikes):
+        for name in self.STATE:
+            setattr(self, name, _align(old_strikes, getattr(self, name), strikes))
+
+    def update(self, price, oi, volume, minutes):
+        first = np.isnan(self.open_price)
+        self.open_price = np.where(first, price, self.open_price)
+        self.open_oi = np.where(first, oi, self.open_oi)
+
+        # VWAP: price weighted by the volume traded since the last snapshot
+        traded = np.nan_to_num(volume - self.volume).clip(min=0)
+        traded = np.where(np.isnan(self.volume), np.nan_to_num(volume), traded)
+        self.pv = np.nan_to_num(self.pv) + np.nan_to_num(price) * traded
+        self.vol = np.nan_to_num(self.vol) + traded
+        self.volume = volume
+
+        velocity = (oi - self.oi) / minutes if minutes else np.full(len(oi), np.nan)
+        accel = (velocity - self.velocity) / minutes if minutes else np.full(len(oi), np.nan)
+        self.oi, self.velocity = oi, velocity
+
+        with np.errstate(invalid="ignore", divide="ignore"):
+            vwap = np.where(self.vol > 0, self.pv / self.vol, np.nan)
+        return {
+            "vwap": vwap,
+            "oi_velocity": velocity,
+            "oi_accel": accel,
+            "buildup": buildup(price - self.open_price, oi - self.open_oi),
+        }
+
+
+class ChainIndicators:
+    """Per-expiry indicator state; call update() once per new snapshot."""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self, day=None):
+        self.day = day
+        self.strikes = np.zeros(0)
+        self.last_ts = None
+        self.legs = {"CE": _Leg(), "PE": _Leg()}
+        self.frame = pd.DataFrame()
+
+    def update(self, chain, stamp):
+        """`chain` is one expiry from Payload.chain(fields=INDICATOR_FIELDS); returns the per-strike frame."""
+        if stamp.date() != self.day:
+            self.reset(stamp.date())
+
+        strikes = chain["strike"]
+        if not np.array_equal(strikes, self.strikes):
+            for leg in self.legs.values():
+                leg.realign(self.strikes, strikes)
+            self.strikes = strikes
+
+        minutes = (stamp - self.last_ts).total_seconds() / 60 if self.last_ts else 0
+        self.last_ts = stamp
+
+        cols = {"strike": strikes.astype(int)}
+        for name, leg in self.legs.items():
+            out = leg.update(chain[f"{name}_lastPrice"], chain[f"{name}_openInterest"],
+                             chain[f"{name}_totalTradedVolume"], minutes)
+            cols[f"{name}_price"] = chain[f"{name}_lastPrice"]
+            for k, v in out.items():
+                cols[f"{name}_{k}"] = v
+
+        ce, pe = self.legs["CE"], self.legs["PE"]
+        cols["decision"] = strike_decisions(ce.open_price, chain["CE_lastPrice"], pe.open_price, chain["PE_lastPrice"])
+        self.frame = pd.DataFrame(cols)
+        return self.frame
+
+    def window(self, strikes):
+        """Rows of the latest frame for the given strikes."""
+        return self.frame[self.frame["strike"].isin(strikes)].reset_index(drop=True)
+
+
+# -------------------------------------------------
+# Full-Chain Decision Grid
+# -------------------------------------------------
+# Premiums of every (expiry, strike) kept as one row per snapshot in a
+# growable 2-D buffer. A decision over any window is two row lookups and one
+# vectorized decision_codes() call, so the whole chain costs about the same
+# as five strikes.
+
+DECISION_WINDOWS = {"Day (open → now)": None, "60 min": 60, "30 min": 30, "15 min": 15}
+
+
+def _expiry_days(expiry):
+    return (datetime.strptime(expiry, EXCHANGE_TS_FORMAT.split()[0]) - datetime(1970, 1, 1)).days
+
+
+class DecisionGrid:
+    def __init__(self, capacity=512):
+        self.capacity = capacity
+        self.reset()
+
+    def reset(self, day=None):
+        self.day = day
+        self.keys = np.zeros(0, dtype=np.int64)       # expiry days * 1e6 + strike, sorted
+        self.ts = np.zeros(self.capacity, dtype=np.int64)
+        self.ce = np.full((self.capacity, 0), np.nan, dtype=np.float32)
+        self.pe = np.full((self.capacity, 0), np.nan, dtype=np.float32)
+        self.rows = 0
+
+    def _grow(self, keys):
+        union = np.union1d(self.keys, keys)
+        if len(union) != len(self.keys):
+            pos = np.searchsorted(union, self.keys)
+            for name in ("ce", "pe"):
+                grown = np.full((self.capacity, len(union)), np.nan, dtype=np.float32)
+                grown[:, pos] = getattr(self, name)
+                setattr(self, name, grown)
+            self.keys = union
+        if self.rows == self.capacity:
+            self.capacity *= 2
+            self.ts = np.resize(self.ts, self.capacity)
+            for name in ("ce", "pe"):
+                old = getattr(self, name)
+                grown = np.full((self.capacity, old.shape[1]), np.nan, dtype=np.float32)
+                grown[:self.rows] = old[:self.rows]
+                setattr(self, name, grown)
+
+    def __getstate__(self):
+        # Checkpoints keep the filled rows only, not the spare capacity
+        state = dict(self.__dict__)
+        for name in ("ts", "ce", "pe"):
+            state[name] = getattr(self, name)[:self.rows].copy()
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        spare = self.capacity - self.rows
+        self.ts = np.concatenate([self.ts, np.zeros(spare, dtype=np.int64)])
+        for name in ("ce", "pe"):
+            filled = getattr(self, name)
+            setattr(self, name, np.vstack([filled, np.full((spare, filled.shape[1]), np.nan, dtype=np.float32)]))
+
+    def update(self, decoded, stamp):
+        """`decoded` is Payload.chain(expiries=None, fields=("lastPrice",))."""
+        if stamp.date() != self.day:
+            self.reset(stamp.date())
+        parts = [(_expiry_days(e) * 1_000_000 + c["strike"].astype(np.int64), c["CE_lastPrice"], c["PE_lastPrice"])
+                 for e, c in decoded["chains"].items()]
+        if not parts:
+            return
+        keys = np.concatenate([p[0] for p in parts])
+        self._grow(keys)
+        pos = np.searchsorted(self.keys, keys)
+        self.ts[self.rows] = int(stamp.timestamp())
+        self.ce[self.rows, pos] = np.concatenate([p[1] for p in parts])
+        self.pe[self.rows, pos] = np.concatenate([p[2] for p in parts])
+        self.rows += 1
+
+    def codes(self, minutes=None):
+        """Decision code per key over the last `minutes` (None = since the day's first snapshot)."""
+        if self.rows == 0:
+            return np.zeros(0, dtype=int)
+        end = self.rows - 1
+        start = 0 if minutes is None else int(np.searchsorted(self.ts[:self.rows], self.ts[end] - minutes * 60))
+        start = min(start, max(end - 1, 0))
+        # A strike that first quoted inside the window starts from its first quote
+        ce0 = self._first_valid(self.ce, start, end)
+        pe0 = self._first_valid(self.pe, start, end)
+        return decision_codes(ce0, self.ce[end], pe0, self.pe[end])
+
+    def _first_valid(self, arr, start, end):
+        block = arr[start:end + 1]
+        first = np.argmax(~np.isnan(block), axis=0)
+        return block[first, np.arange(block.shape[1])]
+
+    def heatmap(self, minutes=None, strikes=None):
+        """(expiries, strikes, code matrix) with -1 for no data; `strikes` limits the columns."""
+        codes = self.codes(minutes)
+        days, strike_of = self.keys // 1_000_000, self.keys % 1_000_000
+        expiry_days = np.unique(days)
+        cols = np.unique(strike_of) if strikes is None else np.asarray(sorted(strikes), dtype=np.int64)
+        grid = np.full((len(expiry_days), len(cols)), -1)
+        row = np.searchsorted(expiry_days, days)
+        col = np.searchsorted(cols, strike_of).clip(0, max(len(cols) - 1, 0))
+        hit = (cols[col] == strike_of) if len(cols) else np.zeros(len(codes), bool)
+        grid[row[hit], col[hit]] = codes[hit]
+        expiries = [(datetime(1970, 1, 1) + timedelta(days=int(d))).strftime("%d-%b-%Y") for d in expiry_days]
+        return expiries, cols, grid
+
+
+def render_decision_heatmap(expiries, strikes, grid, atm=None):
+    """PNG bytes: expiries × strikes coloured by decision."""
+    import io
+    import matplotlib.pyplot as plt
+    from matplotlib.colors import ListedColormap
+    from matplotlib.patches import Patch
+
+    colors = ["#f0f0f0", "#f4a261", "#2a9d8f", "#e63946", "#8e44ad", "#bdbdbd"]  # no data + DECISIONS order
+    fig, ax = plt.subplots(figsize=(max(8, len(strikes) * 0.35), max(2.5, len(expiries) * 0.35 + 1.5)))
+    ax.imshow(grid + 1, cmap=ListedColormap(colors), vmin=0, vmax=len(colors) - 1, aspect="auto")
+    ax.set_xticks(range(len(strikes)), [str(k) for k in strikes], rotation=90, fontsize=7)
+    ax.set_yticks(range(len(expiries)), expiries, fontsize=7)
+    if atm is not None and len(strikes):
+        ax.axvline(int(np.abs(np.asarray(strikes) - atm).argmin()), color="black", lw=1, ls="--")
+    labels = ["No data"] + [d.split(" ", 1)[1] for d in DECISIONS]
+    ax.legend(handles=[Patch(color=c, label=l) for c, l in zip(colors, labels)],
+              loc="upper center", bbox_to_anchor=(0.5, -0.25), ncol=3, fontsize=7)
+    fig.tight_layout()
+    buf = io.BytesIO()
+    fig.savefig(buf, format="png", dpi=110)
+    plt.close(fig)
+    return buf.getvalue()
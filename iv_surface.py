@@ -0,0 +1,146 @@
+from collections import deque
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from nse_payload import EXCHANGE_TS_FORMAT
+
+# -------------------------------------------------
+# Implied-Volatility Surface (strike × expiry)
+# -------------------------------------------------
+# Each expiry slice is a weighted quadratic smile in log-moneyness fitted to
+# the out-of-the-money leg's impliedVolatility. update() refits only slices
+# whose quotes changed; interpolated points are cached per slice until its
+# next refit. Every update appends a small snapshot (ATM IV, skew, fit
+# coefficients per expiry) to the surface history.
+
+IV_FIELDS = ("impliedVolatility", "lastPrice")
+MONEYNESS_BAND = 0.15      # |ln(K/S)| kept for fitting
+MIN_POINTS = 4
+SKEW_WIDTH = 0.05          # ±5% moneyness for the skew query
+HISTORY_SIZE = 2000
+
+
+def days_to_expiry(expiry, now):
+    close = datetime.strptime(expiry, EXCHANGE_TS_FORMAT.split()[0]).replace(hour=15, minute=30)
+    return max((close - now.replace(tzinfo=None)).total_seconds() / 86400, 0.0)
+
+
+def otm_iv(chain, spot):
+    """One IV per strike: PE below spot, CE at/above, falling back to the other leg; 0 → NaN."""
+    ce = np.where(chain["CE_impliedVolatility"] > 0, chain["CE_impliedVolatility"], np.nan)
+    pe = np.where(chain["PE_impliedVolatility"] > 0, chain["PE_impliedVolatility"], np.nan)
+    otm, itm = np.where(chain["strike"] < spot, pe, ce), np.where(chain["strike"] < spot, ce, pe)
+    return np.where(np.isnan(otm), itm, otm)
+
+
+class Slice:
+    def __init__(self, expiry):
+        self.expiry = expiry
+        self.inputs = None          # (strikes, iv) last fitted
+        self.coef = None            # iv(k) = a*k^2 + b*k + c, k = ln(K/ref)
+        self.ref = None             # fixed per slice, so spot moves alone never force a refit
+        self.points = None
+        self._cache = {}
+
+    def fit(self, strikes, iv, spot):
+        """Refit if the quotes changed; returns True when a refit happened."""
+        if self.inputs is not None and np.array_equal(self.inputs[1], iv, equal_nan=True) \
+                and np.array_equal(self.inputs[0], strikes):
+            return False
+        self.inputs, self._cache = (strikes, iv), {}
+        self.ref = self.ref or spot
+        k = np.log(strikes / self.ref)
+        ok = ~np.isnan(iv) & (np.abs(k) <= MONEYNESS_BAND)
+        self.points = (strikes[ok], iv[ok])
+        if ok.sum() < MIN_POINTS:
+            self.coef = None
+        else:
+            # Weight strikes near the money more heavily
+            self.coef = np.polyfit(k[ok], iv[ok], 2, w=1 / (1 + 10 * np.abs(k[ok])))
+        return True
+
+    def iv(self, strike):
+        if self.coef is None:
+            return np.nan
+        hit = self._cache.get(strike)
+        if hit is None:
+            if len(self._cache) > 4096:
+                self._cache.clear()
+            hit = self._cache[strike] = float(np.polyval(self.coef, np.log(strike / self.ref)))
+        return hit
+
+    def curve(self, strikes):
+        """Fitted IV for many strikes (vectorized)."""
+        strikes = np.asarray(strikes, dtype=float)
+        if self.coef is None:
+            return np.full(len(strikes), np.nan)
+        return np.polyval(self.coef, np.log(strikes / self.ref))
+
+
+class IVSurface:
+    def __init__(self, history_size=HISTORY_SIZE):
+        self.day = None
+        self.slices = {}
+        self.spot = None
+        self.stamp = None
+        self.refits = 0
+        self.history = deque(maxlen=history_size)
+
+    def update(self, decoded, stamp):
+        """`decoded` is Payload.chain(expiries=None, fields=IV_FIELDS); returns refitted expiries."""
+        if stamp.date() != self.day:
+            self.day = stamp.date()
+            self.slices.clear()
+            self.history.clear()
+        self.spot, self.stamp = decoded["underlyingValue"], stamp
+        refit = []
+        for expiry, chain in decoded["chains"].items():
+            s = self.slices.get(expiry) or self.slices.setdefault(expiry, Slice(expiry))
+            if s.fit(chain["strike"], otm_iv(chain, self.spot), self.spot):
+                refit.append(expiry)
+        for expiry in set(self.slices) - set(decoded["chains"]):
+            del self.slices[expiry]  # expired
+        self.refits += len(refit)
+        self.history.append({"time": stamp, "spot": self.spot, "slices": {
+            e: {"atm_iv": s.iv(self.spot), "skew": self.skew(e), "coef": None if s.coef is None else tuple(s.coef)}
+            for e, s in self.slices.items()
+        }})
+        return refit
+
+    # -------------------------------------------------
+    # Queries
+    # -------------------------------------------------
+    def iv(self, strike, expiry):
+        s = self.slices.get(expiry)
+        return s.iv(strike) if s else np.nan
+
+    def skew(self, expiry, width=SKEW_WIDTH):
+        """IV(put wing) − IV(call wing) at ±width log-moneyness (> 0 = put skew)."""
+        s = self.slices.get(expiry)
+        if s is None or s.coef is None:
+            return np.nan
+        return s.iv(self.spot * np.exp(-width)) - s.iv(self.spot * np.exp(width))
+
+    def smile(self, expiry, strikes=None):
+        """DataFrame of market and fitted IV for one expiry."""
+        s = self.slices[expiry]
+        points_k, points_iv = s.points if s.points is not None else (np.zeros(0), np.zeros(0))
+        strikes = points_k if strikes is None else np.asarray(strikes, dtype=float)
+        market = pd.Series(points_iv, index=points_k)
+        return pd.DataFrame({"strike": strikes, "market_iv": market.reindex(strikes).to_numpy(),
+                             "fitted_iv": s.curve(strikes)})
+
+    def term_structure(self, now=None):
+        """ATM IV and skew per expiry, nearest first."""
+        now = now or self.stamp
+        rows = [{"expiry": e, "days": days_to_expiry(e, now), "atm_iv": s.iv(self.spot), "skew": self.skew(e)}
+                for e, s in self.slices.items()]
+        return pd.DataFrame(rows, columns=["expiry", "days", "atm_iv", "skew"]).sort_values("days").reset_index(drop=True)
+
+    def history_frame(self, expiry):
+        """ATM IV / skew of one expiry over the stored snapshots."""
+        rows = [{"time": h["time"], "spot": h["spot"], **h["slices"][expiry]}
+                for h in self.history if expiry in h["slices"]]
+        return pd.DataFrame(rows, columns=["time", "spot", "atm_iv", "skew", "coef"])
@@ -0,0 +1,102 @@
+import threading
+import time
+from datetime import datetime
+
+from market_calendar import IST, poll_interval, seconds_until_next_poll
+from pubsub import hub
+
+# -------------------------------------------------
+# Background Live Feed
+# -------------------------------------------------
+# One poller thread per process feeds every viewer. Dashboards read the
+# latest tick/history instead of fetching and sleeping in the script thread.
+# Every new tick is also published to pubsub.hub under the feed's name.
+
+DEFAULT_INTERVAL = 30      # seconds mid-session when no viewer asks for faster
+REQUEST_TTL = 120          # forget a viewer's requested interval after this
+
+SKIP = object()            # fetch() result meaning "nothing new" (not an error)
+
+
+class LiveFeed:
+    def __init__(self, fetch, interval=DEFAULT_INTERVAL, name="live-feed"):
+        self.fetch = fetch              # () -> dict tick, SKIP, or None on failure
+        self.interval = interval
+        self.name = name
+        self.history = []
+        self.latest = None
+        self.version = 0
+        self.error = None
+        self._requests = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+            self._thread.start()
+        return self
+
+    def restore(self, history):
+        """Seed history/latest from a checkpoint (call before start())."""
+        with self._lock:
+            self.history = list(history)
+            self.latest = self.history[-1] if self.history else None
+            self.version += bool(self.history)
+        if self.latest is not None:
+            hub.publish(self.name, self.latest)  # keep the hub topic's version in step with self.version
+
+    def request_interval(self, viewer, seconds):
+        """A viewer asks for data at least every `seconds` (fastest request wins)."""
+        with self._lock:
+            faster = seconds < self._base_interval()
+            self._requests[viewer] = (seconds, time.monotonic())
+        if faster:
+            self._wake.set()
+
+    def _base_interval(self):
+        cutoff = time.monotonic() - REQUEST_TTL
+        live = [s for s, seen in self._requests.values() if seen >= cutoff]
+        return min(live, default=self.interval)
+
+    def snapshot(self):
+        """(version, latest tick, history list) — history is shared, do not mutate."""
+        with self._lock:
+            return self.version, self.latest, self.history
+
+    def _run(self):
+        while True:
+            with self._lock:
+                base = self._base_interval()
+            wait = poll_interval(base=base)
+            if wait is None:
+                # Market closed: idle until the next session
+                self._wake.wait(seconds_until_next_poll())
+                self._wake.clear()
+                continue
+
+            try:
+                tick = self.fetch()
+                self.error = None if tick is not None else "fetch failed"
+            except Exception as e:  # keep the thread alive on any fetch error
+                tick, self.error = None, str(e)
+
+            if tick is SKIP:
+                self.error = None
+            elif tick is not None:
+                self._publish(tick)
+
+            self._wake.wait(wait)
+            self._wake.clear()
+
+    def _publish(self, tick):
+        tick.setdefault("time", datetime.now(IST))
+        with self._lock:
+            if self.history and self.history[-1]["time"].date() != tick["time"].date():
+                self.history = []  # new trading day
+            # Copy-on-write so readers holding the old list never see it change
+            self.history = self.history + [tick]
+            self.latest = tick
+            self.version += 1
+        hub.publish(self.name, tick)
@@ -0,0 +1,576 @@
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+from collections import Counter
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+
+from market_calendar import EXPIRY_WEEKDAY, IST
+from nse_payload import EXCHANGE_TS_FORMAT
+from scenarios import bs_price
+
+# -------------------------------------------------
+# Concurrent-Viewer Load Test
+# -------------------------------------------------
+# For each dashboard script and each viewer count N: a fresh headless
+# `streamlit run` server (own working directory, NSE/BSE base URLs pointed
+# at a local stand-in), N websocket viewers that behave like browser tabs
+# (first load, fragment auto-reruns, a manual rerun every few seconds) and a
+# sampler for the server's CPU and RSS. The stand-in counts every upstream
+# request. The capacity report lists latency percentiles, CPU, memory and
+# upstream load per N, and the largest N that stays within the SLO.
+#
+#   python loadtest.py --viewers 1,5,10,25 --duration 60
+#   python loadtest.py --scripts option.py DigiDashboard.py --slo 2.0 --latency 150
+
+DEFAULT_SCRIPTS = ("option.py", "digidashboard.py", "DigiDashboard.py", "option_BuyerSeller.py",
+                   "nifty_dashboard.py", "nifty_dashboard_OICIO.py")
+SLO_SECONDS = 2.0          # p95 of a viewer's manual rerun
+CPU_BUDGET = 85.0          # % of one core (script runs share the GIL)
+SAMPLE_EVERY = 0.5         # seconds between server CPU/RSS samples
+STARTUP_TIMEOUT = 60
+
+# -------------------------------------------------
+# Local NSE / BSE Stand-in
+# -------------------------------------------------
+# A random-walk market that changes every `tick` seconds. Bodies are built
+# once per tick, so like NSE, polling in between returns the same bytes.
+
+STRIKE_STEP = 50
+STRIKES_EACH_SIDE = 40
+N_EXPIRIES = 3
+# Real symbols where the dashboards ask for them by name (watchlists), fillers elsewhere
+NIFTY_MEMBERS = ("RELIANCE", "HDFCBANK", "BHARTIARTL", "TCS", "ICICIBANK", "SBIN", "INFY", "ITC", "LT", "HINDUNILVR",
+                 "KOTAKBANK", "AXISBANK", "BAJFINANCE", "MARUTI", "SUNPHARMA") + tuple(f"NSTK{i:02d}" for i in range(35))
+BANK_MEMBERS = ("HDFCBANK", "ICICIBANK", "SBIN", "KOTAKBANK", "AXISBANK", "INDUSINDBK", "BANKBARODA", "PNB",
+                "FEDERALBNK", "IDFCFIRSTB", "AUBANK", "CANBK")
+
+
+def _expiries(today, n=N_EXPIRIES):
+    first = today + timedelta(days=(EXPIRY_WEEKDAY - today.weekday()) % 7)
+    return [first + timedelta(weeks=i) for i in range(n)]
+
+
+class Market:
+    def __init__(self, tick=5.0, seed=7):
+        self.tick = tick
+        self.rng = random.Random(seed)
+        self.spot = {"NIFTY": 25000.0, "BANKNIFTY": 56000.0, "SENSEX": 82000.0}
+        self.open = dict(self.spot)
+        self.members = {"NIFTY 50": NIFTY_MEMBERS, "NIFTY BANK": BANK_MEMBERS}
+        self.prices = {s: self.rng.uniform(100, 3000) for names in self.members.values() for s in names}
+        self.prices_open = dict(self.prices)
+        self.version = None
+        self._bodies = {}
+        self._lock = threading.Lock()
+
+    def _advance(self):
+        version = int(time.time() // self.tick)
+        if version == self.version:
+            return
+        steps = 1 if self.version is None else min(version - self.version, 100)
+        for _ in range(steps):
+            for k in self.spot:
+                self.spot[k] *= math.exp(self.rng.gauss(0, 0.0008))
+            for s in self.prices:
+                self.prices[s] *= math.exp(self.rng.gauss(0, 0.0015))
+        self.version, self._bodies = version, {}
+
+    def body(self, kind, key=""):
+        with self._lock:
+            self._advance()
+            hit = self._bodies.get((kind, key))
+            if hit is None:
+                hit = self._bodies[(kind, key)] = json.dumps(getattr(self, "_" + kind)(key)).encode()
+            return hit
+
+    def _stamp(self, fmt=EXCHANGE_TS_FORMAT):
+        return datetime.now(IST).strftime(fmt)
+
+    def _chain(self, symbol):
+        spot = self.spot.get(symbol, self.spot["NIFTY"])
+        now = datetime.now(IST).replace(tzinfo=None)
+        atm = round(spot / STRIKE_STEP) * STRIKE_STEP
+        strikes = atm + STRIKE_STEP * np.arange(-STRIKES_EACH_SIDE, STRIKES_EACH_SIDE + 1)
+        m = np.log(strikes / spot)
+        rows, expiries = [], []
+        for j, day in enumerate(_expiries(now.date())):
+            expiry = day.strftime("%d-%b-%Y")
+            expiries.append(expiry)
+            years = max((datetime.combine(day, datetime.min.time()).replace(hour=15, minute=30) - now).total_seconds(), 0) / 86400 / 365
+            iv = 12 + 2 * j + 40 * m * m - 8 * m
+            ce, pe = bs_price("CE", spot, strikes, years, iv / 100), bs_price("PE", spot, strikes, years, iv / 100)
+            for i, k in enumerate(strikes):
+                near = math.exp(-abs(m[i]) * 30)
+                legs = {}
+                for leg, price in (("CE", ce[i]), ("PE", pe[i])):
+                    oi = int(5000 + 100000 * near * self.rng.uniform(0.8, 1.2))
+                    legs[leg] = {"strikePrice": int(k), "expiryDate": expiry, "underlying": symbol,
+                                 "openInterest": oi, "changeinOpenInterest": int(oi * self.rng.uniform(-0.1, 0.2)),
+                                 "totalTradedVolume": int(oi * self.rng.uniform(1, 5)),
+                                 "impliedVolatility": round(float(iv[i]), 2), "lastPrice": round(float(price), 2),
+                                 "change": round(self.rng.uniform(-5, 5), 2), "underlyingValue": round(spot, 2)}
+                rows.append({"strikePrice": int(k), "expiryDate": expiry, **legs})
+        return {"records": {"expiryDates": expiries, "data": rows, "timestamp": self._stamp(),
+                            "underlyingValue": round(spot, 2), "strikePrices": strikes.tolist()},
+                "filtered": {"data": [r for r in rows if r["expiryDate"] == expiries[0]]}}
+
+    def _index(self, name, key):
+        last, openp = self.spot[key], self.open[key]
+        return {"index": name, "indexSymbol": name, "last": round(last, 2), "open": round(openp, 2),
+                "high": round(max(last, openp), 2), "low": round(min(last, openp), 2),
+                "previousClose": round(openp, 2), "percentChange": round((last / openp - 1) * 100, 2)}
+
+    def _allIndices(self, _):
+        return {"timestamp": self._stamp(), "data": [self._index("NIFTY 50", "NIFTY"), self._index("NIFTY BANK", "BANKNIFTY")]}
+
+    def _member(self, symbol):
+        last, openp = self.prices[symbol], self.prices_open[symbol]
+        return {"symbol": symbol, "open": round(openp, 2), "dayHigh": round(max(last, openp), 2),
+                "dayLow": round(min(last, openp), 2), "lastPrice": round(last, 2), "previousClose": round(openp, 2),
+                "pChange": round((last / openp - 1) * 100, 2), "totalTradedValue": 1e9, "meta": {"companyName": symbol.title()}}
+
+    def _constituents(self, index):
+        key = "BANKNIFTY" if index == "NIFTY BANK" else "NIFTY"
+        head = {"priority": 1, "symbol": index, "open": self.open[key], "lastPrice": round(self.spot[key], 2)}
+        return {"name": index, "timestamp": self._stamp(), "data": [head] + [self._member(s) for s in self.members.get(index, [])]}
+
+    def _equity(self, symbol):
+        q = self._member(symbol) if symbol in self.prices else {"lastPrice": 1000.0, "open": 1000.0}
+        return {"priceInfo": {"lastPrice": q["lastPrice"], "open": q["open"]},
+                "metadata": {"symbol": symbol, "lastUpdateTime": self._stamp()}}
+
+    def _sensex(self, _):
+        last, openp = self.spot["SENSEX"], self.open["SENSEX"]
+        return {"Sensex": {"Curvalue": round(last, 2), "Openvalue": round(openp, 2),
+                           "Dttm": datetime.now(IST).strftime("%d %b %Y %H:%M:%S")}}
+
+
+class StandIn:
+    """The stand-in HTTP server: one Market, a per-endpoint request Counter and optional added latency."""
+
+    def __init__(self, market, latency=0.0, port=0):
+        self.market = market
+        self.latency = latency
+        self.counts = Counter()
+        self._lock = threading.Lock()
+        self.server = ThreadingHTTPServer(("127.0.0.1", port), self._handler())
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, name="nse-standin", daemon=True).start()
+        return self
+
+    def snapshot(self):
+        with self._lock:
+            return Counter(self.counts)
+
+    def _handler(self):
+        standin = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                q = {k: v[0] for k, v in parse_qs(url.query).items()}
+                with standin._lock:
+                    standin.counts[url.path] += 1
+                if standin.latency:
+                    time.sleep(standin.latency)
+                market = standin.market
+                routes = {
+                    "/api/option-chain-indices": lambda: market.body("chain", q.get("symbol", "NIFTY")),
+                    "/api/allIndices": lambda: market.body("allIndices"),
+                    "/api/equity-stockIndices": lambda: market.body("constituents", q.get("index", "NIFTY 50")),
+                    "/api/quote-equity": lambda: market.body("equity", q.get("symbol", "")),
+                    "/BseIndiaAPI/api/MktStat1/w": lambda: market.body("sensex"),
+                }
+                if url.path in ("/", "/option-chain"):
+                    self._send(b"<html><body><table><tr><th>Strike</th></tr><tr><td>25000</td></tr></table></body></html>",
+                               "text/html", cookie="nsit=loadtest; Path=/")
+                elif url.path in routes:
+                    self._send(routes[url.path](), "application/json")
+                else:
+                    self._send(b'{"error":"not found"}', "application/json", status=404)
+
+            def _send(self, body, content_type, status=200, cookie=None):
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                if cookie:
+                    self.send_header("Set-Cookie", cookie)
+                self.end_headers()
+                self.wfile.write(body)
+
+        return Handler
+
+
+# -------------------------------------------------
+# Dashboard Server (one headless streamlit process per step)
+# -------------------------------------------------
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _proc_usage(pid):
+    """(cpu seconds, rss bytes) of a process, from psutil when installed, else /proc (Linux)."""
+    try:
+        import psutil
+        p = psutil.Process(pid)
+        t = p.cpu_times()
+        return t.user + t.system, p.memory_info().rss
+    except ImportError:
+        pass
+    with open(f"/proc/{pid}/stat") as f:
+        fields = f.read().rsplit(")", 1)[1].split()
+    cpu = (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+    with open(f"/proc/{pid}/statm") as f:
+        rss = int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    return cpu, rss
+
+
+class DashboardServer:
+    def __init__(self, script, standin_url):
+        self.script = os.path.abspath(script)
+        self.port = _free_port()
+        self.workdir = tempfile.mkdtemp(prefix="loadtest-")  # fresh CSVs, history and checkpoints
+        self.log = open(os.path.join(self.workdir, "streamlit.log"), "w")
+        env = {**os.environ, "NSE_HOME": standin_url, "BSE_HOME": standin_url,
+               "BSE_API": standin_url + "/BseIndiaAPI/api", "MPLBACKEND": "Agg"}
+        for name in ("PUBSUB_URL", "DASH_PROFILE", "ALERT_WEBHOOK"):
+            env.pop(name, None)
+        self.proc = subprocess.Popen(
+            [sys.executable, "-m", "streamlit", "run", self.script, "--server.headless", "true",
+             "--server.address", "127.0.0.1", "--server.port", str(self.port),
+             "--server.fileWatcherType", "none", "--browser.gatherUsageStats", "false"],
+            cwd=self.workdir, env=env, stdout=self.log, stderr=subprocess.STDOUT)
+        self.samples = []               # (monotonic, cpu seconds, rss bytes)
+        self._halt = threading.Event()
+
+    @property
+    def ws_url(self):
+        return f"ws://127.0.0.1:{self.port}/_stcore/stream"
+
+    def wait_ready(self, timeout=STARTUP_TIMEOUT):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self.proc.poll() is not None:
+                raise RuntimeError(f"streamlit exited with {self.proc.returncode}; see {self.log.name}")
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{self.port}/_stcore/health", timeout=1) as r:
+                    if r.status == 200:
+                        return self
+            except OSError:
+                time.sleep(0.2)
+        raise RuntimeError(f"streamlit not ready after {timeout}s; see {self.log.name}")
+
+    def start_sampling(self):
+        def run():
+            while not self._halt.wait(SAMPLE_EVERY):
+                try:
+                    self.samples.append((time.monotonic(), *_proc_usage(self.proc.pid)))
+                except (OSError, ValueError, IndexError):
+                    return
+        self._sampler = threading.Thread(target=run, name="proc-sampler", daemon=True)
+        self._sampler.start()
+
+    def usage(self):
+        """Average / p95 CPU (% of one core) and peak RSS (MB) over the sampled span."""
+        if len(self.samples) < 2:
+            return {"cpu_avg": None, "cpu_p95": None, "rss_peak_mb": None}
+        t, cpu, rss = (np.array(col, dtype=float) for col in zip(*self.samples))
+        pct = np.diff(cpu) / np.diff(t) * 100
+        return {"cpu_avg": round(float((cpu[-1] - cpu[0]) / (t[-1] - t[0]) * 100), 1),
+                "cpu_p95": round(float(np.percentile(pct, 95)), 1), "rss_peak_mb": round(float(rss.max()) / 2**20, 1)}
+
+    def stop(self, keep=False):
+        self._halt.set()
+        self.proc.terminate()
+        try:
+            self.proc.wait(10)
+        except subprocess.TimeoutExpired:
+            self.proc.kill()
+        self.log.close()
+        if not keep:
+            shutil.rmtree(self.workdir, ignore_errors=True)
+
+
+# -------------------------------------------------
+# Headless Viewer (Streamlit websocket protocol)
+# -------------------------------------------------
+# Behaves like a browser tab: requests the first run, reruns fragments at the
+# interval the server announces (auto_rerun), and asks for a full rerun every
+# `rerun_every` seconds. Runs the server starts on its own (st.rerun after a
+# pubsub publish) are counted as pushes.
+
+class Viewer:
+    def __init__(self, url, rerun_every=10.0):
+        self.url = url
+        self.rerun_every = rerun_every
+        self.first_load = None
+        self.reruns = []                # seconds from our rerun request to script_finished
+        self.run_times = []             # server seconds per full run (new_session → finished)
+        self.fragment_runs = 0
+        self.pushes = 0
+        self.exceptions = 0
+        self.error_alerts = 0
+        self.failed = None
+
+    async def run(self, until):
+        from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+        from tornado.websocket import websocket_connect
+
+        self._until = until
+        try:
+            self._ws = await websocket_connect(self.url, subprotocols=["streamlit"], max_message_size=256 * 2**20)
+        except Exception as e:
+            self.failed = f"connect: {e}"
+            return
+        self._fragments = {}
+        started = time.monotonic()
+        requested = started
+        await self._rerun()
+        run_start, next_rerun = None, None
+        finished_status = ForwardMsg.ScriptFinishedStatus
+        try:
+            while True:
+                timeout = until - time.monotonic()
+                if next_rerun is not None and requested is None:
+                    timeout = min(timeout, next_rerun - time.monotonic())
+                if timeout <= 0:
+                    if time.monotonic() >= until:
+                        break
+                    requested = time.monotonic()
+                    await self._rerun()
+                    continue
+                try:
+                    raw = await asyncio.wait_for(self._ws.read_message(), timeout)
+                except asyncio.TimeoutError:
+                    continue
+                if raw is None:
+                    self.failed = "connection closed"
+                    break
+                msg = ForwardMsg()
+                msg.ParseFromString(raw)
+                kind = msg.WhichOneof("type")
+                now = time.monotonic()
+                if kind == "new_session":
+                    if not msg.new_session.fragment_ids_this_run:
+                        run_start = now
+                        if requested is None:
+                            self.pushes += 1
+                        self._cancel_fragments()  # a full run re-announces its fragments
+                elif kind == "delta" and msg.delta.WhichOneof("type") == "new_element":
+                    element = msg.delta.new_element.WhichOneof("type")
+                    if element == "exception":
+                        self.exceptions += 1
+                    elif element == "alert" and msg.delta.new_element.alert.format == 1:  # Alert.ERROR
+                        self.error_alerts += 1
+                elif kind == "auto_rerun":
+                    fid = msg.auto_rerun.fragment_id
+                    if fid not in self._fragments:
+                        self._fragments[fid] = asyncio.ensure_future(self._auto_rerun(fid, msg.auto_rerun.interval))
+                elif kind == "script_finished":
+                    status = msg.script_finished
+                    if status == finished_status.FINISHED_FRAGMENT_RUN_SUCCESSFULLY:
+                        self.fragment_runs += 1
+                    elif status == finished_status.FINISHED_SUCCESSFULLY and run_start is not None:
+                        self.run_times.append(now - run_start)
+                        if self.first_load is None:
+                            self.first_load = now - started
+                        elif requested is not None:
+                            self.reruns.append(now - requested)
+                        requested, run_start = None, None
+                        next_rerun = now + self.rerun_every if self.rerun_every else None
+        except Exception as e:
+            self.failed = f"{type(e).__name__}: {e}"
+        finally:
+            self._cancel_fragments()
+            self._ws.close()
+
+    async def _rerun(self, fragment_id=None):
+        from streamlit.proto.BackMsg_pb2 import BackMsg
+
+        msg = BackMsg()
+        msg.rerun_script.query_string = ""
+        msg.rerun_script.page_script_hash = ""
+        if fragment_id:
+            msg.rerun_script.fragment_id = fragment_id
+            msg.rerun_script.is_auto_rerun = True
+        await self._ws.write_message(msg.SerializeToString(), binary=True)
+
+    async def _auto_rerun(self, fragment_id, interval):
+        while time.monotonic() + interval < self._until:
+            await asyncio.sleep(interval)
+            await self._rerun(fragment_id)
+
+    def _cancel_fragments(self):
+        for task in self._fragments.values():
+            task.cancel()
+        self._fragments = {}
+
+
+async def _drive(viewers, duration, ramp):
+    until = time.monotonic() + duration
+    tasks = []
+    for i, v in enumerate(viewers):
+        if ramp and i:
+            await asyncio.sleep(ramp / len(viewers))
+        tasks.append(asyncio.ensure_future(v.run(until)))
+    await asyncio.gather(*tasks)
+
+
+# -------------------------------------------------
+# Steps, Summary and Report
+# -------------------------------------------------
+def _pct(values, q):
+    return round(float(np.percentile(values, q)), 3) if values else None
+
+
+def run_step(script, n, standin, duration, rerun_every, ramp, keep=False):
+    server = DashboardServer(script, standin.url)
+    try:
+        server.wait_ready()
+        before = standin.snapshot()
+        server.start_sampling()
+        viewers = [Viewer(server.ws_url, rerun_every) for _ in range(n)]
+        asyncio.run(_drive(viewers, duration, ramp))
+        upstream = standin.snapshot() - before
+    finally:
+        server.stop(keep)
+
+    reruns = [x for v in viewers for x in v.reruns]
+    minutes = duration / 60
+    return {
+        "script": os.path.basename(script), "viewers": n, "duration": duration,
+        "reruns": len(reruns), "p50": _pct(reruns, 50), "p90": _pct(reruns, 90),
+        "p95": _pct(reruns, 95), "p99": _pct(reruns, 99),
+        "first_load_p50": _pct([v.first_load for v in viewers if v.first_load is not None], 50),
+        "run_time_p50": _pct([x for v in viewers for x in v.run_times], 50),
+        "fragment_runs_per_min": round(sum(v.fragment_runs for v in viewers) / minutes, 1),
+        "pushes": sum(v.pushes for v in viewers),
+        "exceptions": sum(v.exceptions for v in viewers),
+        "error_alerts": sum(v.error_alerts for v in viewers),
+        "failed_viewers": [v.failed for v in viewers if v.failed],
+        **server.usage(),
+        "upstream_per_min": round(sum(upstream.values()) / minutes, 1),
+        "upstream": dict(upstream),
+        "workdir": server.workdir if keep else None,
+    }
+
+
+def breach(result, slo=SLO_SECONDS, cpu_budget=CPU_BUDGET):
+    """Why a step is over capacity (None when within it)."""
+    if result["failed_viewers"]:
+        return f"{len(result['failed_viewers'])} viewer(s) failed"
+    if result["exceptions"]:
+        return f"{result['exceptions']} exception(s) rendered"
+    if result["p95"] is None:
+        return "no rerun completed"
+    if result["p95"] > slo:
+        return f"p95 rerun {result['p95']:.2f}s > {slo:.2f}s"
+    if result["cpu_avg"] is not None and result["cpu_avg"] > cpu_budget:
+        return f"CPU {result['cpu_avg']:.0f}% > {cpu_budget:.0f}% of one core"
+    return None
+
+
+def _fmt(v, spec=".2f"):
+    return "—" if v is None else format(v, spec)
+
+
+def report(results, settings):
+    lines = ["# Dashboard capacity report", "",
+             f"{datetime.now(IST):%Y-%m-%d %H:%M} IST · {os.cpu_count()} CPUs · Python {sys.version.split()[0]}", "",
+             "Settings: " + ", ".join(f"{k}={v}" for k, v in settings.items()), "",
+             f"Capacity = most viewers with p95 rerun ≤ {settings['slo']}s, server CPU ≤ {settings['cpu_budget']}% "
+             "of one core, no exceptions and no failed viewers.", ""]
+    for script in dict.fromkeys(r["script"] for r in results):
+        rows = sorted((r for r in results if r["script"] == script), key=lambda r: r["viewers"])
+        lines += [f"## {script}", "",
+                  "| viewers | reruns | p50 s | p90 s | p99 s | first load p50 s | fragment runs/min | pushes "
+                  "| CPU avg % | CPU p95 % | RSS peak MB | upstream req/min | exceptions | error alerts |",
+                  "|---:|---:|---:|---:|---:|---:|---:|---:|---:|---:|---:|---:|---:|---:|"]
+        for r in rows:
+            lines.append(f"| {r['viewers']} | {r['reruns']} | {_fmt(r['p50'])} | {_fmt(r['p90'])} | {_fmt(r['p99'])} "
+                         f"| {_fmt(r['first_load_p50'])} | {r['fragment_runs_per_min']} | {r['pushes']} "
+                         f"| {_fmt(r['cpu_avg'], '.1f')} | {_fmt(r['cpu_p95'], '.1f')} | {_fmt(r['rss_peak_mb'], '.1f')} "
+                         f"| {r['upstream_per_min']} | {r['exceptions']} | {r['error_alerts']} |")
+        within = [r["viewers"] for r in rows if breach(r, settings["slo"], settings["cpu_budget"]) is None]
+        first_bad = next((r for r in rows if breach(r, settings["slo"], settings["cpu_budget"])), None)
+        verdict = f"**Capacity: {max(within)} viewers**" if within else "**Capacity: below the smallest N tested**"
+        if first_bad:
+            verdict += f"; first breach at {first_bad['viewers']} ({breach(first_bad, settings['slo'], settings['cpu_budget'])})"
+        else:
+            verdict += " (no breach up to the largest N tested)"
+        lines += ["", verdict, ""]
+        endpoints = sorted({e for r in rows for e in r["upstream"]})
+        if endpoints:
+            lines += ["Upstream requests by endpoint (whole step):", "",
+                      "| viewers | " + " | ".join(endpoints) + " |", "|---:|" + "---:|" * len(endpoints)]
+            for r in rows:
+                lines.append(f"| {r['viewers']} | " + " | ".join(str(r["upstream"].get(e, 0)) for e in endpoints) + " |")
+            lines.append("")
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load-test the dashboards with N concurrent headless viewers")
+    parser.add_argument("--scripts", nargs="+", default=list(DEFAULT_SCRIPTS))
+    parser.add_argument("--viewers", default="1,5,10,25", help="comma-separated viewer counts")
+    parser.add_argument("--duration", type=float, default=60, help="seconds measured per step")
+    parser.add_argument("--rerun-every", type=float, default=10, help="seconds between a viewer's manual reruns")
+    parser.add_argument("--ramp", type=float, default=2, help="seconds over which viewers connect")
+    parser.add_argument("--tick", type=float, default=5, help="stand-in market update interval (s)")
+    parser.add_argument("--latency", type=float, default=0, help="added stand-in response latency (ms)")
+    parser.add_argument("--slo", type=float, default=SLO_SECONDS)
+    parser.add_argument("--cpu-budget", type=float, default=CPU_BUDGET)
+    parser.add_argument("--report", default="loadtest-report.md")
+    parser.add_argument("--keep-workdirs", action="store_true", help="keep each step's working directory and streamlit.log")
+    args = parser.parse_args()
+
+    here = os.path.dirname(os.path.abspath(__file__))
+    counts = [int(n) for n in args.viewers.split(",") if n.strip()]
+    standin = StandIn(Market(args.tick), args.latency / 1000).start()
+    print(f"NSE/BSE stand-in on {standin.url}")
+
+    results = []
+    for script in args.scripts:
+        for n in counts:
+            print(f"{script}: {n} viewer(s) for {args.duration:.0f}s …", flush=True)
+            try:
+                r = run_step(os.path.join(here, script), n, standin, args.duration, args.rerun_every, args.ramp,
+                             args.keep_workdirs)
+            except RuntimeError as e:
+                print(f"  skipped: {e}")
+                continue
+            results.append(r)
+            print(f"  p50 {_fmt(r['p50'])}s p95 {_fmt(r['p95'])}s · CPU {_fmt(r['cpu_avg'], '.0f')}% "
+                  f"· RSS {_fmt(r['rss_peak_mb'], '.0f')} MB · upstream {r['upstream_per_min']}/min "
+                  f"· {breach(r, args.slo, args.cpu_budget) or 'within SLO'}")
+
+    settings = {"duration": args.duration, "rerun_every": args.rerun_every, "ramp": args.ramp, "tick": args.tick,
+                "latency_ms": args.latency, "slo": args.slo, "cpu_budget": args.cpu_budget}
+    with open(args.report, "w", encoding="utf-8") as f:
+        f.write(report(results, settings))
+    with open(os.path.splitext(args.report)[0] + ".json", "w") as f:
+        json.dump({"settings": settings, "results": results}, f, indent=1)
+    print(f"report: {args.report}")
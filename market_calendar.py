@@ -0,0 +1,162 @@
+import json
+import os
+from datetime import datetime, date, time as dt_time, timedelta
+from zoneinfo import ZoneInfo
+
+# -------------------------------------------------
+# NSE Exchange Calendar
+# -------------------------------------------------
+IST = ZoneInfo("Asia/Kolkata")
+
+PRE_OPEN = dt_time(9, 0)
+MARKET_OPEN = dt_time(9, 15)
+MARKET_CLOSE = dt_time(15, 30)
+POST_CLOSE_GRACE = timedelta(minutes=15)  # closing OI/prices settle after 15:30
+
+# Trading holidays (weekday closures only). Check against the NSE holiday
+# circular each year; extra dates can be added in CALENDAR_FILE.
+HOLIDAYS = {
+    date(2025, 2, 26), date(2025, 3, 14), date(2025, 3, 31), date(2025, 4, 10),
+    date(2025, 4, 14), date(2025, 4, 18), date(2025, 5, 1), date(2025, 8, 15),
+    date(2025, 8, 27), date(2025, 10, 2), date(2025, 10, 21), date(2025, 10, 22),
+    date(2025, 11, 5), date(2025, 12, 25),
+    date(2026, 1, 26), date(2026, 3, 3), date(2026, 3, 26), date(2026, 3, 31),
+    date(2026, 4, 3), date(2026, 4, 14), date(2026, 5, 1), date(2026, 5, 28),
+    date(2026, 6, 26), date(2026, 9, 14), date(2026, 10, 2), date(2026, 10, 20),
+    date(2026, 11, 10), date(2026, 11, 24), date(2026, 12, 25),
+}
+
+# Special sessions (e.g. Muhurat trading) that run on otherwise closed days
+SPECIAL_SESSIONS = {
+    date(2025, 10, 21): (dt_time(13, 45), dt_time(14, 45)),
+}
+
+EXPIRY_WEEKDAY = 1  # NIFTY weekly options expire on Tuesday
+
+CALENDAR_FILE = os.environ.get("MARKET_CALENDAR_FILE", "market_calendar.json")
+
+
+def _load_overrides(path=CALENDAR_FILE):
+    """Merge {"holidays": [...], "special_sessions": {"YYYY-MM-DD": ["HH:MM", "HH:MM"]}}."""
+    if not os.path.exists(path):
+        return
+    with open(path) as f:
+        extra = json.load(f)
+    HOLIDAYS.update(date.fromisoformat(d) for d in extra.get("holidays", []))
+    for d, (start, end) in extra.get("special_sessions", {}).items():
+        SPECIAL_SESSIONS[date.fromisoformat(d)] = (dt_time.fromisoformat(start), dt_time.fromisoformat(end))
+
+
+_load_overrides()
+
+
+def _as_ist(now=None):
+    if now is None:
+        return datetime.now(IST)
+    if now.tzinfo is None:
+        return now.replace(tzinfo=IST)
+    return now.astimezone(IST)
+
+
+def is_trading_day(d):
+    return d.weekday() < 5 and d not in HOLIDAYS
+
+
+def session_hours(d):
+    """(open, close) for the day, or None when the exchange is shut."""
+    if d in SPECIAL_SESSIONS:
+        return SPECIAL_SESSIONS[d]
+    if is_trading_day(d):
+        return MARKET_OPEN, MARKET_CLOSE
+    return None
+
+
+def _session_bounds(d):
+    hours = session_hours(d)
+    if hours is None:
+        return None
+    start = datetime.combine(d, hours[0], IST)
+    end = datetime.combine(d, hours[1], IST)
+    return start, end
+
+
+def is_market_open(now=None):
+    now = _as_ist(now)
+    bounds = _session_bounds(now.date())
+    return bounds is not None and bounds[0] <= now <= bounds[1]
+
+
+def is_capture_window(now=None):
+    """Pre-open through the post-close settle: when snapshots are worth recording."""
+    now = _as_ist(now)
+    bounds = _session_bounds(now.date())
+    if bounds is None:
+        return False
+    start, end = bounds
+    if now.date() not in SPECIAL_SESSIONS:
+        start = datetime.combine(now.date(), PRE_OPEN, IST)
+    return start <= now <= end + POST_CLOSE_GRACE
+
+
+def next_session_start(now=None):
+    now = _as_ist(now)
+    d = now.date()
+    for _ in range(30):
+        bounds = _session_bounds(d)
+        if bounds is not None:
+            start = bounds[0]
+            if d not in SPECIAL_SESSIONS:
+                start = datetime.combine(d, PRE_OPEN, IST)
+            if start > now:
+                return start
+        d += timedelta(days=1)
+    return None
+
+
+def is_expiry_day(d):
+    """Weekly expiry, moved to the previous trading day when it falls on a holiday."""
+    expiry = d + timedelta(days=(EXPIRY_WEEKDAY - d.weekday()) % 7)
+    while not is_trading_day(expiry):
+        expiry -= timedelta(days=1)
+    return expiry == d
+
+
+# -------------------------------------------------
+# Adaptive Polling
+# -------------------------------------------------
+FAST_POLL = 5          # seconds, around open/close and expiry-day tail
+SLOW_POLL = 60         # seconds, mid-session
+EVENT_WINDOW = timedelta(minutes=15)
+EXPIRY_TAIL = timedelta(minutes=90)
+
+
+def poll_interval(now=None, base=SLOW_POLL):
+    """Seconds until the next poll, or None when the market is closed (go idle)."""
+    now = _as_ist(now)
+    if not is_capture_window(now):
+        return None
+    start, end = _session_bounds(now.date())
+    if abs(now - start) <= EVENT_WINDOW or abs(now - end) <= EVENT_WINDOW or now > end:
+        return FAST_POLL
+    if is_expiry_day(now.date()) and end - now <= EXPIRY_TAIL:
+        return FAST_POLL
+    return base
+
+
+def seconds_until_next_poll(now=None, base=SLOW_POLL):
+    """Like poll_interval, but sleeps through closed periods until the next pre-open."""
+    now = _as_ist(now)
+    interval = poll_interval(now, base)
+    if interval is not None:
+        return interval
+    nxt = next_session_start(now)
+    return (nxt - now).total_seconds() if nxt is not None else None
+
+
+def market_status(now=None):
+    now = _as_ist(now)
+    if is_market_open(now):
+        return "open"
+    if is_capture_window(now):
+        return "pre-open" if now.time() < MARKET_OPEN else "post-close"
+    return "closed"
@@ -1,128 +1,116 @@
 import streamlit as st
 import pandas as pd
 import matplotlib.pyplot as plt
-import requests
-from datetime import datetime, time as dt_time, date
+from datetime import datetime, date
 from zoneinfo import ZoneInfo  # Python 3.9+
-import os
-import time
+import io
+from nse_payload import is_new_payload
+from nse_client import option_chain, derived
+from history_store import OI_HISTORY_FILE, OI_COLUMNS, append_row, read_history
+from history_mmap import append as mmap_append, query_day, to_frame
+from option_metrics import STRIKE_WINDOWS, atm_oi_table
+from history_schema import compact, append_compact, clock, frame_bytes
+from market_calendar import is_capture_window, next_session_start
+from pubsub import chain_updates, rerun_on_publish
 
 # -------------------------------
 # Configuration
 # -------------------------------
-FILE = "oi_history_change.csv"
+FILE = OI_HISTORY_FILE  # shared with the other OI dashboards (locked appends)
 TIMEZONE = ZoneInfo("Asia/Kolkata")  # set your timezone here
-AUTO_REFRESH_INTERVAL = 180  # 3 minutes in seconds
 
 st.set_page_config(page_title="Digi OI Tracker", layout="wide")
 st.title("📊 Digi OI Tracker")
 st.caption("Track Options OI Change in ATM 5 strikes")
 
-# -------------------------------
-# Display current time
-# -------------------------------
-now = datetime.now(TIMEZONE)
-st.write("Current time (IST):", now.strftime("%Y-%m-%d %H:%M:%S"))
-
-# -------------------------------
-# Auto-refresh every 3 minutes
-# -------------------------------
-if "last_refresh" not in st.session_state:
-    st.session_state.last_refresh = time.time()
-
-if time.time() - st.session_state.last_refresh > AUTO_REFRESH_INTERVAL:
-    st.session_state.last_refresh = time.time()
-    st.experimental_rerun()
-
 # -------------------------------
 # Fetch NSE option chain
 # -------------------------------
 def fetch_nse_option_chain():
-    url = "https://www.nseindia.com/api/option-chain-indices?symbol=NIFTY"
-    headers = {
-        "User-Agent": "Mozilla/5.0",
-        "Accept-Language": "en-US,en;q=0.9"
-    }
-    s = requests.Session()
-    s.headers.update(headers)
-    s.get("https://www.nseindia.com")  # initialize cookies
-    return s.get(url).json()
+    # Shared, TTL-cached and coalesced across every viewer of this process
+    return option_chain("NIFTY")
 
 # -------------------------------
 # Load or create history CSV
 # -------------------------------
 def load_history():
-    if os.path.exists(FILE):
-        df = pd.read_csv(FILE)
-        # reset if date changed
-        if df["date"].iloc[-1] != str(date.today()):
-            return pd.DataFrame(columns=["date","time","CE_change","PE_change"])
-        return df
-    else:
-        return pd.DataFrame(columns=["date","time","CE_change","PE_change"])
-
-def save_history(df):
-    df.to_csv(FILE, index=False)
+    # today's rows from the memory-mapped store (no text parsing); CSV fallback.
+    # Kept compact: int64 epoch "ts" + int32 OI columns.
+    arr = query_day("oi", date.today())
+    if len(arr):
+        return compact(to_frame(arr)[["time","CE_change","PE_change"]])
+    return compact(read_history(FILE, columns=["date","time","CE_change","PE_change"], day=date.today()))
+
+def build_atm_table(payload, n=5):
+    # Current week expiry only, decoded straight into arrays; ATM ±N by bisect
+    decoded = payload.chain()
+    return decoded["underlyingValue"], atm_oi_table(decoded, n)
+
+def render_oi_trend(history_df):
+    fig = plt.figure(figsize=(12, 4))
+    labels = clock(history_df)
+    plt.plot(labels, history_df["CE_change"], label="CE Change", color="blue", marker="o")
+    plt.plot(labels, history_df["PE_change"], label="PE Change", color="red", marker="o")
+    plt.xticks(rotation=45)
+    plt.grid(True)
+    plt.legend()
+    plt.tight_layout()
+    buf = io.BytesIO()
+    fig.savefig(buf, format="png")
+    plt.close(fig)
+    return buf.getvalue()
 
-# -------------------------------
-# Load existing history
-# -------------------------------
-history_df = load_history()
+strike_count = st.sidebar.selectbox("Strikes around ATM (table)", STRIKE_WINDOWS)
 
 # -------------------------------
-# Capture data only during market hours
+# Live section (a fragment): each new option-chain snapshot reruns only
+# this part, not the page; nothing is published while the market is closed
 # -------------------------------
-market_start = dt_time(8, 50)
-market_end = dt_time(16, 0)
+@st.fragment
+def live_oi(strike_count):
+    rerun_on_publish(chain_updates("NIFTY"))
+
+    now = datetime.now(TIMEZONE)
+    st.write("Current time (IST):", now.strftime("%Y-%m-%d %H:%M:%S"))
+    history_df = load_history()
+
+    # Capture data only during market hours (exchange calendar)
+    if not is_capture_window(now):
+        st.info(f"Market closed — data capture resumes {next_session_start(now):%a %d %b, %H:%M} IST.")
+        return history_df
 
-if market_start <= now.time() <= market_end:
     try:
-        data = fetch_nse_option_chain()
+        payload = fetch_nse_option_chain()
     except:
         st.error("Failed to fetch NSE data.")
-        st.stop()
-
-    records = data["records"]["data"]
-    expiry = data["records"]["expiryDates"][0]
-    underlying = data["records"]["underlyingValue"]
-
-    # Filter: current week expiry only
-    filtered = [r for r in records if r.get("expiryDate") == expiry]
-
-    # Build OI change table
-    rows = []
-    for r in filtered:
-        ce = r.get("CE", {})
-        pe = r.get("PE", {})
-        rows.append({
-            "strike": r["strikePrice"],
-            "CE_change": ce.get("changeinOpenInterest", 0),
-            "PE_change": pe.get("changeinOpenInterest", 0),
-        })
-
-    df = pd.DataFrame(rows)
-    df["diff"] = abs(df["strike"] - underlying)
+        return history_df
 
-    # Pick 5 ATM strikes only
-    df_atm = df.sort_values("diff").head(5)[["strike", "CE_change", "PE_change"]]
+    # Unchanged payload → reuse the previous table and chart.
+    # History always sums ATM 5 so rows stay comparable across dashboards.
+    underlying, df_atm = derived("nifty_dashboard.atm5", payload, build_atm_table)
+    _, df_window = derived(f"nifty_dashboard.atm{strike_count}", payload, lambda p: build_atm_table(p, strike_count))
 
     # -------------------------------
-    # Save new snapshot
+    # Save new snapshot (exchange timestamp, not wall clock)
     # -------------------------------
-    current_time = now.strftime("%H:%M")
-    today = str(now.date())
+    stamp = payload.exchange_time() or now.replace(tzinfo=None)
+    current_time = stamp.strftime("%H:%M:%S")
+    today = str(stamp.date())
 
     snapshot = {
         "date": today,
         "time": current_time,
         "CE_change": df_atm["CE_change"].sum(),
-        "PE_change": df_atm["PE_change"].sum()
+        "PE_change": df_atm["PE_change"].sum(),
+        "CE_OI_total": df_atm["CE_OI"].sum(),
+        "PE_OI_total": df_atm["PE_OI"].sum()
     }
 
-    # Only append if new minute
-    if len(history_df) == 0 or history_df["time"].iloc[-1] != current_time:
-        history_df = pd.concat([history_df, pd.DataFrame([snapshot])], ignore_index=True)
-        save_history(history_df)
+    # Only append if the exchange published a new snapshot
+    if is_new_payload("nifty_dashboard.oi", payload):
+        if append_row(FILE, snapshot, OI_COLUMNS):
+            mmap_append("oi", snapshot, (today, current_time))
+            history_df = append_compact(history_df, {k: snapshot[k] for k in ("date", "time", "CE_change", "PE_change")})
 
     # -------------------------------
     # Display metrics
@@ -135,20 +123,18 @@ if market_start <= now.time() <= market_end:
     with col3:
         st.metric("Total PE Change (ATM 5)", snapshot["PE_change"])
 
-    st.write("### ATM 5 Strike – Change in OI Table")
-    st.dataframe(df_atm)
+    st.write(f"### ATM {strike_count} Strike – Change in OI Table")
+    st.dataframe(df_window[["strike", "CE_change", "PE_change"]])
 
     # -------------------------------
     # Plot full-day Change in OI Trend
     # -------------------------------
-    st.write("### 📈 OI Trend")
-    plt.figure(figsize=(12, 4))
-    plt.plot(history_df["time"], history_df["CE_change"], label="CE Change", color="blue", marker="o")
-    plt.plot(history_df["time"], history_df["PE_change"], label="PE Change", color="red", marker="o")
-    plt.xticks(rotation=45)
-    plt.grid(True)
-    plt.legend()
-    plt.tight_layout()
-    st.pyplot(plt)
-else:
-    st.info("Data capture only between 8:50 AM and 4:00 PM IST.")
+    if not history_df.empty:
+        st.write("### 📈 OI Trend")
+        # Keyed on the history length too: another viewer may append rows under the same payload
+        st.image(derived(f"nifty_dashboard.trend.{len(history_df)}", payload, lambda _: render_oi_trend(history_df)))
+    return history_df
+
+
+history_df = live_oi(strike_count)
+st.sidebar.caption(f"History in memory: {frame_bytes(history_df) / 1024:.1f} KB")
@@ -0,0 +1,445 @@
+import heapq
+import itertools
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime
+from urllib.parse import quote as urlquote
+
+import requests
+from cachetools import LRUCache, TTLCache
+
+from constituents import parse_constituents
+from market_calendar import IST
+from nse_payload import EXCHANGE_TS_FORMAT, make_payload
+
+# -------------------------------------------------
+# Shared NSE Client (one per server process)
+# -------------------------------------------------
+# Every dashboard, viewer and background thread goes through here, so N
+# browser tabs cost the same upstream requests as one. The base URLs can be
+# pointed elsewhere (e.g. loadtest.py's local stand-in) through the env.
+
+NSE_HOME = os.environ.get("NSE_HOME", "https://www.nseindia.com")
+NSE_API = NSE_HOME + "/api"
+BSE_HOME = os.environ.get("BSE_HOME", "https://www.bseindia.com")
+BSE_API = os.environ.get("BSE_API", "https://api.bseindia.com/BseIndiaAPI/api")
+
+HEADERS = {
+    "User-Agent": "Mozilla/5.0",
+    "Accept": "application/json",
+    "Accept-Language": "en-US,en;q=0.9",
+    "Referer": NSE_HOME,
+}
+BSE_HEADERS = {**HEADERS, "Referer": BSE_HOME + "/", "Origin": BSE_HOME}
+
+# Per-kind freshness (seconds) and size bounds ("quote" only coalesces first loads, see cached_quote)
+TTL = {"chain": 15, "quote": 30, "derived": 60}
+MAX_ENTRIES = {"chain": 16, "quote": 256, "derived": 512}
+
+_caches = {kind: TTLCache(maxsize=MAX_ENTRIES[kind], ttl=TTL[kind]) for kind in TTL}
+_inflight = {}
+_lock = threading.Lock()
+
+_session = None
+_bse_session = None
+_session_lock = threading.Lock()
+
+stats = {"upstream": 0, "hits": 0, "coalesced": 0, "throttled": 0, "throttle_wait": 0.0, "rate_limited": 0, "blocked": 0}
+
+
+# -------------------------------------------------
+# Single-flight TTL Cache
+# -------------------------------------------------
+def cached(kind, key, load):
+    """Return the cached value, or run load() once for all concurrent callers."""
+    with _lock:
+        cache = _caches[kind]
+        if key in cache:
+            stats["hits"] += 1
+            return cache[key]
+        future = _inflight.get((kind, key))
+        leader = future is None
+        if leader:
+            future = _inflight[(kind, key)] = Future()
+        else:
+            stats["coalesced"] += 1
+
+    if not leader:
+        return future.result()
+
+    try:
+        value = load()
+    except BaseException as e:
+        with _lock:
+            _inflight.pop((kind, key), None)
+        future.set_exception(e)
+        raise
+
+    with _lock:
+        cache[key] = value
+        _inflight.pop((kind, key), None)
+    future.set_result(value)
+    return value
+
+
+def invalidate(kind=None):
+    with _lock:
+        for k, cache in _caches.items():
+            if kind is None or k == kind:
+                cache.clear()
+
+
+# -------------------------------------------------
+# Quote Cache (stale-while-revalidate across exchanges)
+# -------------------------------------------------
+# NSE indices, NSE equities, index constituents and BSE share one cache.
+# Each entry keeps its value with the exchange timestamp and the time of the
+# last good fetch. Past its source's TTL, an entry is still returned at once
+# while one background refresh replaces it. A failed refresh keeps the last
+# good value and records the error, so banners always render instantly and
+# show how old each number is.
+
+QUOTE_TTL = {"nse_index": 15, "nse_equity": 30, "nse_constituents": 15, "bse": 30}
+QUOTE_STALE_AFTER = 4       # × TTL without a good refresh → flagged stale
+SPOT_MAX_AGE = 30           # seconds: oldest index level a computation may use (see max_age)
+
+_quotes = LRUCache(maxsize=512)  # (source, key) -> QuoteEntry
+_refreshing = set()
+_refresher = ThreadPoolExecutor(max_workers=4, thread_name_prefix="quote-refresh")
+
+
+@dataclass
+class QuoteEntry:
+    source: str
+    value: object
+    fetched: float              # epoch of the last good fetch
+    exchange_time: datetime = None
+    checked: float = 0.0        # epoch of the last attempt, good or failed
+    error: str = None
+
+    @property
+    def age(self):
+        return time.time() - self.fetched
+
+    @property
+    def stale(self):
+        return self.age > QUOTE_TTL[self.source] * QUOTE_STALE_AFTER
+
+
+def _refresh_quote(source, key, load, stamp, foreground=False):
+    try:
+        value = load()
+        now = time.time()
+        entry = QuoteEntry(source, value, now, stamp(value) if stamp else None, now)
+    except Exception as e:
+        with _lock:
+            _refreshing.discard((source, key))
+            old = _quotes.get((source, key))
+            if old is not None:
+                old.checked, old.error = time.time(), f"{type(e).__name__}: {e}"
+        if foreground:
+            raise
+        return None
+    with _lock:
+        _quotes[(source, key)] = entry
+        _refreshing.discard((source, key))
+    return entry
+
+
+def cached_quote(source, key, load, stamp=None, max_age=None):
+    """QuoteEntry for (source, key): returned immediately, refreshed behind the caller once past its TTL.
+
+    Display callers take whatever is cached. Callers that compute with the
+    value pass `max_age` (seconds): an older entry is reloaded in the
+    foreground, and a failed reload raises instead of serving a frozen value.
+    """
+    with _lock:
+        entry = _quotes.get((source, key))
+        if entry is not None and (max_age is None or entry.age <= max_age):
+            stats["hits"] += 1
+            if time.time() - entry.checked >= QUOTE_TTL[source] and (source, key) not in _refreshing:
+                _refreshing.add((source, key))
+                _refresher.submit(_refresh_quote, source, key, load, stamp)
+            return entry
+    # Nothing (fresh enough) to serve: load in the foreground, coalesced across
+    # callers; keyed on the stale fetch so a later reload is never skipped
+    flight = (source, key) if entry is None else (source, key, entry.fetched)
+    return cached("quote", flight, lambda: _refresh_quote(source, key, load, stamp, foreground=True))
+
+
+def quote_info(source, key):
+    """Cached QuoteEntry without triggering a load (None if never fetched)."""
+    with _lock:
+        return _quotes.get((source, key))
+
+
+def _age_text(seconds):
+    if seconds < 90:
+        return f"{seconds:.0f}s"
+    if seconds < 5400:
+        return f"{seconds / 60:.0f}m"
+    return f"{seconds / 3600:.1f}h"
+
+
+def freshness(source, key):
+    """Short UI label: exchange time and age of a cached quote, flagged when stale."""
+    entry = quote_info(source, key)
+    if entry is None:
+        return "no data yet"
+    when = entry.exchange_time.strftime("%H:%M:%S") if entry.exchange_time else "—"
+    label = f"as of {when} · fetched {_age_text(entry.age)} ago"
+    if entry.stale:
+        label = f"⚠️ stale, {label}" + (f" ({entry.error})" if entry.error else "")
+    return label
+
+
+def exchange_time(text, formats=(EXCHANGE_TS_FORMAT, "%d-%b-%Y %H:%M", "%d %b %Y | %H:%M", "%d %b %Y %H:%M:%S")):
+    """Parse an exchange timestamp string (IST); None when absent or unrecognized."""
+    if not text:
+        return None
+    for fmt in formats:
+        try:
+            return datetime.strptime(str(text).strip(), fmt).replace(tzinfo=IST)
+        except ValueError:
+            pass
+    return None
+
+
+# -------------------------------------------------
+# Session
+# -------------------------------------------------
+def get_session():
+    global _session
+    with _session_lock:
+        if _session is None:
+            s = requests.Session()
+            s.headers.update(HEADERS)
+            try:
+                limiter.acquire("home", "nse")  # the cookie warm-up spends NSE budget like any call
+                s.get(NSE_HOME, timeout=5)  # initialize cookies
+            except (RateLimited, requests.RequestException):
+                pass
+            _session = s
+        return _session
+
+
+def get_bse_session():
+    global _bse_session
+    with _session_lock:
+        if _bse_session is None:
+            s = requests.Session()
+            s.headers.update(BSE_HEADERS)
+            _bse_session = s
+        return _bse_session
+
+
+def reset_session():
+    global _session, _bse_session
+    with _session_lock:
+        _session = _bse_session = None
+
+
+# -------------------------------------------------
+# Request Budget (token bucket per endpoint and per host)
+# -------------------------------------------------
+# Every upstream request takes a token from its endpoint's bucket and from
+# its host's shared bucket, so a rerun that needs chains, indices and quotes
+# is spread out instead of hitting NSE as one burst. A request waits its
+# turn, and waiters are served by priority (session warm-up and option chains
+# before index and constituent quotes before single-stock quotes), then in
+# arrival order. Identical requests never queue twice: cached() and the
+# quote refresher already coalesce them onto one in-flight load. A 401/403/
+# 429 pauses the whole host for a cooldown that doubles while blocks repeat.
+#
+# Waits are bounded on purpose: after MAX_QUEUE_WAIT a request raises
+# RateLimited (counted in stats["rate_limited"]) rather than holding a
+# Streamlit script thread through a long block. Callers already treat it as
+# a failed load: display quotes keep their last good value, and the next
+# rerun or feed tick asks again.
+
+# endpoint: (requests per second, burst, priority; lower is served first)
+RATE_LIMITS = {
+    "home": (0.1, 1, 0),  # cookie warm-up in get_session()
+    "option-chain": (0.5, 2, 0),
+    "allIndices": (0.5, 2, 1),
+    "constituents": (0.5, 2, 1),
+    "quote-equity": (1.0, 3, 2),
+    "bse": (1.0, 2, 1),
+}
+HOST_LIMITS = {"nse": (2.0, 4), "bse": (1.0, 2)}
+BLOCK_COOLDOWN = (15, 240)  # seconds: first pause, longest pause
+MAX_QUEUE_WAIT = 30         # seconds before a queued request gives up (RateLimited, see above)
+
+
+class RateLimited(Exception):
+    pass
+
+
+class TokenBucket:
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.stamp = time.monotonic()
+
+    def delay(self, now):
+        """Seconds until one token is available (0 if one is now)."""
+        self.tokens = min(self.burst, self.tokens + (now - self.stamp) * self.rate)
+        self.stamp = now
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def take(self):
+        self.tokens -= 1
+
+
+class RateLimiter:
+    def __init__(self, limits=RATE_LIMITS, hosts=HOST_LIMITS):
+        self.priority = {e: p for e, (_, _, p) in limits.items()}
+        self.buckets = {e: TokenBucket(r, b) for e, (r, b, _) in limits.items()}
+        self.hosts = {h: TokenBucket(r, b) for h, (r, b) in hosts.items()}
+        self.blocked_until = dict.fromkeys(hosts, 0.0)
+        self.strikes = dict.fromkeys(hosts, 0)
+        self._queue = []            # heap of (priority, seq, endpoint, host)
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+
+    def _first_ready(self, host, now):
+        """Highest-priority waiter for `host` whose own endpoint has a token."""
+        for ticket in sorted(self._queue):
+            if ticket[3] == host and self.buckets[ticket[2]].delay(now) == 0:
+                return ticket
+        return None
+
+    def acquire(self, endpoint, host, timeout=MAX_QUEUE_WAIT):
+        """Block until `endpoint` may send; returns the seconds waited."""
+        ticket = (self.priority[endpoint], next(self._seq), endpoint, host)
+        start = time.monotonic()
+        with self._cond:
+            heapq.heappush(self._queue, ticket)
+            try:
+                while True:
+                    now = time.monotonic()
+                    blocked = self.blocked_until[host] - now
+                    if blocked <= 0 and self.hosts[host].delay(now) == 0 and self._first_ready(host, now) == ticket:
+                        self.buckets[endpoint].take()
+                        self.hosts[host].take()
+                        return now - start
+                    if now - start >= timeout:
+                        raise RateLimited(f"{endpoint}: no request budget within {timeout}s")
+                    wait = max(blocked, self.hosts[host].delay(now), self.buckets[endpoint].delay(now), 0.05)
+                    self._cond.wait(min(wait, start + timeout - now))
+            finally:
+                self._queue.remove(ticket)
+                heapq.heapify(self._queue)
+                self._cond.notify_all()
+
+    def penalize(self, host):
+        """Upstream refused us: pause `host`, longer each time in a row."""
+        with self._cond:
+            first, longest = BLOCK_COOLDOWN
+            self.blocked_until[host] = time.monotonic() + min(first * 2 ** self.strikes[host], longest)
+            self.strikes[host] += 1
+
+    def succeeded(self, host):
+        with self._cond:
+            self.strikes[host] = 0
+
+    def state(self):
+        """Tokens left per endpoint / host, queue length and remaining block, for /health-style views."""
+        with self._cond:
+            now = time.monotonic()
+            return {
+                "queued": len(self._queue),
+                "endpoints": {e: round(min(b.burst, b.tokens + (now - b.stamp) * b.rate), 2) for e, b in self.buckets.items()},
+                "hosts": {h: {"tokens": round(min(b.burst, b.tokens + (now - b.stamp) * b.rate), 2),
+                              "blocked_for": round(max(self.blocked_until[h] - now, 0), 1)} for h, b in self.hosts.items()},
+            }
+
+
+limiter = RateLimiter()
+
+
+def _get(url, endpoint, timeout=5, session=None):
+    host = "bse" if endpoint == "bse" else "nse"
+    try:
+        waited = limiter.acquire(endpoint, host)
+    except RateLimited:
+        with _lock:
+            stats["rate_limited"] += 1
+        raise
+    with _lock:
+        stats["upstream"] += 1
+        if waited > 0.01:
+            stats["throttled"] += 1
+            stats["throttle_wait"] += waited
+    resp = (session or get_session()).get(url, timeout=timeout)
+    if resp.status_code in (401, 403, 429):
+        with _lock:
+            stats["blocked"] += 1
+        limiter.penalize(host)
+        if session is None:
+            reset_session()  # cookies expired / blocked → fresh session next time
+    else:
+        limiter.succeeded(host)
+    resp.raise_for_status()
+    return resp
+
+
+# -------------------------------------------------
+# Endpoints
+# -------------------------------------------------
+def option_chain(symbol="NIFTY"):
+    """Raw option-chain Payload (see nse_payload) for an index symbol."""
+    def load():
+        payload = make_payload(_get(f"{NSE_API}/option-chain-indices?symbol={symbol}", "option-chain").content)
+        if b'"records"' not in payload.raw:
+            raise ValueError(f"empty option chain for {symbol}")
+        return payload
+    return cached("chain", symbol, load)
+
+
+def all_indices(max_age=None):
+    entry = cached_quote("nse_index", "allIndices", lambda: _get(f"{NSE_API}/allIndices", "allIndices").json(),
+                         stamp=lambda d: exchange_time(d.get("timestamp")), max_age=max_age)
+    return entry.value["data"]
+
+
+def index_quote(name, max_age=None):
+    """One index row; pass max_age (e.g. SPOT_MAX_AGE) when computing with it rather than displaying it."""
+    for idx in all_indices(max_age):
+        if idx["index"] == name:
+            return idx
+    return None
+
+
+def index_constituents(index="NIFTY 50"):
+    """Every member of `index` from one equity-stockIndices request (constituents.Constituents)."""
+    entry = cached_quote("nse_constituents", index, lambda: parse_constituents(
+        index, _get(f"{NSE_API}/equity-stockIndices?index={urlquote(index)}", "constituents").content),
+        stamp=lambda c: exchange_time(c.timestamp))
+    return entry.value
+
+
+def equity_quote(symbol):
+    entry = cached_quote("nse_equity", symbol, lambda: _get(f"{NSE_API}/quote-equity?symbol={symbol}", "quote-equity").json(),
+                         stamp=lambda d: exchange_time((d.get("metadata") or {}).get("lastUpdateTime")))
+    return entry.value
+
+
+def _bse_time(quote):
+    return exchange_time(next((quote[k] for k in ("Dttm", "DT_TM", "dttm", "Date") if quote.get(k)), None))
+
+
+def sensex_quote():
+    # BSE needs no NSE cookies, but gets its own session (keep-alive, browser headers)
+    entry = cached_quote("bse", "SENSEX", lambda: _get(f"{BSE_API}/MktStat1/w", "bse", session=get_bse_session()).json()["Sensex"],
+                         stamp=_bse_time)
+    return entry.value
+
+
+def derived(name, payload, build):
+    """Metric computed once per (name, payload fingerprint) across all viewers."""
+    return cached("derived", (name, payload.fingerprint), lambda: build(payload))
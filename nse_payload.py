@@ -0,0 +1,209 @@
+import hashlib
+import json
+import re
+import threading
+from dataclasses import dataclass, field
+from datetime import datetime
+
+import numpy as np
+
+try:
+    import orjson  # optional fast backend
+except ImportError:
+    orjson = None
+
+# -------------------------------------------------
+# Payload Fingerprinting
+# -------------------------------------------------
+# NSE keeps serving the same option-chain body between exchange updates.
+# A fingerprint (exchange timestamp + hash of the raw bytes) lets callers
+# skip parsing, aggregation, history writes and plotting for repeats.
+
+EXCHANGE_TS_FORMAT = "%d-%b-%Y %H:%M:%S"
+_TIMESTAMP_RE = re.compile(rb'"timestamp"\s*:\s*"([^"]*)"')
+
+_last_fingerprint = {}
+_lock = threading.Lock()
+
+
+@dataclass
+class Payload:
+    raw: bytes
+    timestamp: str = None
+    fingerprint: str = None
+    _data: dict = field(default=None, repr=False)
+    _arrays: dict = field(default_factory=dict, repr=False)
+
+    def json(self):
+        if self._data is None:
+            self._data = loads(self.raw)
+        return self._data
+
+    def chain(self, expiries=(0,), fields=None):
+        """Selected expiries/fields as arrays (see decode_chain), cached per payload."""
+        fields = tuple(fields or CHAIN_FIELDS)
+        key = (tuple(expiries) if expiries is not None else None, fields)
+        if key not in self._arrays:
+            self._arrays[key] = decode_chain(self.raw, expiries, fields, data=self._data)
+        return self._arrays[key]
+
+    def exchange_time(self, tz=None):
+        if not self.timestamp:
+            return None
+        ts = datetime.strptime(self.timestamp, EXCHANGE_TS_FORMAT)
+        if tz is None:
+            return ts
+        # pytz zones must localize; replace() would attach local mean time (+05:53)
+        return tz.localize(ts) if hasattr(tz, "localize") else ts.replace(tzinfo=tz)
+
+
+# -------------------------------------------------
+# Selective Option-Chain Decode
+# -------------------------------------------------
+# The option-chain body repeats every strike of every expiry under both
+# "records" and "filtered". decode_chain() only walks records.data and keeps
+# the requested expiries/fields as numpy columns, so no per-poll dict tree is
+# held. With orjson installed the body is parsed in C and projected at once;
+# the stdlib path decodes one row at a time and never touches "filtered".
+
+CHAIN_FIELDS = ("lastPrice", "openInterest", "changeinOpenInterest")
+
+_RECORDS_DATA_RE = re.compile(rb'"records"\s*:\s*\{.*?"data"\s*:\s*\[', re.S)
+_EXPIRY_DATES_RE = re.compile(rb'"records"\s*:\s*\{.*?"expiryDates"\s*:\s*(\[[^\]]*\])', re.S)
+_UNDERLYING_RE = re.compile(rb'"underlyingValue"\s*:\s*(-?[0-9.eE+-]+)')
+_WS = b" \t\r\n"
+
+
+def loads(raw):
+    return orjson.loads(raw) if orjson is not None else json.loads(raw)
+
+
+def _iter_records_data(raw, tail=None):
+    """Rows of records.data, decoded one at a time (stdlib).
+
+    Once the array closes, the remaining records-level keys (timestamp,
+    underlyingValue, ...) are decoded into `tail` if given.
+    """
+    m = _RECORDS_DATA_RE.search(raw)
+    if m is None:
+        return
+    doc = raw.decode("utf-8")
+    decoder = json.JSONDecoder()
+    i, end = len(raw[:m.end()].decode("utf-8")), len(doc)  # byte → str offset
+    while i < end:
+        while doc[i] in " \t\r\n,":
+            i += 1
+        if doc[i] == "]":
+            break
+        row, i = decoder.raw_decode(doc, i)
+        yield row
+    if tail is None:
+        return
+    i += 1
+    while i < end:
+        while doc[i] in " \t\r\n,":
+            i += 1
+        if doc[i] == "}":
+            return
+        key, i = decoder.raw_decode(doc, i)
+        while doc[i] in " \t\r\n:":
+            i += 1
+        tail[key], i = decoder.raw_decode(doc, i)
+
+
+def _header(raw, data):
+    if data is not None:
+        records = data.get("records", {})
+        return records.get("expiryDates", []), records.get("underlyingValue")
+    m = _EXPIRY_DATES_RE.search(raw)
+    # Only the records header before "data" is searched: every CE/PE row
+    # carries its own underlyingValue, which may lag the index value
+    head = _RECORDS_DATA_RE.search(raw)
+    u = _UNDERLYING_RE.search(head.group(0)) if head else None
+    return (json.loads(m.group(1)) if m else []), (float(u.group(1)) if u else None)
+
+
+def decode_chain(raw, expiries=(0,), fields=CHAIN_FIELDS, data=None):
+    """{"underlyingValue", "expiryDates", "chains": {expiry: {"strike", "CE_<field>", "PE_<field>"}}}.
+
+    `expiries` holds expiry strings or positions in expiryDates (0 = nearest),
+    None for all. Columns are float arrays in ascending strike order; a
+    missing leg is NaN.
+    """
+    if data is None and orjson is not None:
+        data = orjson.loads(raw)
+    expiry_dates, underlying = _header(raw, data)
+    if expiries is None:
+        wanted = list(expiry_dates)
+    else:
+        wanted = [expiry_dates[e] if isinstance(e, int) else e
+                  for e in expiries if not isinstance(e, int) or e < len(expiry_dates)]
+    tail = {}
+    rows = data["records"]["data"] if data is not None else _iter_records_data(raw, tail)
+
+    cols = {e: {"strike": []} for e in wanted}
+    for e in wanted:
+        for leg in ("CE", "PE"):
+            for f in fields:
+                cols[e][f"{leg}_{f}"] = []
+    nan = float("nan")
+    for r in rows:
+        c = cols.get(r.get("expiryDate"))
+        if c is None:
+            continue
+        c["strike"].append(r["strikePrice"])
+        for leg in ("CE", "PE"):
+            side = r.get(leg)
+            for f in fields:
+                v = side.get(f) if side else None
+                c[f"{leg}_{f}"].append(nan if v is None else v)
+
+    chains = {}
+    for e, c in cols.items():
+        arrays = {k: np.asarray(v, dtype=float) for k, v in c.items()}
+        strikes = arrays["strike"]
+        if len(strikes) > 1 and (np.diff(strikes) < 0).any():
+            order = np.argsort(strikes, kind="stable")
+            arrays = {k: v[order] for k, v in arrays.items()}
+        chains[e] = arrays
+    if underlying is None and tail.get("underlyingValue") is not None:
+        underlying = float(tail["underlyingValue"])  # NSE puts it after records.data
+    return {"underlyingValue": underlying, "expiryDates": expiry_dates, "chains": chains}
+
+
+def payload_fingerprint(raw, timestamp=None):
+    digest = hashlib.blake2b(raw, digest_size=16).hexdigest()
+    return f"{timestamp or ''}|{digest}"
+
+
+def make_payload(raw):
+    # records.timestamp is read straight from the bytes so an unchanged
+    # payload never has to be decoded at all
+    m = _TIMESTAMP_RE.search(raw)
+    timestamp = m.group(1).decode() if m else None
+    return Payload(raw, timestamp, payload_fingerprint(raw, timestamp))
+
+
+# -------------------------------------------------
+# Change Tracking
+# -------------------------------------------------
+def is_new_payload(key, payload):
+    """True the first time a fingerprint is seen for `key` in this process."""
+    with _lock:
+        if _last_fingerprint.get(key) == payload.fingerprint:
+            return False
+        _last_fingerprint[key] = payload.fingerprint
+        return True
+
+
+def seen_fingerprints(prefix=""):
+    """{key: fingerprint} for is_new_payload keys starting with `prefix` (for checkpoints)."""
+    with _lock:
+        return {k: v for k, v in _last_fingerprint.items() if k.startswith(prefix)}
+
+
+def restore_fingerprints(seen):
+    """Re-arm is_new_payload after a restart so the last logged snapshot is not logged twice."""
+    with _lock:
+        for k, v in seen.items():
+            _last_fingerprint.setdefault(k, v)
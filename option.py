@@ -1,174 +1,186 @@
 import streamlit as st
 import pandas as pd
-import requests
-import time
 import datetime
+import uuid
+from live_feed import LiveFeed
+from indicators import ChainIndicators, INDICATOR_FIELDS
+from option_metrics import PREMIUM_FIELDS, strike_premiums
+from pubsub import rerun_on_publish
+from downsample import chart_frame, zoom_controls
+from checkpoint import load as load_checkpoint, save as save_checkpoint
+from nse_client import SPOT_MAX_AGE, index_quote, option_chain, reset_session
+from nse_payload import is_new_payload
+from market_calendar import IST, is_capture_window, next_session_start
 
 # -------------------------------------------------
-# NSE Session Setup
-# -------------------------------------------------
-def get_nse_session():
-    session = requests.Session()
-    headers = {
-        "User-Agent": "Mozilla/5.0",
-        "Accept-Language": "en-US,en;q=0.9",
-        "Accept": "application/json",
-    }
-    session.headers.update(headers)
-    session.get("https://www.nseindia.com", timeout=5)
-    return session
-
-session = get_nse_session()
-
-# -------------------------------------------------
-# Fetch Functions
+# Fetch Functions (shared, cached NSE client)
 # -------------------------------------------------
 def get_spot_price(symbol="NIFTY 50"):
     try:
-        r = session.get("https://www.nseindia.com/api/allIndices", timeout=5)
-        data = r.json()
-
-        for item in data["data"]:
-            if item["index"] == symbol:
-                return float(item["last"])
-        return None
+        item = index_quote(symbol, max_age=SPOT_MAX_AGE)  # never a frozen spot: raises once too old
+        return float(item["last"]) if item else None
     except:
         return None
 
 def get_option_chain(symbol="NIFTY", strike=None):
     try:
-        url = f"https://www.nseindia.com/api/option-chain-indices?symbol={symbol}"
-        r = session.get(url, timeout=5)
-        data = r.json()
-
-        df = pd.json_normalize(data["records"]["data"])
-        df = df.dropna(subset=["strikePrice"])
-
-        row = df[df["strikePrice"] == strike]
-        if row.empty:
-            return None, None
-
-        return row.iloc[0]["CE.lastPrice"], row.iloc[0]["PE.lastPrice"]
+        # Nearest expiry, last prices only: arrays, no dict tree kept on the payload
+        return strike_premiums(option_chain(symbol).chain(fields=PREMIUM_FIELDS), strike)
     except:
         return None, None
 
 def get_atm_strike(spot, step=50):
     return int(round(spot / step) * step)
 
+# -------------------------------------------------
+# Shared Background Poller (one per server process)
+# -------------------------------------------------
+# Day-open references and indicator state live with the poller thread, so
+# every tick is derived from the previous one instead of the full history
+def poll_tick(state):
+    spot = get_spot_price()
+    if spot is None:
+        reset_session()  # reconnect to NSE on the next tick
+        return None
+
+    atm = get_atm_strike(spot)
+    ce, pe = get_option_chain("NIFTY", atm)
+    if ce is None:
+        reset_session()
+        return None
+
+    now = datetime.datetime.now(IST)
+    if state["day"] != now.date():
+        state.update(day=now.date(), open=(spot, ce, pe), prev=None)
+    open_spot, open_ce, open_pe = state["open"]
+    tick = {"time": now, "atm": atm, "spot": spot, "ce": ce, "pe": pe,
+            "spot_delta": spot - open_spot, "ce_delta": ce - open_ce, "pe_delta": pe - open_pe}
+
+    # Real delta (momentum ratios) against the previous tick
+    prev = state["prev"]
+    s_chg = spot - prev["spot"] if prev else 0
+    tick["real_delta_ce"] = (ce - prev["ce"]) / s_chg if s_chg else 0
+    tick["real_delta_pe"] = (pe - prev["pe"]) / s_chg if s_chg else 0
+    state["prev"] = tick
+
+    # ATM premium VWAP / OI buildup, updated incrementally across all strikes
+    try:
+        payload = option_chain("NIFTY")
+        indicators = state["indicators"]
+        if is_new_payload("option.indicators", payload):  # repeats would read as zero OI velocity
+            decoded = payload.chain(fields=INDICATOR_FIELDS)
+            indicators.update(next(iter(decoded["chains"].values())), payload.exchange_time(IST) or now)
+        frame = indicators.frame
+        row = frame[frame["strike"] == atm] if not frame.empty else frame
+        if not row.empty:
+            row = row.iloc[0]
+            tick.update(ce_vwap=row["CE_vwap"], pe_vwap=row["PE_vwap"],
+                        ce_buildup=row["CE_buildup"], pe_buildup=row["PE_buildup"])
+    except:
+        pass
+    return tick
+
+@st.cache_resource
+def get_live_feed():
+    # Warm restart: today's day-open references, indicator state and ticks
+    # come back from the checkpoint instead of re-basing to the current tick
+    saved = load_checkpoint("option") or {}
+    state = saved.get("state") or {"day": None, "open": None, "prev": None, "indicators": ChainIndicators()}
+    feed = LiveFeed(lambda: checkpointed_tick(state, feed), name="option-momentum")
+    feed.restore(saved.get("history", []))
+    return feed.start()
+
+def checkpointed_tick(state, feed):
+    tick = poll_tick(state)
+    if tick is not None:
+        first = len(feed.history) == 0  # day-open references just set: write now
+        save_checkpoint("option", {"state": state, "history": feed.history + [tick]}, tick["time"].date(), force=first)
+    return tick
+
+def build_momentum(history):
+    # Deltas are computed per tick in poll_tick; this only lays them out
+    return pd.DataFrame(history)[["time", "spot_delta", "ce_delta", "pe_delta", "real_delta_ce", "real_delta_pe"]]
+
 # -------------------------------------------------
 # Streamlit Config
 # -------------------------------------------------
 st.set_page_config(page_title="Option Momentum Dashboard", layout="wide")
 st.title("📈 ATM Options Momentum (Normalized to 0 at Day Start)")
 
-# Auto-refresh = 30 sec (default)
+# NSE poll interval = 30 sec (default); the screen updates as soon as a tick lands
 refresh_rate = st.sidebar.slider("Refresh interval (seconds)", 5, 60, 30)
+chart_minutes, chart_points = zoom_controls("momentum")
 
-placeholder = st.empty()
-
-if "history" not in st.session_state:
-    st.session_state.history = []
-    st.session_state.open_spot = None
-    st.session_state.open_ce = None
-    st.session_state.open_pe = None
+if "viewer_id" not in st.session_state:
+    st.session_state.viewer_id = uuid.uuid4().hex
 
-# -------------------------------------------------
-# Market Timings
-# -------------------------------------------------
-market_start = datetime.time(9, 10)
-market_end   = datetime.time(15, 45)
+feed = get_live_feed()
+feed.request_interval(st.session_state.viewer_id, refresh_rate)
 
 # -------------------------------------------------
-# Live Loop
+# Live View (reads the feed's latest snapshot; never waits for a tick)
 # -------------------------------------------------
-while True:
-
-    now = datetime.datetime.now().time()
+# A fragment: each new tick reruns only this view, not the title/sidebar
+@st.fragment
+def live_view():
+    rerun_on_publish(feed.name)  # registers this fragment; nothing waits in between
+    version, tick, history = feed.snapshot()
 
     # -------------------------------------
-    # Market Timing Check
+    # Market Timing Check (exchange calendar)
     # -------------------------------------
-    if not (market_start <= now <= market_end):
-        with placeholder.container():
-            st.warning("⏳ Market is closed. Live updates resume at **9:10 AM**.")
-        time.sleep(refresh_rate)
-        continue  # stop updating until market reopens
-
-    # When within market hours → fetch data
-    spot = get_spot_price()
-    if spot is None:
-        st.error("Failed to fetch Spot… reconnecting to NSE")
-        session = get_nse_session()
-        time.sleep(refresh_rate)
-        continue
-
-    atm = get_atm_strike(spot)
-    ce, pe = get_option_chain("NIFTY", atm)
-
-    if ce is None:
-        st.error("Failed to fetch option chain… reconnecting")
-        session = get_nse_session()
-        time.sleep(refresh_rate)
-        continue
-
-    # Initialization at first tick
-    if st.session_state.open_spot is None:
-        st.session_state.open_spot = spot
-        st.session_state.open_ce = ce
-        st.session_state.open_pe = pe
-
-    # Normalized changes
-    spot_delta = spot - st.session_state.open_spot
-    ce_delta = ce - st.session_state.open_ce
-    pe_delta = pe - st.session_state.open_pe
-
-    # Real delta (momentum ratios)
-    if len(st.session_state.history) > 1:
-        prev = st.session_state.history[-1]
-        s_chg = spot_delta - prev["spot_delta"]
-        c_chg = ce_delta - prev["ce_delta"]
-        p_chg = pe_delta - prev["pe_delta"]
-
-        real_delta_ce = c_chg / s_chg if s_chg != 0 else 0
-        real_delta_pe = p_chg / s_chg if s_chg != 0 else 0
-    else:
-        real_delta_ce = 0
-        real_delta_pe = 0
-
-    # Store values for chart/table
-    st.session_state.history.append({
-        "time": datetime.datetime.now(),
-        "spot_delta": spot_delta,
-        "ce_delta": ce_delta,
-        "pe_delta": pe_delta,
-        "real_delta_ce": real_delta_ce,
-        "real_delta_pe": real_delta_pe
-    })
-
-    df = pd.DataFrame(st.session_state.history)
+    if not is_capture_window() and tick is None:
+        st.warning(f"⏳ Market is closed. Live updates resume at **{next_session_start():%a %d %b, %H:%M}**.")
+        return
+
+    if tick is None:
+        if feed.error:
+            st.error("Failed to fetch Spot/option chain… reconnecting to NSE")
+        else:
+            st.info("Waiting for the first tick…")
+        return
+
+    if feed.error:
+        st.warning("Last fetch failed — showing the previous tick.")
+
+    # Only rebuild the frame when the feed published something new
+    if st.session_state.get("momentum_version") != version:
+        st.session_state.momentum_df = build_momentum(history)
+        st.session_state.momentum_version = version
+    df = st.session_state.momentum_df
+    last = df.iloc[-1]
 
     # -------------------------------------------------
     # UI Display
     # -------------------------------------------------
-    with placeholder.container():
-
-        st.subheader(f"ATM Strike: {atm}")
-
-        col1, col2, col3 = st.columns(3)
-        col1.metric("Spot", f"{spot:.2f}", f"{spot_delta:+.2f}")
-        col2.metric("CE", f"{ce:.2f}", f"{ce_delta:+.2f}")
-        col3.metric("PE", f"{pe:.2f}", f"{pe_delta:+.2f}")
-
-        st.subheader("🧭 Normalized Momentum Chart (Start = 0)")
-        st.line_chart(
-            df.set_index("time")[["spot_delta", "ce_delta", "pe_delta"]]
-        )
-
-        st.subheader("📌 Real Momentum Ratio (Option vs Spot Movement)")
-        col4, col5 = st.columns(2)
-        col4.metric("CE Real Delta", f"{real_delta_ce:.2f}")
-        col5.metric("PE Real Delta", f"{real_delta_pe:.2f}")
-
-        st.dataframe(df.tail(20))
-
-    time.sleep(refresh_rate)
+    st.subheader(f"ATM Strike: {tick['atm']}")
+
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Spot", f"{tick['spot']:.2f}", f"{last['spot_delta']:+.2f}")
+    col2.metric("CE", f"{tick['ce']:.2f}", f"{last['ce_delta']:+.2f}")
+    col3.metric("PE", f"{tick['pe']:.2f}", f"{last['pe_delta']:+.2f}")
+
+    st.subheader("🧭 Normalized Momentum Chart (Start = 0)")
+    # Bounded, shape-preserving chart payload however long the session runs
+    chart = chart_frame("option.momentum", df, ["spot_delta", "ce_delta", "pe_delta"],
+                        df["time"].astype("int64") // 10**9, chart_points, chart_minutes)
+    st.line_chart(
+        chart.set_index("time")[["spot_delta", "ce_delta", "pe_delta"]]
+    )
+
+    st.subheader("📌 Real Momentum Ratio (Option vs Spot Movement)")
+    col4, col5 = st.columns(2)
+    col4.metric("CE Real Delta", f"{last['real_delta_ce']:.2f}")
+    col5.metric("PE Real Delta", f"{last['real_delta_pe']:.2f}")
+
+    if pd.notna(tick.get("ce_vwap")):
+        st.subheader("📊 ATM Premium VWAP & OI Buildup")
+        col6, col7 = st.columns(2)
+        col6.metric("CE VWAP", f"{tick['ce_vwap']:.2f}", f"{tick['ce'] - tick['ce_vwap']:+.2f} vs VWAP")
+        col7.metric("PE VWAP", f"{tick['pe_vwap']:.2f}", f"{tick['pe'] - tick['pe_vwap']:+.2f} vs VWAP")
+        col6.caption(f"CE: {tick['ce_buildup']}")
+        col7.caption(f"PE: {tick['pe_buildup']}")
+
+    st.dataframe(df.tail(20))
+
+live_view()
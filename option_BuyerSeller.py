@@ -1,8 +1,21 @@
+import time
+import threading
 import streamlit as st
-import requests
+import numpy as np
 import pandas as pd
-from datetime import datetime, time as dt_time
-import time
+from datetime import datetime
+from market_calendar import is_market_open
+from nse_payload import is_new_payload
+from nse_client import option_chain
+from option_metrics import STRIKE_WINDOWS, atm_strikes, strike_premiums
+from iv_surface import IVSurface, IV_FIELDS
+from scenarios import STRATEGIES, DECISION_STRATEGY, LOT_SIZE, strategy_spec, chain_legs, scenario_grid, expiry_payoff, breakevens, render_pnl_heatmap
+from indicators import ChainIndicators, DecisionGrid, DECISION_WINDOWS, INDICATOR_FIELDS, render_decision_heatmap
+from history_schema import compact, append_compact, timestamps, frame_bytes
+from pubsub import chain_updates, rerun_on_publish
+from downsample import chart_frame, zoom_controls
+from checkpoint import load as load_checkpoint, save_async as save_checkpoint
+from nse_payload import restore_fingerprints, seen_fingerprints
 
 # ----------------------------------------------------------
 # Page Config
@@ -10,141 +23,309 @@ import time
 st.set_page_config(layout="wide")
 st.title("📈 NIFTY – 5 ATM Strike Premium Tracker (Always Showing Latest Prices)")
 
-# ----------------------------------------------------------
-# Auto-refresh every 5 minutes
-# ----------------------------------------------------------
-REFRESH_INTERVAL = 300  # seconds
-
-if "last_refresh" not in st.session_state:
-    st.session_state.last_refresh = time.time()
-
-if time.time() - st.session_state.last_refresh >= REFRESH_INTERVAL:
-    st.session_state.last_refresh = time.time()
-    st.rerun()
-
 # ----------------------------------------------------------
 # Fetch Option Chain
 # ----------------------------------------------------------
-@st.cache_data(ttl=60)
 def fetch_option_chain():
-    url = "https://www.nseindia.com/api/option-chain-indices?symbol=NIFTY"
-    headers = {
-        "User-Agent": "Mozilla/5.0",
-        "Accept-Language": "en-US,en;q=0.9",
-        "Referer": "https://www.nseindia.com"
-    }
     try:
-        session = requests.Session()
-        resp = session.get(url, headers=headers, timeout=10)
-        return resp.json()
+        return option_chain("NIFTY")  # process-wide cache, one upstream call for all viewers
     except:
         return None
 
 # ----------------------------------------------------------
-# ATM & 5 Strike Calculation
+# ATM ±N Strike Calculation
 # ----------------------------------------------------------
-def get_5_atm_strikes(spot):
-    atm = round(spot / 50) * 50
-    return [atm - 100, atm - 50, atm, atm + 50, atm + 100]
+STRIKE_STEP = 50
+strike_count = st.sidebar.selectbox("Strikes around ATM", STRIKE_WINDOWS)
+chart_minutes, chart_points = zoom_controls("premiums")
 
 # ----------------------------------------------------------
-# Storage for full-day multi-strike data
+# Warm restart: today's log, indicator/decision/IV state and the last
+# logged snapshot's fingerprint come back from one checkpoint file
 # ----------------------------------------------------------
-if "multi_log" not in st.session_state:
-    st.session_state.multi_log = []
+@st.cache_resource
+def get_restored():
+    saved = load_checkpoint("option_BuyerSeller") or {}
+    restore_fingerprints(saved.get("seen", {}))
+    return saved
+
+restored = get_restored()
+
+def checkpoint_state():
+    # Queued for the shared writer thread; the logged fingerprints version it,
+    # so viewers racing on the same snapshot queue one write, not one each
+    seen = seen_fingerprints("option_BuyerSeller.")
+    multi = multi_log["df"]
+    save_checkpoint("option_BuyerSeller", lambda: {
+        "multi_log": multi,
+        "indicators": indicators,
+        "decision_grid": decision_grid,
+        "iv_surface": iv_surface,
+        "seen": seen,
+    }, version=tuple(sorted(seen.items())), lock=state_lock)
 
 # ----------------------------------------------------------
-# Fetch data
+# Storage for full-day multi-strike data (shared by all viewers):
+# one compact frame, int64 epoch "ts" + float32 premiums
 # ----------------------------------------------------------
-data = fetch_option_chain()
-if not data:
-    st.error("Could not fetch option chain (NSE blocking).")
-    st.stop()
+@st.cache_resource
+def get_multi_log():
+    return {"df": restored.get("multi_log", compact(None))}
 
-spot = data["records"]["underlyingValue"]
-strikes = get_5_atm_strikes(spot)
+multi_log = get_multi_log()
+if not multi_log["df"].empty and timestamps(multi_log["df"]).iloc[-1].date() != datetime.now().date():
+    multi_log["df"] = compact(None)  # new trading day
 
-st.subheader(f"🔵 Spot Price: {spot}")
-st.write(f"Tracking 5 ATM strikes: {strikes}")
+# One lock for the shared indicator / decision / IV objects below: updates,
+# reads and the checkpoint pickle all hold it, so no viewer sees (or saves)
+# a half-applied snapshot or a DecisionGrid buffer mid-reallocation
+@st.cache_resource
+def get_state_lock():
+    return threading.Lock()
 
-# Create map for quick lookup
-oc_map = {item["strikePrice"]: item for item in data["records"]["data"]}
+state_lock = get_state_lock()
 
-# ----------------------------------------------------------
-# Always show latest fetched CE/PE values (even if market closed)
-# ----------------------------------------------------------
-latest_row = {"timestamp": datetime.now(), "spot": spot}
+# Intraday indicators (VWAP, OI velocity, buildup, day-open decision) for every
+# strike of the nearest expiry, updated once per new snapshot
+@st.cache_resource
+def get_indicators():
+    return restored.get("indicators") or ChainIndicators()
 
-for strike in strikes:
-    ce = oc_map.get(strike, {}).get("CE", {}).get("lastPrice", None)
-    pe = oc_map.get(strike, {}).get("PE", {}).get("lastPrice", None)
-    latest_row[f"CE_{strike}"] = ce
-    latest_row[f"PE_{strike}"] = pe
+indicators = get_indicators()
 
-st.write("### 📌 Latest CE/PE Prices (Live)")
-st.dataframe(pd.DataFrame([latest_row]), use_container_width=True)
+# Every expiry × strike premium per snapshot, for the full-chain decision heatmap
+@st.cache_resource
+def get_decision_grid():
+    return restored.get("decision_grid") or DecisionGrid()
 
-# ----------------------------------------------------------
-# Log data during market hours ONLY
-# ----------------------------------------------------------
-now_time = datetime.now().time()
-if dt_time(9, 15) <= now_time <= dt_time(15, 30):
-    st.session_state.multi_log.append(latest_row)
-else:
-    st.info("📭 Market closed now — logging paused. Showing last available prices above.")
+decision_grid = get_decision_grid()
 
-# ----------------------------------------------------------
-# Show full-day logged data if any
-# ----------------------------------------------------------
-df = pd.DataFrame(st.session_state.multi_log)
+# Implied-volatility surface (all expiries), refit per changed slice
+@st.cache_resource
+def get_iv_surface():
+    return restored.get("iv_surface") or IVSurface()
 
-if not df.empty:
-    st.write("### 📄 Full-Day CE/PE Premium Data")
-    st.dataframe(df, use_container_width=True)
+iv_surface = get_iv_surface()
 
-    st.write("### 📉 Full-Day Premium Trend")
-    chart_df = df.set_index("timestamp")[
-        [f"CE_{s}" for s in strikes] + [f"PE_{s}" for s in strikes]
-    ]
-    st.line_chart(chart_df)
+# Cached renders shared by every viewer (module level, outside the fragment)
+@st.cache_data(max_entries=64)
+def decision_heatmap(_grid, rows, minutes, shown, atm):
+    # `rows` (snapshots in the grid) keys the cache, so a new snapshot redraws once
+    with state_lock:
+        heat = _grid.heatmap(minutes, shown)
+    return render_decision_heatmap(*heat, atm=atm)
 
-# ----------------------------------------------------------
-# Decision Engine (only if enough data)
-# ----------------------------------------------------------
-if not df.empty:
-    st.write("## 🔍 Decision Summary (All ATM Strikes)")
-
-    def strike_decision(start_ce, end_ce, start_pe, end_pe):
-        ce_trend = end_ce - start_ce
-        pe_trend = end_pe - start_pe
-
-        if ce_trend < 0 and pe_trend < 0:
-            return "💰 Premium Decay → SELL Options"
-        if ce_trend > 0 and pe_trend < 0:
-            return "📈 Bullish → BUY CE"
-        if pe_trend > 0 and ce_trend < 0:
-            return "📉 Bearish → BUY PE"
-        if ce_trend > 0 and pe_trend > 0:
-            return "⚡ Volatility → BUY Straddle/Strangle"
-        return "😐 Rangebound → Low Confidence"
-
-    for strike in strikes:
-        try:
-            start_ce = df[f"CE_{strike}"].iloc[0]
-            end_ce   = df[f"CE_{strike}"].iloc[-1]
-            start_pe = df[f"PE_{strike}"].iloc[0]
-            end_pe   = df[f"PE_{strike}"].iloc[-1]
-            st.write(f"### Strike {strike}: {strike_decision(start_ce, end_ce, start_pe, end_pe)}")
-        except:
-            st.write(f"### Strike {strike}: Not enough data")
+@st.cache_data(max_entries=32)
+def scenario_heatmap(_spots, _elapsed, _pnl, key, spot, marks):
+    # `key` (legs + grid + shock) identifies the surface, so only new premiums redraw
+    return render_pnl_heatmap(_spots, _elapsed, _pnl, spot, marks)
 
 # ----------------------------------------------------------
-# CSV Download
+# Push refresh: everything below is one fragment that reruns as soon as the
+# exchange publishes a new snapshot (never on a timer, never while closed);
+# the title and sidebar stay as drawn
 # ----------------------------------------------------------
-if not df.empty:
-    st.download_button(
-        "⬇ Download 5-Strike Premium Data",
-        df.to_csv(index=False),
-        "nifty_5strike_premium_data.csv",
-        "text/csv"
+@st.fragment
+def live_tracker(strike_count, chart_minutes, chart_points):
+    rerun_on_publish(chain_updates("NIFTY"))
+
+    # ----------------------------------------------------------
+    # Fetch data
+    # ----------------------------------------------------------
+    payload = fetch_option_chain()
+    if not payload:
+        st.error("Could not fetch option chain (NSE blocking).")
+        return
+    # Nearest expiry as arrays (also feeds the indicators below): no dict tree kept on the payload
+    decoded = payload.chain(fields=INDICATOR_FIELDS)
+
+    spot = decoded["underlyingValue"]
+    strikes = atm_strikes(spot, strike_count, STRIKE_STEP)
+    # The shared log always holds the widest window so every viewer's choice is covered
+    log_strikes = atm_strikes(spot, max(STRIKE_WINDOWS), STRIKE_STEP)
+
+    st.subheader(f"🔵 Spot Price: {spot}")
+    st.write(f"Tracking {strike_count} ATM strikes: {strikes}")
+
+    # ----------------------------------------------------------
+    # Always show latest fetched CE/PE values (even if market closed)
+    # ----------------------------------------------------------
+    latest_row = {"timestamp": datetime.now(), "spot": spot}
+
+    for strike in log_strikes:
+        ce, pe = strike_premiums(decoded, strike)
+        latest_row[f"CE_{strike}"] = ce
+        latest_row[f"PE_{strike}"] = pe
+
+    view_cols = ["timestamp", "spot"] + [f"CE_{s}" for s in strikes] + [f"PE_{s}" for s in strikes]
+
+    st.write("### 📌 Latest CE/PE Prices (Live)")
+    st.dataframe(pd.DataFrame([latest_row])[view_cols], use_container_width=True)
+
+    # ----------------------------------------------------------
+    # Log data during market hours ONLY
+    # ----------------------------------------------------------
+    if is_market_open():
+        # One row per exchange snapshot, stamped with the exchange time
+        if is_new_payload("option_BuyerSeller.log", payload):
+            latest_row["timestamp"] = payload.exchange_time() or latest_row["timestamp"]
+            multi_log["df"] = append_compact(multi_log["df"], latest_row)
+            grid_chain = payload.chain(expiries=None, fields=("lastPrice",))
+            with state_lock:
+                indicators.update(next(iter(decoded["chains"].values())), latest_row["timestamp"])
+                decision_grid.update(grid_chain, latest_row["timestamp"])
+            checkpoint_state()
+    else:
+        st.info("📭 Market closed now — logging paused. Showing last available prices above.")
+
+    if is_new_payload("option_BuyerSeller.iv", payload):
+        iv_chain = payload.chain(expiries=None, fields=IV_FIELDS)
+        with state_lock:
+            iv_surface.update(iv_chain, payload.exchange_time() or datetime.now())
+        checkpoint_state()
+
+    # ----------------------------------------------------------
+    # Show full-day logged data if any
+    # ----------------------------------------------------------
+    df = multi_log["df"]
+
+    if not df.empty:
+        df = df.reindex(columns=list(dict.fromkeys(["ts"] + view_cols[1:] + list(df.columns))))
+        df.insert(0, "timestamp", timestamps(df).dt.tz_localize(None))
+
+        st.write("### 📄 Full-Day CE/PE Premium Data")
+        st.dataframe(df[view_cols], use_container_width=True)
+
+        st.write("### 📉 Full-Day Premium Trend")
+        # Min/max-downsampled to the chart width; every strike's spikes survive
+        chart_df = chart_frame("buyerseller.premiums", df, view_cols[2:], df["ts"], chart_points, chart_minutes)
+        st.line_chart(chart_df.set_index("timestamp")[view_cols[2:]])
+
+    # ----------------------------------------------------------
+    # Decision Engine + intraday indicators (incremental state, no history scan)
+    # ----------------------------------------------------------
+    with state_lock:
+        grid_rows = decision_grid.rows
+    if grid_rows:
+        st.write("## 🔍 Decision Heatmap (All Expiries × Strikes)")
+        col_w, col_n = st.columns(2)
+        window_label = col_w.selectbox("Decision window", list(DECISION_WINDOWS))
+        heat_count = col_n.slider("Strikes shown around ATM", 11, 61, 21, step=2)
+        shown = tuple(atm_strikes(spot, heat_count, STRIKE_STEP))
+        st.image(decision_heatmap(decision_grid, grid_rows, DECISION_WINDOWS[window_label], shown, spot))
+        st.caption("Each cell compares CE/PE premium change over the window (start = first quote inside it).")
+
+    if not df.empty:
+        with state_lock:
+            window = indicators.window(strikes)
+        window = window.set_index("strike")
+        if not window.empty:
+            st.write("### 📊 Premium VWAP, OI Velocity & Buildup")
+            st.dataframe(window[[
+                "decision", "CE_price", "CE_vwap", "CE_oi_velocity", "CE_oi_accel", "CE_buildup",
+                "PE_price", "PE_vwap", "PE_oi_velocity", "PE_oi_accel", "PE_buildup",
+            ]], use_container_width=True)
+            st.caption("OI velocity/acceleration in contracts per minute; buildup is price vs OI change since the first snapshot of the day.")
+
+    # ----------------------------------------------------------
+    # IV Surface: term structure, smile/skew, history
+    # ----------------------------------------------------------
+    with state_lock:
+        term = iv_surface.term_structure() if iv_surface.slices else None
+    if term is not None and term["atm_iv"].notna().any():
+        st.write("## 🌋 Implied Volatility Surface")
+        col_t, col_s = st.columns(2)
+
+        col_t.write("### Term Structure (ATM IV by days to expiry)")
+        col_t.line_chart(term.dropna(subset=["atm_iv"]).set_index("days")[["atm_iv"]])
+        col_t.dataframe(term.round(2), use_container_width=True, hide_index=True)
+
+        expiry = col_s.selectbox("Smile expiry", list(term["expiry"]))
+        with state_lock:
+            smile, skew, hist = iv_surface.smile(expiry), iv_surface.skew(expiry), iv_surface.history_frame(expiry)
+        col_s.write(f"### Smile {expiry} (skew {skew:+.2f} vol pts)")
+        if not smile.empty:
+            col_s.line_chart(smile.set_index("strike")[["market_iv", "fitted_iv"]])
+
+        if len(hist) > 1:
+            st.write(f"### ATM IV & Skew History ({expiry})")
+            hist = chart_frame(f"buyerseller.iv.{expiry}", hist, ["atm_iv", "skew"],
+                               hist["time"].astype("int64") // 10**9, chart_points, chart_minutes)
+            st.line_chart(hist.set_index("time")[["atm_iv", "skew"]])
+
+    # ----------------------------------------------------------
+    # Scenario P&L: multi-leg position on the tracked strikes, live premiums,
+    # spot × days elapsed × IV shock grid in one vectorized pass
+    # ----------------------------------------------------------
+    st.write("## 🧮 Scenario P&L")
+    atm = strikes[len(strikes) // 2]
+    with state_lock:
+        atm_row = indicators.window([atm])
+    suggested = DECISION_STRATEGY.get(atm_row["decision"].iloc[0], "Long Straddle") if not atm_row.empty else "Long Straddle"
+
+    col_p, col_r, col_v, col_l = st.columns(4)
+    strategy = col_p.selectbox("Position", list(STRATEGIES), index=list(STRATEGIES).index(suggested),
+                               help=f"Default follows the ATM decision ({suggested})")
+    spot_range = col_r.slider("Spot range ±%", 1, 10, 3)
+    iv_range = col_v.slider("IV shock ± vol pts", 1, 20, 5)
+    lot_size = col_l.number_input("Lot size", 1, 1800, LOT_SIZE)
+
+    spec = st.data_editor(
+        pd.DataFrame(strategy_spec(strategy, atm, STRIKE_STEP), columns=["kind", "strike", "lots"]),
+        num_rows="dynamic", use_container_width=True, key=f"legs.{strategy}.{atm}",
+        column_config={
+            "kind": st.column_config.SelectboxColumn(options=["CE", "PE"], required=True),
+            "strike": st.column_config.SelectboxColumn(options=log_strikes, required=True),
+            "lots": st.column_config.NumberColumn(help="+ buy / − sell", step=1),
+        },
     )
+    now = payload.exchange_time() or datetime.now()
+    legs = chain_legs(payload.chain(fields=IV_FIELDS), [(k, s, int(n)) for k, s, n in spec.dropna().itertuples(index=False)], now)
+
+    if legs:
+        dte = max(legs[0].days, 0.01)
+        spots = np.linspace(spot * (1 - spot_range / 100), spot * (1 + spot_range / 100), 401)
+        elapsed = np.linspace(0, dte, 121)
+        shocks = np.linspace(-iv_range, iv_range, 21)
+
+        started = time.perf_counter()
+        pnl = scenario_grid(legs, spots, elapsed, shocks, lot_size=lot_size)
+        took = (time.perf_counter() - started) * 1000
+
+        at_expiry = expiry_payoff(legs, spots, lot_size)
+        marks = tuple(breakevens(spots, at_expiry).round(1))
+        net = sum(-leg.lots * leg.premium for leg in legs) * lot_size
+
+        m1, m2, m3, m4 = st.columns(4)
+        m1.metric("Net premium", f"₹{net:,.0f}", "credit" if net > 0 else "debit")
+        m2.metric("Max profit (range, expiry)", f"₹{at_expiry.max():,.0f}")
+        m3.metric("Max loss (range, expiry)", f"₹{at_expiry.min():,.0f}")
+        m4.metric("Breakevens", ", ".join(f"{b:,.0f}" for b in marks) or "—")
+
+        mid = len(shocks) // 2
+        st.line_chart(pd.DataFrame({
+            "now": pnl[:, 0, mid], f"+{dte / 2:.1f}d": pnl[:, len(elapsed) // 2, mid], "expiry": at_expiry,
+        }, index=spots.round(1)))
+
+        shock = st.select_slider("IV shock for the surface (vol pts)", options=list(shocks.round(1)), value=0.0)
+        k = int(np.abs(shocks - shock).argmin())
+        key = (tuple(legs), spot_range, iv_range, lot_size, k)
+        st.image(scenario_heatmap(spots, elapsed, pnl[:, :, k], key, spot, marks))
+        st.caption(f"{pnl.size:,} scenarios (spot × days elapsed × IV shock) in {took:.0f} ms; "
+                   "Black-Scholes at each leg's live IV, entry at its last traded price.")
+
+    # ----------------------------------------------------------
+    # CSV Download
+    # ----------------------------------------------------------
+    if not df.empty:
+        st.download_button(
+            "⬇ Download 5-Strike Premium Data",
+            df.drop(columns="ts").to_csv(index=False),
+            "nifty_5strike_premium_data.csv",
+            "text/csv"
+        )
+
+
+live_tracker(strike_count, chart_minutes, chart_points)
+
+st.sidebar.caption(f"History in memory: {frame_bytes(multi_log['df']) / 1024:.1f} KB")
@@ -0,0 +1,152 @@
+from bisect import bisect_left
+
+import numpy as np
+import pandas as pd
+
+# -------------------------------------------------
+# Option-Chain Metrics (shared by dashboards and alerts)
+# -------------------------------------------------
+
+def strike_decision(start_ce, end_ce, start_pe, end_pe):
+    ce_trend = end_ce - start_ce
+    pe_trend = end_pe - start_pe
+
+    if ce_trend < 0 and pe_trend < 0:
+        return "💰 Premium Decay → SELL Options"
+    if ce_trend > 0 and pe_trend < 0:
+        return "📈 Bullish → BUY CE"
+    if pe_trend > 0 and ce_trend < 0:
+        return "📉 Bearish → BUY PE"
+    if ce_trend > 0 and pe_trend > 0:
+        return "⚡ Volatility → BUY Straddle/Strangle"
+    return "😐 Rangebound → Low Confidence"
+
+
+DECISIONS = np.array([
+    "💰 Premium Decay → SELL Options",
+    "📈 Bullish → BUY CE",
+    "📉 Bearish → BUY PE",
+    "⚡ Volatility → BUY Straddle/Strangle",
+    "😐 Rangebound → Low Confidence",
+])
+
+
+def decision_codes(start_ce, end_ce, start_pe, end_pe):
+    """Index into DECISIONS per element; -1 where a price is missing."""
+    ce_trend = np.asarray(end_ce, dtype=float) - np.asarray(start_ce, dtype=float)
+    pe_trend = np.asarray(end_pe, dtype=float) - np.asarray(start_pe, dtype=float)
+    codes = np.select(
+        [(ce_trend < 0) & (pe_trend < 0), (ce_trend > 0) & (pe_trend < 0),
+         (pe_trend > 0) & (ce_trend < 0), (ce_trend > 0) & (pe_trend > 0)],
+        [0, 1, 2, 3], default=4)
+    return np.where(np.isnan(ce_trend) | np.isnan(pe_trend), -1, codes)
+
+
+def strike_decisions(start_ce, end_ce, start_pe, end_pe):
+    """strike_decision() over arrays of strikes at once (missing prices read as rangebound)."""
+    codes = decision_codes(start_ce, end_ce, start_pe, end_pe)
+    return DECISIONS[np.where(codes < 0, len(DECISIONS) - 1, codes)]
+
+
+# -------------------------------------------------
+# Strike Windows (sorted strike index, no per-tick sort)
+# -------------------------------------------------
+STRIKE_WINDOWS = (5, 11, 21)
+PREMIUM_FIELDS = ("lastPrice",)  # Payload.chain() fields for strike_premiums()
+
+
+def atm_strikes(spot, n=5, step=50):
+    """ATM ± n//2 strikes on a fixed step grid (generalizes the old ±100 list)."""
+    atm = round(spot / step) * step
+    half = n // 2
+    return [atm + i * step for i in range(-half, n - half)]
+
+
+def strike_window(strikes, underlying, n=5):
+    """(lo, hi) slice of the n strikes nearest `underlying` in ascending `strikes`.
+
+    O(log len + n): bisect to the insertion point, then grow towards the
+    closer neighbour.
+    """
+    size = len(strikes)
+    lo = hi = bisect_left(strikes, underlying)
+    while hi - lo < n and (lo > 0 or hi < size):
+        if lo == 0:
+            hi += 1
+        elif hi == size:
+            lo -= 1
+        elif underlying - strikes[lo - 1] <= strikes[hi] - underlying:
+            lo -= 1
+        else:
+            hi += 1
+    return lo, hi
+
+
+def chain_window(chain, underlying, n=5):
+    """ATM ±N slice of one expiry's column arrays (Payload.chain())."""
+    lo, hi = strike_window(chain["strike"], underlying, n)
+    return {k: v[lo:hi] for k, v in chain.items()}
+
+
+def strike_premiums(decoded, strike):
+    """(CE, PE) lastPrice at `strike` of the nearest expiry (Payload.chain()); None for a leg not quoted."""
+    chain = next(iter(decoded["chains"].values()), None)
+    if chain is None:
+        return None, None
+    strikes = chain["strike"]
+    i = int(np.searchsorted(strikes, strike))
+    if i == len(strikes) or strikes[i] != strike:
+        return None, None
+    return tuple(None if np.isnan(chain[f"{leg}_lastPrice"][i]) else float(chain[f"{leg}_lastPrice"][i])
+                 for leg in ("CE", "PE"))
+
+
+def atm_oi_table(decoded, n=5, paired=False):
+    """strike / CE_change / PE_change / CE_OI / PE_OI / diff for ATM ±N of the nearest expiry.
+
+    paired=True keeps only strikes quoting both legs; otherwise a missing leg reads 0.
+    """
+    underlying = decoded["underlyingValue"]
+    chain = next(iter(decoded["chains"].values()))
+    if paired:
+        keep = ~(np.isnan(chain["CE_openInterest"]) | np.isnan(chain["PE_openInterest"]))
+        chain = {k: v[keep] for k, v in chain.items()}
+    atm = chain_window(chain, underlying, n)
+    df = pd.DataFrame({
+        "strike": atm["strike"].astype(int),
+        "CE_change": np.nan_to_num(atm["CE_changeinOpenInterest"]).astype(int),
+        "PE_change": np.nan_to_num(atm["PE_changeinOpenInterest"]).astype(int),
+        "CE_OI": np.nan_to_num(atm["CE_openInterest"]).astype(int),
+        "PE_OI": np.nan_to_num(atm["PE_openInterest"]).astype(int),
+    })
+    df["diff"] = abs(df["strike"] - underlying)
+    return df
+
+
+def chain_snapshot(decoded, n=5):
+    """Flat metrics for one decoded option chain (Payload.chain(), nearest expiry)."""
+    underlying = decoded["underlyingValue"]
+    chain = next(iter(decoded["chains"].values()))
+    atm = chain_window(chain, underlying, n)
+    strikes = chain["strike"]
+
+    ce_oi = np.nansum(chain["CE_openInterest"])
+    pe_oi = np.nansum(chain["PE_openInterest"])
+    ce_change = int(np.nansum(atm["CE_changeinOpenInterest"]))
+    pe_change = int(np.nansum(atm["PE_changeinOpenInterest"]))
+    has_rows = len(strikes) > 0
+
+    snapshot = {
+        "spot": underlying,
+        "pcr": round(float(pe_oi / ce_oi), 4) if ce_oi else None,
+        "CE_change": ce_change,
+        "PE_change": pe_change,
+        "ce_pe_diff": ce_change - pe_change,  # > 0 bullish, < 0 bearish
+        "ce_wall": int(strikes[np.argmax(np.nan_to_num(chain["CE_openInterest"]))]) if has_rows else None,
+        "pe_wall": int(strikes[np.argmax(np.nan_to_num(chain["PE_openInterest"]))]) if has_rows else None,
+    }
+    for k, ce, pe in zip(atm["strike"], atm["CE_lastPrice"], atm["PE_lastPrice"]):
+        k = int(k)
+        snapshot[f"CE_{k}"] = None if ce != ce else float(ce)
+        snapshot[f"PE_{k}"] = None if pe != pe else float(pe)
+    return snapshot
@@ -0,0 +1,220 @@
+import cProfile
+import io
+import linecache
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from datetime import datetime
+
+# -------------------------------------------------
+# On-Demand Profiling (one rerun or a time window)
+# -------------------------------------------------
+# Off unless asked for: the only cost of profile_rerun() per rerun is an env
+# / query-parameter lookup. When on, it records cProfile, sampled call stacks
+# and tracemalloc snapshots and writes them to PROFILE_DIR:
+#
+#   <name>-<stamp>.prof         pstats dump (snakeviz, flameprof, pstats)
+#   <name>-<stamp>.txt          top functions by cumulative time
+#   <name>-<stamp>.folded       collapsed stacks (flamegraph.pl, speedscope)
+#   <name>-<stamp>-alloc.txt    top allocators, and growth over the profiled span
+#
+# Toggles:
+#   ?profile=rerun              profile the next rerun of this page (one shot)
+#   ?profile=60                 sample every thread for 60 s (window, no cProfile)
+#   DASH_PROFILE=rerun          profile every rerun of every page
+#   DASH_PROFILE=60             one 60 s window when the first page loads
+
+PROFILE_ENV = os.environ.get("DASH_PROFILE")
+PROFILE_DIR = os.environ.get("PROFILE_DIR", "profiles")
+SAMPLE_INTERVAL = 0.005     # seconds between stack samples
+TRACE_FRAMES = 15           # tracemalloc traceback depth
+TOP_ALLOCATORS = 30
+TOP_FUNCTIONS = 40
+
+_lock = threading.Lock()
+_active = None              # at most one profile at a time (cProfile / tracemalloc are process-wide)
+_env_window_started = False
+
+
+class _Sampler(threading.Thread):
+    """Collapsed call stacks of `thread_ids` (None = every other thread) every SAMPLE_INTERVAL."""
+
+    def __init__(self, thread_ids=None):
+        super().__init__(name="profile-sampler", daemon=True)
+        self.thread_ids = thread_ids
+        self.stacks = Counter()
+        self._halt = threading.Event()
+
+    def run(self):
+        names = {}
+        while not self._halt.wait(SAMPLE_INTERVAL):
+            for tid, frame in sys._current_frames().items():
+                if tid == self.ident or (self.thread_ids and tid not in self.thread_ids):
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                if tid not in names:
+                    names = {t.ident: t.name for t in threading.enumerate()}
+                stack.append(names.get(tid, str(tid)))
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def stop(self):
+        self._halt.set()
+        self.join()
+
+
+class Profile:
+    def __init__(self, name, rerun=True):
+        self.name = name
+        self.rerun = rerun          # cProfile the calling thread; windows only sample
+        self.thread = threading.get_ident()
+        self.retried = False
+        self.profiler = cProfile.Profile() if rerun else None
+        self.sampler = _Sampler({self.thread} if rerun else None)
+        self.started = None
+        self._own_tracemalloc = False
+        self._baseline = None
+
+    def start(self):
+        self.started = time.time()
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(TRACE_FRAMES)
+            self._own_tracemalloc = True
+        self._baseline = tracemalloc.take_snapshot()
+        self.sampler.start()
+        if self.profiler:
+            self.profiler.enable()
+        return self
+
+    def stop(self, note=""):
+        """Stop and write the files; returns the common path prefix."""
+        global _active
+        if self.profiler:
+            self.profiler.disable()
+        self.sampler.stop()
+        snapshot = tracemalloc.take_snapshot()
+        if self._own_tracemalloc:
+            tracemalloc.stop()
+        with _lock:
+            if _active is self:
+                _active = None
+        return self._write(snapshot, note)
+
+    def finish(self):
+        """End of a profiled rerun: write the files and tell the viewer where they are."""
+        base = self.stop()
+        try:
+            import streamlit as st
+            st.toast(f"Profile saved: {base}.*")
+        except Exception:
+            pass
+        return base
+
+    def _write(self, snapshot, note):
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        stamp = datetime.fromtimestamp(self.started).strftime("%Y%m%d-%H%M%S")
+        base = os.path.join(PROFILE_DIR, f"{self.name}-{stamp}{note}")
+        elapsed = time.time() - self.started
+
+        if self.profiler:
+            self.profiler.dump_stats(base + ".prof")
+            out = io.StringIO()
+            pstats.Stats(self.profiler, stream=out).sort_stats("cumulative").print_stats(TOP_FUNCTIONS)
+            with open(base + ".txt", "w") as f:
+                f.write(f"{self.name}: {elapsed:.3f}s wall\n\n{out.getvalue()}")
+
+        with open(base + ".folded", "w") as f:
+            for stack, count in self.sampler.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+        ignore = (tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, linecache.__file__),
+                  tracemalloc.Filter(False, __file__), tracemalloc.Filter(False, "<frozen importlib._bootstrap*>"))
+        snapshot = snapshot.filter_traces(ignore)
+        with open(base + "-alloc.txt", "w") as f:
+            f.write(f"{self.name}: {elapsed:.3f}s, traced {sum(s.size for s in snapshot.statistics('filename')) / 1e6:.1f} MB\n")
+            f.write(f"\nTop {TOP_ALLOCATORS} allocators (live at the end, by line)\n")
+            for stat in snapshot.statistics("lineno")[:TOP_ALLOCATORS]:
+                f.write(f"  {stat}\n")
+            f.write(f"\nTop {TOP_ALLOCATORS} growth over the profiled span\n")
+            for stat in snapshot.compare_to(self._baseline.filter_traces(ignore), "lineno")[:TOP_ALLOCATORS]:
+                f.write(f"  {stat}\n")
+            top = snapshot.statistics("traceback")[:5]
+            for i, stat in enumerate(top, 1):
+                f.write(f"\n#{i} {stat.size / 1024:.1f} KiB in {stat.count} blocks\n")
+                f.write("\n".join(f"  {line}" for line in stat.traceback.format()) + "\n")
+        return base
+
+
+class _Off:
+    def finish(self):
+        return None
+
+
+_OFF = _Off()
+
+
+def _claim(profile):
+    """Register `profile` as the active one; False if another profile is running."""
+    global _active
+    with _lock:
+        if _active is not None:
+            return False
+        _active = profile
+        return True
+
+
+def start_window(name, seconds):
+    """Sample every thread (and trace allocations) for `seconds`, then write the files."""
+    profile = Profile(name, rerun=False)
+    if not _claim(profile):
+        return None
+    profile.start()
+    threading.Timer(seconds, profile.stop, kwargs={"note": f"-window{int(seconds)}s"}).start()
+    return profile
+
+
+def profile_rerun(name):
+    """Call first thing in a page; call .finish() on the result as its last line."""
+    global _env_window_started
+    # A previous profiled rerun of this thread never reached finish() (st.stop, st.rerun,
+    # exception): keep what it recorded and profile this rerun instead, once
+    previous = _active
+    if previous is not None and previous.rerun and previous.thread == threading.get_ident():
+        previous.stop(note="-incomplete")
+        if not previous.retried:
+            profile = Profile(name)
+            profile.retried = True
+            return profile.start() if _claim(profile) else _OFF
+
+    wanted = None
+    try:
+        import streamlit as st
+        wanted = st.query_params.get("profile")
+        if wanted:
+            del st.query_params["profile"]  # one shot
+    except Exception:
+        pass
+    if not wanted and PROFILE_ENV:
+        wanted = PROFILE_ENV
+        if wanted != "rerun":
+            if _env_window_started:
+                return _OFF
+            _env_window_started = True
+    if not wanted:
+        return _OFF
+
+    if wanted != "rerun":
+        try:
+            start_window(name, float(wanted))
+        except ValueError:
+            pass
+        return _OFF
+    profile = Profile(name)
+    return profile.start() if _claim(profile) else _OFF
@@ -0,0 +1,251 @@
+import argparse
+import json
+import os
+import threading
+import time
+import urllib.request
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+# -------------------------------------------------
+# Local Publish / Subscribe
+# -------------------------------------------------
+# Producers publish to a topic the moment a new snapshot lands; watchers
+# (e.g. Streamlit sessions) are woken by the publish itself instead of
+# rerunning on a timer or parking a thread. `hub` is process-wide.
+# A collector process can expose it as Server-Sent Events on localhost
+# (python pubsub.py) and dashboards started with PUBSUB_URL follow that
+# stream instead of polling NSE themselves.
+
+PUBSUB_HOST = "127.0.0.1"
+PUBSUB_PORT = int(os.environ.get("PUBSUB_PORT", "8765"))
+PUBSUB_URL = os.environ.get("PUBSUB_URL")   # e.g. http://127.0.0.1:8765
+KEEPALIVE = 15         # seconds between SSE comments on an idle stream
+
+
+class Hub:
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._topics = {}  # topic -> (version, message)
+        self._watchers = {}  # topic -> {key: callback}
+
+    def publish(self, topic, message=None):
+        with self._cond:
+            version = self._topics.get(topic, (0, None))[0] + 1
+            self._topics[topic] = (version, message)
+            self._cond.notify_all()
+            watchers = list(self._watchers.get(topic, {}).items())
+        for key, callback in watchers:
+            try:
+                keep = callback() is not False
+            except Exception:
+                keep = False
+            if not keep:
+                with self._cond:
+                    if self._watchers.get(topic, {}).get(key) is callback:
+                        del self._watchers[topic][key]
+        return version
+
+    def watch(self, topic, key, callback):
+        """Call callback() after each publish of `topic` until it returns False; one callback per key."""
+        with self._cond:
+            self._watchers.setdefault(topic, {})[key] = callback
+
+    def latest(self, topic):
+        with self._cond:
+            return self._topics.get(topic, (0, None))
+
+    def wait(self, topic, since=0, timeout=None):
+        """(version, message) once `topic` is past `since`, or the current one on timeout."""
+        with self._cond:
+            self._cond.wait_for(lambda: self._topics.get(topic, (0,))[0] > since, timeout)
+            return self._topics.get(topic, (0, None))
+
+    def wait_any(self, seen, timeout=None):
+        """{topic: (version, message)} for every topic in `seen` that moved past its version."""
+        def moved():
+            return {t: self._topics[t] for t, v in seen.items() if self._topics.get(t, (0,))[0] > v}
+
+        with self._cond:
+            self._cond.wait_for(moved, timeout)
+            return moved()
+
+
+hub = Hub()
+
+
+# -------------------------------------------------
+# SSE Server (collector side)
+# -------------------------------------------------
+class _EventHandler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path != "/events":
+            self.send_error(404)
+            return
+        topics = [t for t in parse_qs(url.query).get("topic", [""])[0].split(",") if t]
+        if not topics:
+            self.send_error(400, "topic required")
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+
+        seen = {t: hub.latest(t)[0] for t in topics}
+        try:
+            while True:
+                moved = hub.wait_any(seen, timeout=KEEPALIVE)
+                if not moved:
+                    self.wfile.write(b": keepalive\n\n")
+                for topic, (version, message) in moved.items():
+                    seen[topic] = version
+                    data = json.dumps(message, default=str)
+                    self.wfile.write(f"id: {version}\nevent: {topic}\ndata: {data}\n\n".encode())
+                self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+
+def serve(port=PUBSUB_PORT, host=PUBSUB_HOST):
+    """Expose `hub` at http://host:port/events?topic=a,b (daemon thread)."""
+    server = ThreadingHTTPServer((host, port), _EventHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="pubsub-sse", daemon=True).start()
+    return server
+
+
+# -------------------------------------------------
+# SSE Client (viewer side)
+# -------------------------------------------------
+def subscribe(url, topics, retry=5):
+    """Follow a collector's event stream and republish into the local hub."""
+    def run():
+        while True:
+            try:
+                req = urllib.request.urlopen(f"{url}/events?topic={','.join(topics)}", timeout=KEEPALIVE * 2)
+                event, data = None, []
+                for line in req:
+                    line = line.decode().rstrip("\r\n")
+                    if line.startswith("event:"):
+                        event = line[6:].strip()
+                    elif line.startswith("data:"):
+                        data.append(line[5:].strip())
+                    elif not line and event:
+                        message = json.loads("\n".join(data)) if data else None
+                        if message != hub.latest(event)[1]:  # never echo our own events back
+                            hub.publish(event, message)
+                        event, data = None, []
+            except Exception:
+                pass
+            time.sleep(retry)
+
+    threading.Thread(target=run, name="pubsub-subscriber", daemon=True).start()
+
+
+# -------------------------------------------------
+# Option-Chain Updates
+# -------------------------------------------------
+_producers = {}
+_producers_lock = threading.Lock()
+
+
+def chain_topic(symbol="NIFTY"):
+    return f"chain.{symbol}"
+
+
+def _chain_feed(symbol):
+    from live_feed import LiveFeed, SKIP
+    from market_calendar import IST
+    from nse_client import option_chain
+    from nse_payload import is_new_payload
+
+    def tick():
+        payload = option_chain(symbol)
+        if not is_new_payload(f"pubsub.{symbol}", payload):
+            return SKIP
+        return {"time": payload.exchange_time(IST) or datetime.now(IST), "fingerprint": payload.fingerprint}
+
+    return LiveFeed(tick, name=chain_topic(symbol)).start()  # LiveFeed publishes to `hub`
+
+
+def chain_updates(symbol="NIFTY"):
+    """Make sure something publishes `chain.<symbol>` in this process; returns the topic."""
+    topic = chain_topic(symbol)
+    with _producers_lock:
+        if topic not in _producers:
+            if PUBSUB_URL:
+                subscribe(PUBSUB_URL, [topic])
+                _producers[topic] = PUBSUB_URL
+            else:
+                _producers[topic] = _chain_feed(symbol)
+    return topic
+
+
+def _rerun(session, fragment_id):
+    # On the session's event loop. A fragment rerun replays the last client
+    # state (widget values, page) with only that fragment's id set, the same
+    # request the browser sends when a widget inside the fragment changes.
+    if fragment_id is None:
+        session.request_rerun(None)  # None = keep widget state
+    elif session._fragment_storage.contains(fragment_id):
+        from streamlit.proto.ClientState_pb2 import ClientState
+        state = ClientState()
+        state.CopyFrom(session._client_state)
+        state.fragment_id = fragment_id
+        session.request_rerun(state)
+    # else: a full run is re-registering its fragments and draws the new data itself
+
+
+def _wake_session(session_id, fragment_id=None):
+    """Ask Streamlit to rerun one session (or one fragment of it) from any thread; False once it is gone.
+
+    Streamlit has no public call for this, so it goes through the runtime's
+    session manager and hands the request to the session's event loop.
+    """
+    try:
+        from streamlit.runtime import Runtime
+        info = Runtime.instance()._session_mgr.get_active_session_info(session_id)
+        if info is None:
+            return False
+        session = info.session
+        session._event_loop.call_soon_threadsafe(_rerun, session, fragment_id)
+        return True
+    except Exception:
+        return False
+
+
+def rerun_on_publish(topic):
+    """Streamlit: rerun whenever `topic` publishes. Returns at once (no timer, no wait).
+
+    Called inside an ``st.fragment`` only that fragment reruns, so the rest
+    of the page (header, banners, sidebar) is left as drawn; called at the
+    top level the whole script reruns.
+    """
+    from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+    ctx = get_script_run_ctx()
+    if ctx is None:
+        return  # bare mode: no session to wake
+    session_id, fragment_id = ctx.session_id, ctx.current_fragment_id
+    hub.watch(topic, (session_id, fragment_id), lambda: _wake_session(session_id, fragment_id))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Option-chain collector with a local SSE stream")
+    parser.add_argument("--port", type=int, default=PUBSUB_PORT)
+    parser.add_argument("--symbol", action="append", help="index symbol (repeatable, default NIFTY)")
+    args = parser.parse_args()
+
+    import pubsub  # LiveFeed publishes to pubsub.hub, not this __main__ copy
+    symbols = args.symbol or ["NIFTY"]
+    for symbol in symbols:
+        pubsub._chain_feed(symbol)
+    pubsub.serve(args.port)
+    print(f"publishing on http://{PUBSUB_HOST}:{args.port}/events?topic={','.join(map(chain_topic, symbols))}")
+    threading.Event().wait()
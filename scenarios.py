@@ -0,0 +1,164 @@
+from collections import namedtuple
+
+import numpy as np
+
+from iv_surface import days_to_expiry
+from option_metrics import DECISIONS
+
+# -------------------------------------------------
+# Multi-Leg Position Payoff / Scenario Engine
+# -------------------------------------------------
+# A position is a list of Legs priced off the live chain (entry = lastPrice,
+# vol = the leg's impliedVolatility). scenario_grid() revalues every leg with
+# Black-Scholes over a spot × days-elapsed × IV-shock grid in one broadcast
+# float32 numpy pass, so 10^5–10^6 scenarios stay interactive.
+
+RISK_FREE = 0.065          # annual, continuously compounded
+LOT_SIZE = 75              # NIFTY contract multiplier
+YEAR_DAYS = 365.0
+MIN_VOL = 0.5              # IV floor (vol pts) after a negative shock
+GRID_DTYPE = np.float32
+
+Leg = namedtuple("Leg", "kind strike lots premium iv days")  # lots > 0 buy, < 0 sell; iv in vol pts
+
+# Preset positions as (kind, strikes away from ATM, lots)
+STRATEGIES = {
+    "Short Straddle": [("CE", 0, -1), ("PE", 0, -1)],
+    "Short Strangle": [("CE", 2, -1), ("PE", -2, -1)],
+    "Long CE": [("CE", 0, 1)],
+    "Long PE": [("PE", 0, 1)],
+    "Long Straddle": [("CE", 0, 1), ("PE", 0, 1)],
+    "Long Strangle": [("CE", 2, 1), ("PE", -2, 1)],
+    "Bull Call Spread": [("CE", 0, 1), ("CE", 2, -1)],
+    "Bear Put Spread": [("PE", 0, 1), ("PE", -2, -1)],
+    "Iron Condor": [("CE", 2, -1), ("CE", 4, 1), ("PE", -2, -1), ("PE", -4, 1)],
+}
+
+# What the decision engine's suggestion looks like as a position (DECISIONS order)
+DECISION_STRATEGY = dict(zip(DECISIONS, ["Short Strangle", "Long CE", "Long PE", "Long Straddle", "Iron Condor"]))
+
+
+def strategy_spec(name, atm, step=50):
+    """[(kind, strike, lots)] for a preset around `atm`."""
+    return [(kind, atm + offset * step, lots) for kind, offset, lots in STRATEGIES[name]]
+
+
+def chain_legs(decoded, spec, now, expiry=None):
+    """Legs for `spec` priced from Payload.chain(fields=IV_FIELDS); strikes missing a quote are skipped."""
+    expiry = expiry or next(iter(decoded["chains"]))
+    chain = decoded["chains"][expiry]
+    days = days_to_expiry(expiry, now)
+    ivs = np.concatenate([chain["CE_impliedVolatility"], chain["PE_impliedVolatility"]])
+    fallback = float(np.nanmedian(np.where(ivs > 0, ivs, np.nan))) if np.any(ivs > 0) else 15.0
+
+    legs = []
+    for kind, strike, lots in spec:
+        pos = np.searchsorted(chain["strike"], strike)
+        if pos == len(chain["strike"]) or chain["strike"][pos] != strike or not lots:
+            continue
+        premium, iv = chain[f"{kind}_lastPrice"][pos], chain[f"{kind}_impliedVolatility"][pos]
+        if np.isnan(premium):
+            continue
+        legs.append(Leg(kind, float(strike), lots, float(premium), float(iv) if iv > 0 else fallback, days))
+    return legs
+
+
+def norm_cdf(x):
+    """Standard normal CDF (Abramowitz–Stegun 7.1.26, |error| < 1.5e-7), in place on temporaries."""
+    x = np.asarray(x)
+    if x.ndim == 0:
+        return norm_cdf(x[None])[0]
+    z = np.abs(x)
+    z *= 0.7071067811865476
+    t = z * 0.3275911
+    t += 1
+    np.reciprocal(t, out=t)
+    tail = t * 1.061405429
+    for c in (-1.453152027, 1.421413741, -0.284496736, 0.254829592):
+        tail += c
+        tail *= t
+    np.square(z, out=z)
+    np.negative(z, out=z)
+    np.exp(z, out=z)
+    tail *= z
+    tail *= 0.5  # P(Z > |x|)
+    np.subtract(1, tail, out=tail, where=x > 0)
+    return tail
+
+
+def bs_price(kind, spot, strike, years, vol, rate=RISK_FREE):
+    """Black-Scholes premium broadcast over array arguments; expired (years <= 0) → intrinsic.
+
+    Only the final d1/d2 and CDF steps run at full grid size: time and vol
+    terms stay on their own (small) axes, and puts come from put-call parity.
+    """
+    live = years > 0
+    t = np.where(live, years, 1.0)
+    sd = vol * np.sqrt(t)
+    disc = strike * np.exp(-rate * t)
+    d1 = np.log(spot / strike) + (rate + 0.5 * vol * vol) * t
+    d1 /= sd
+    call = spot * norm_cdf(d1)
+    d1 -= sd
+    call -= disc * norm_cdf(d1)
+    price = call if kind == "CE" else call - spot + disc
+    if not np.all(live):
+        intrinsic = np.maximum(spot - strike, 0) if kind == "CE" else np.maximum(strike - spot, 0)
+        price = np.where(live, price, intrinsic)
+    return price
+
+
+def scenario_grid(legs, spots, elapsed_days, iv_shocks, rate=RISK_FREE, lot_size=LOT_SIZE):
+    """P&L (rupees) shaped (len(spots), len(elapsed_days), len(iv_shocks))."""
+    spot = np.asarray(spots, dtype=GRID_DTYPE)[:, None, None]
+    elapsed = np.asarray(elapsed_days, dtype=GRID_DTYPE)[None, :, None]
+    shock = np.asarray(iv_shocks, dtype=GRID_DTYPE)[None, None, :]
+    pnl = np.zeros((spot.shape[0], elapsed.shape[1], shock.shape[2]), dtype=GRID_DTYPE)
+    for leg in legs:
+        years = np.maximum(leg.days - elapsed, 0) / YEAR_DAYS
+        vol = np.maximum(leg.iv + shock, MIN_VOL) / 100
+        pnl += leg.lots * lot_size * (bs_price(leg.kind, spot, leg.strike, years, vol, rate) - leg.premium)
+    return pnl
+
+
+def expiry_payoff(legs, spots, lot_size=LOT_SIZE):
+    """P&L at expiry for each spot."""
+    spots = np.asarray(spots, dtype=float)
+    pnl = np.zeros(len(spots))
+    for leg in legs:
+        intrinsic = np.maximum(spots - leg.strike, 0) if leg.kind == "CE" else np.maximum(leg.strike - spots, 0)
+        pnl += leg.lots * lot_size * (intrinsic - leg.premium)
+    return pnl
+
+
+def breakevens(spots, pnl):
+    """Spots where a P&L curve crosses zero (linear interpolation)."""
+    spots, pnl = np.asarray(spots, dtype=float), np.asarray(pnl, dtype=float)
+    i = np.nonzero(np.sign(pnl[:-1]) * np.sign(pnl[1:]) < 0)[0]
+    crossed = spots[i] - pnl[i] * (spots[i + 1] - spots[i]) / (pnl[i + 1] - pnl[i])
+    return np.sort(np.concatenate([crossed, spots[pnl == 0]]))
+
+
+def render_pnl_heatmap(spots, elapsed_days, pnl, spot=None, breakeven=()):
+    """PNG bytes: P&L over spot (x) × days elapsed (y) for one IV shock slice."""
+    import io
+    import matplotlib.pyplot as plt
+    from matplotlib.colors import TwoSlopeNorm
+
+    limit = float(np.abs(pnl).max()) or 1.0
+    fig, ax = plt.subplots(figsize=(10, 4))
+    mesh = ax.pcolormesh(spots, elapsed_days, pnl.T, cmap="RdYlGn", shading="auto",
+                         norm=TwoSlopeNorm(0, -limit, limit))
+    ax.contour(spots, elapsed_days, pnl.T, levels=[0], colors="black", linewidths=0.8)
+    if spot is not None:
+        ax.axvline(spot, color="blue", lw=1, ls="--")
+    for b in breakeven:
+        ax.axvline(b, color="black", lw=0.6, ls=":")
+    ax.set_xlabel("Spot")
+    ax.set_ylabel("Days elapsed")
+    fig.colorbar(mesh, ax=ax, label="P&L (₹)")
+    fig.tight_layout()
+    buf = io.BytesIO()
+    fig.savefig(buf, format="png", dpi=110)
+    plt.close(fig)
+    return buf.getvalue()
@@ -0,0 +1,105 @@
+import time
+
+import pytest
+
+import alerts
+from alerts import AlertEngine, ChangeRule, CrossRule, FlipRule, RegimeRule
+
+
+def _fired(rule, values):
+    return [value for value in values if rule.update(value) is not None]
+
+
+def test_cross_up_fires_once_and_rearms_past_the_band():
+    rule = CrossRule("pcr up", "pcr", level=1.2, direction="up", hysteresis=0.05)
+    # 1.0 arms; 1.25 fires; wobbling around the level stays quiet until 1.14 < 1.15 re-arms
+    assert _fired(rule, [1.0, 1.25, 1.19, 1.3, 1.16, 1.21, 1.14, 1.22]) == [1.25, 1.22]
+
+
+def test_cross_down_mirrors_the_band():
+    rule = CrossRule("pcr down", "pcr", level=0.8, direction="down", hysteresis=0.05)
+    assert _fired(rule, [0.9, 0.79, 0.82, 0.78, 0.86, 0.75]) == [0.79, 0.75]
+
+
+def test_cross_first_value_beyond_level_does_not_fire():
+    rule = CrossRule("pcr up", "pcr", level=1.2, hysteresis=0.05)
+    assert _fired(rule, [1.3, 1.4, 1.18, 1.25]) == []  # never went back below 1.15
+    assert _fired(rule, [1.1, 1.25]) == [1.25]
+
+
+def test_flip_ignores_values_inside_the_band():
+    rule = FlipRule("flip", "ce_pe_diff", hysteresis=100)
+    assert _fired(rule, [500, -50, 80, -90, 400]) == []  # never left the positive side
+    assert _fired(rule, [-150, -40, 120, 300, -101]) == [-150, 120, -101]
+
+
+def test_regime_fires_on_entry_only():
+    rule = RegimeRule("decay", "decision_atm", value="Premium Decay")
+    assert _fired(rule, ["💰 Premium Decay → SELL Options", "📈 Bullish → BUY CE",
+                         "💰 Premium Decay → SELL Options", "💰 Premium Decay → SELL Options"]) \
+        == ["💰 Premium Decay → SELL Options"]
+
+
+def test_change_respects_min_delta():
+    rule = ChangeRule("wall", "ce_wall", min_delta=50)
+    assert _fired(rule, [25000, 25020, 25050, 25100, 25100]) == [25050, 25100]
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = _Clock()
+    monkeypatch.setattr(alerts.time, "monotonic", clock)
+    return clock
+
+
+def _engine(cooldown=60, sinks=None):
+    rules = [{"name": "PCR above 1.2", "type": "cross", "metric": "pcr", "level": 1.2, "hysteresis": 0.05},
+             {"name": "CE/PE flip", "type": "flip", "metric": "ce_pe_diff", "hysteresis": 100}]
+    return AlertEngine(rules, sinks=sinks if sinks is not None else [], cooldown=cooldown)
+
+
+def test_engine_cooldown_drops_repeats_of_the_same_rule(clock):
+    engine = _engine(cooldown=60)
+    assert engine.evaluate({"pcr": 1.0}) == []
+    assert [a["rule"] for a in engine.evaluate({"pcr": 1.25})] == ["PCR above 1.2"]
+    engine.evaluate({"pcr": 1.1})                     # re-armed ...
+    clock.now += 30
+    assert engine.evaluate({"pcr": 1.3}) == []        # ... but still inside the cooldown
+    engine.evaluate({"pcr": 1.1})
+    clock.now += 31
+    assert [a["rule"] for a in engine.evaluate({"pcr": 1.3})] == ["PCR above 1.2"]
+
+
+def test_engine_cooldown_is_per_rule(clock):
+    engine = _engine(cooldown=60)
+    engine.evaluate({"pcr": 1.0, "ce_pe_diff": 500})
+    raised = engine.evaluate({"pcr": 1.25, "ce_pe_diff": -500})
+    assert sorted(a["rule"] for a in raised) == ["CE/PE flip", "PCR above 1.2"]
+
+
+def test_engine_skips_unchanged_and_missing_metrics(clock):
+    engine = _engine()
+    engine.evaluate({"pcr": 1.0})
+    rule = engine.rules["pcr"][0]
+    engine.evaluate({"pcr": 1.0, "ce_pe_diff": None})
+    assert rule.armed is True and engine.rules["ce_pe_diff"][0].sign is None
+
+
+def test_engine_dispatches_to_sinks_off_the_evaluation_path(clock):
+    received = []
+    engine = _engine(sinks=[lambda alert: 1 / 0, received.append])  # a failing sink must not stop the rest
+    engine.evaluate({"pcr": 1.0})
+    raised = engine.evaluate({"pcr": 1.25})
+    deadline = time.perf_counter() + 2
+    while not received and time.perf_counter() < deadline:
+        time.sleep(0.01)
+    assert received == raised
+    assert list(engine.recent) == raised
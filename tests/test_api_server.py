@@ -0,0 +1,162 @@
+import gzip
+import http.client
+import json
+
+import pytest
+
+import api_server
+import history_mmap
+from history_mmap import append as mmap_append
+from nse_payload import make_payload
+
+
+@pytest.fixture
+def api(tmp_path, monkeypatch):
+    monkeypatch.setattr(history_mmap, "DATA_DIR", str(tmp_path))
+    api_server._responses.clear()
+    server = api_server.serve(port=0)
+    port = server.server_address[1]
+
+    def get(path, **headers):
+        conn = http.client.HTTPConnection("127.0.0.1", port, timeout=5)
+        conn.request("GET", path, headers=headers)
+        resp = conn.getresponse()
+        body = resp.read()
+        conn.close()
+        return resp, body
+
+    yield get
+    server.shutdown()
+    server.server_close()
+    api_server._responses.clear()
+
+
+def _seed_oi():
+    # Two days, three snapshots each
+    for day in ("2026-10-16", "2026-10-19"):
+        for i, clock in enumerate(("10:00:00", "10:00:03", "10:00:06")):
+            mmap_append("oi", {"CE_change": i + 1, "PE_change": -(i + 1), "CE_OI_total": 100 + i, "PE_OI_total": 200 + i},
+                        (day, clock))
+    return history_mmap.open_series("oi")["ts"].tolist()
+
+
+# -------------------------------------------------
+# History queries
+# -------------------------------------------------
+def test_history_day(api):
+    ts = _seed_oi()
+    resp, body = api("/history/oi?day=2026-10-19")
+    out = json.loads(body)
+    assert resp.status == 200
+    assert out["rows"] == 3 and out["ts"] == ts[3:]
+    assert out["CE_change"] == [1, 2, 3]
+    assert set(out) == {"series", "rows", "ts", "CE_change", "PE_change", "CE_OI_total", "PE_OI_total"}
+
+
+def test_history_start_end_is_half_open(api):
+    ts = _seed_oi()
+    out = json.loads(api("/history/oi?start=2026-10-16T10:00:03%2B05:30&end=2026-10-19T10:00:03%2B05:30")[1])
+    assert out["ts"] == ts[1:4]
+
+
+def test_history_since_limit_and_fields(api):
+    ts = _seed_oi()
+    out = json.loads(api(f"/history/oi?since={ts[1]}&fields=PE_change")[1])
+    assert out["ts"] == ts[2:]
+    assert set(out) == {"series", "rows", "ts", "PE_change"}
+    out = json.loads(api("/history/oi?limit=2")[1])
+    assert out["ts"] == ts[-2:]  # newest rows win
+
+
+@pytest.mark.parametrize("path, status", [
+    ("/history/nope", 404),
+    ("/history/oi?fields=CE_change,bogus", 400),
+    ("/history/oi?day=19-10-2026", 400),
+    ("/history/oi?limit=many", 400),
+    ("/elsewhere", 404),
+])
+def test_history_errors(api, path, status):
+    _seed_oi()
+    resp, body = api(path)
+    assert resp.status == status
+    assert "error" in json.loads(body)
+
+
+# -------------------------------------------------
+# Revalidation and compression
+# -------------------------------------------------
+def test_etag_revalidates_until_the_series_grows(api):
+    _seed_oi()
+    first, body = api("/history/oi?day=2026-10-19")
+    etag = first.getheader("ETag")
+    assert etag and first.getheader("Cache-Control") == "no-cache"
+
+    again, empty = api("/history/oi?day=2026-10-19", **{"If-None-Match": etag})
+    assert again.status == 304 and empty == b"" and again.getheader("ETag") == etag
+
+    mmap_append("oi", {"CE_change": 9, "PE_change": -9, "CE_OI_total": 1, "PE_OI_total": 1}, ("2026-10-19", "10:00:09"))
+    changed, body = api("/history/oi?day=2026-10-19", **{"If-None-Match": etag})
+    assert changed.status == 200 and changed.getheader("ETag") != etag
+    assert json.loads(body)["CE_change"] == [1, 2, 3, 9]
+
+
+def test_encoding_is_reused_while_the_version_holds(api, monkeypatch):
+    _seed_oi()
+    api("/history/oi")
+    monkeypatch.setattr(api_server, "encode", lambda obj: pytest.fail("re-encoded an unchanged resource"))
+    assert api("/history/oi")[0].status == 200
+
+
+def test_large_bodies_are_gzipped_on_request(api):
+    for i in range(200):
+        mmap_append("oi", {"CE_change": i, "PE_change": -i, "CE_OI_total": i, "PE_OI_total": i}, 1_790_000_000 + i)
+    plain, body = api("/history/oi")
+    assert plain.getheader("Content-Encoding") is None and plain.getheader("Vary") == "Accept-Encoding"
+    assert len(body) >= api_server.GZIP_MIN_BYTES
+
+    zipped, packed = api("/history/oi", **{"Accept-Encoding": "gzip, deflate"})
+    assert zipped.getheader("Content-Encoding") == "gzip"
+    assert len(packed) < len(body) and gzip.decompress(packed) == body
+    assert zipped.getheader("ETag") == plain.getheader("ETag")
+
+
+def test_small_bodies_are_never_gzipped(api):
+    _seed_oi()
+    resp, body = api("/history/oi?limit=1", **{"Accept-Encoding": "gzip"})
+    assert resp.getheader("Content-Encoding") is None
+    assert json.loads(body)["rows"] == 1
+
+
+# -------------------------------------------------
+# Snapshot
+# -------------------------------------------------
+def _chain(underlying=25012.3, timestamp="19-Oct-2026 10:00:00"):
+    rows = [{"strikePrice": k, "expiryDate": "21-Oct-2026",
+             "CE": {"lastPrice": 100.0, "openInterest": 1000, "changeinOpenInterest": 10},
+             "PE": {"lastPrice": 90.0, "openInterest": 1500, "changeinOpenInterest": 30}}
+            for k in range(24850, 25200, 50)]
+    return make_payload(json.dumps({"records": {"expiryDates": ["21-Oct-2026"], "underlyingValue": underlying,
+                                                "timestamp": timestamp, "data": rows}}).encode())
+
+
+def test_snapshot_follows_the_payload_fingerprint(api, monkeypatch):
+    payload = _chain()
+    monkeypatch.setattr(api_server, "option_chain", lambda symbol: payload)
+    resp, body = api("/snapshot?n=5")
+    out = json.loads(body)
+    assert out["fingerprint"] == payload.fingerprint and out["spot"] == 25012.3
+    assert (out["CE_change"], out["PE_change"], out["sentiment"]) == (50, 150, "BEARISH")
+    assert out["time"] == "2026-10-19T10:00:00+05:30"
+    assert api("/snapshot?n=5", **{"If-None-Match": resp.getheader("ETag")})[0].status == 304
+
+    payload = _chain(timestamp="19-Oct-2026 10:00:03")
+    resp2, _ = api("/snapshot?n=5", **{"If-None-Match": resp.getheader("ETag")})
+    assert resp2.status == 200
+
+
+def test_snapshot_unavailable_is_503(api, monkeypatch):
+    def down(symbol):
+        raise ConnectionError("blocked")
+    monkeypatch.setattr(api_server, "option_chain", down)
+    resp, body = api("/snapshot")
+    assert resp.status == 503 and "blocked" in json.loads(body)["error"]
@@ -0,0 +1,105 @@
+import pickle
+import threading
+import time
+from datetime import date, datetime
+
+import numpy as np
+
+import checkpoint
+from checkpoint import flush, load, save, save_async
+from indicators import DecisionGrid
+from market_calendar import IST
+
+
+def test_save_load_same_day_only(tmp_path, monkeypatch):
+    monkeypatch.setattr(checkpoint, "CHECKPOINT_DIR", str(tmp_path))
+    assert save("tests.day", {"open": 25000.0}, day=date(2026, 10, 19), force=True)
+    assert load("tests.day", day=date(2026, 10, 19)) == {"open": 25000.0}
+    assert load("tests.day", day=date(2026, 10, 20)) is None
+    assert load("tests.missing") is None
+
+
+def test_save_is_throttled_unless_forced(tmp_path, monkeypatch):
+    monkeypatch.setattr(checkpoint, "CHECKPOINT_DIR", str(tmp_path))
+    assert save("tests.throttle", 1, force=True)
+    assert not save("tests.throttle", 2)
+    assert load("tests.throttle") == 1
+    assert save("tests.throttle", 3, force=True)
+    assert load("tests.throttle") == 3
+
+
+def test_save_async_skips_written_version(tmp_path, monkeypatch):
+    monkeypatch.setattr(checkpoint, "CHECKPOINT_DIR", str(tmp_path))
+    assert save_async("tests.version", lambda: "a", version=1, force=True)
+    assert flush()
+    assert load("tests.version") == "a"
+    assert not save_async("tests.version", lambda: "b", version=1, force=True)
+    assert save_async("tests.version", lambda: "c", version=2, force=True)
+    assert flush()
+    assert load("tests.version") == "c"
+
+
+def test_save_async_writes_only_the_newest_queued(tmp_path, monkeypatch):
+    monkeypatch.setattr(checkpoint, "CHECKPOINT_DIR", str(tmp_path))
+    lock = threading.Lock()
+    built = []
+
+    def state(v):
+        def build():
+            built.append(v)
+            return v
+        return build
+
+    with lock:  # the writer blocks on the first snapshot while two more queue up
+        save_async("tests.latest", state(1), version=1, force=True, lock=lock)
+        deadline = time.monotonic() + 2
+        while checkpoint._writing != "tests.latest":
+            assert time.monotonic() < deadline
+            time.sleep(0.005)
+        save_async("tests.latest", state(2), version=2, force=True, lock=lock)
+        save_async("tests.latest", state(3), version=3, force=True, lock=lock)
+    assert flush()
+    assert built == [1, 3]
+    assert load("tests.latest") == 3
+
+
+def test_save_async_returns_without_building(tmp_path, monkeypatch):
+    monkeypatch.setattr(checkpoint, "CHECKPOINT_DIR", str(tmp_path))
+    caller = threading.get_ident()
+    seen = []
+    save_async("tests.thread", lambda: seen.append(threading.get_ident()) or "x", version=1, force=True)
+    assert flush()
+    assert seen and seen[0] != caller  # pickled on the writer thread
+
+
+def _grid(rows, capacity=4):
+    grid = DecisionGrid(capacity=capacity)
+    for i in range(rows):
+        chain = {"strike": np.array([25000.0, 25050.0]), "CE_lastPrice": np.array([100.0 + i, 80.0]),
+                 "PE_lastPrice": np.array([90.0 - i, 110.0])}
+        grid.update({"chains": {"21-Oct-2026": chain}}, datetime(2026, 10, 19, 10, 0, i, tzinfo=IST))
+    return grid
+
+
+def test_decision_grid_pickles_filled_rows_only():
+    grid = _grid(5, capacity=4)
+    assert grid.capacity == 8
+    state = grid.__getstate__()
+    assert state["ce"].shape == (5, 2)
+    assert len(state["ts"]) == 5
+
+
+def test_decision_grid_round_trip_keeps_capacity_and_grows():
+    grid = _grid(3)
+    restored = pickle.loads(pickle.dumps(grid))
+    assert restored.rows == 3 and restored.capacity == 4
+    assert restored.ce.shape == (4, 2)
+    np.testing.assert_array_equal(restored.ce[:3], grid.ce[:3])
+    np.testing.assert_array_equal(restored.codes(), grid.codes())
+    restored.update({"chains": {"21-Oct-2026": {"strike": np.array([25000.0]), "CE_lastPrice": np.array([1.0]),
+                                                "PE_lastPrice": np.array([1.0])}}},
+                    datetime(2026, 10, 19, 10, 1, tzinfo=IST))
+    restored.update({"chains": {"21-Oct-2026": {"strike": np.array([25000.0]), "CE_lastPrice": np.array([2.0]),
+                                                "PE_lastPrice": np.array([2.0])}}},
+                    datetime(2026, 10, 19, 10, 2, tzinfo=IST))
+    assert restored.rows == 5 and restored.capacity == 8
@@ -0,0 +1,74 @@
+import json
+
+import numpy as np
+import pytest
+
+from constituents import Constituents, parse_constituents
+
+
+def _row(symbol, last, open_, p_change, value=1e9, priority=0):
+    return {"priority": priority, "symbol": symbol, "open": open_, "lastPrice": last, "pChange": p_change,
+            "dayHigh": last, "dayLow": open_, "previousClose": open_, "totalTradedValue": value,
+            "meta": {"companyName": f"{symbol} Ltd"}}
+
+
+ROWS = [
+    _row("NIFTY 50", 25000.0, 24900.0, 0.4, priority=1),  # the index itself comes first
+    _row("RELIANCE", 1500.0, 1480.0, 1.2),
+    _row("TCS", 3000.0, 3030.0, -0.8),
+    _row("INFY", 1600.0, 1600.0, 0.0),
+    _row("SBIN", 800.0, 790.0, 2.5),
+    _row("HDFCBANK", 1700.0, 1720.0, -1.9),
+    _row("ITC", "-", 400.0, "-"),  # NSE sends "-" for a member without a trade yet
+]
+
+
+@pytest.fixture
+def members():
+    return Constituents("NIFTY 50", ROWS, "19-Oct-2026 10:00:00")
+
+
+def test_index_row_is_not_a_member(members):
+    assert members.index_row["lastPrice"] == 25000.0
+    assert len(members) == 6 and "NIFTY 50" not in members
+    assert members.symbols.tolist() == ["RELIANCE", "TCS", "INFY", "SBIN", "HDFCBANK", "ITC"]
+
+
+def test_breadth_counts_advances_declines_unchanged(members):
+    # INFY (0.0) and ITC (no trade yet) are unchanged
+    assert members.breadth() == {"advances": 2, "declines": 2, "unchanged": 2, "ad_ratio": 1.0}
+
+
+def test_breadth_ratio_without_declines():
+    up = Constituents("NIFTY BANK", [_row("A", 10.0, 9.0, 1.0), _row("B", 10.0, 9.0, 0.5), _row("C", 10.0, 10.0, 0.0)])
+    assert up.breadth() == {"advances": 2, "declines": 0, "unchanged": 1, "ad_ratio": None}
+    assert Constituents("X", []).breadth() == {"advances": 0, "declines": 0, "unchanged": 0, "ad_ratio": None}
+
+
+def test_quote_is_last_and_pct_from_open(members):
+    last, pct = members.quote("RELIANCE")
+    assert last == 1500.0 and pct == pytest.approx((1500 - 1480) / 1480 * 100)
+    assert members.quote("ITC") == (None, None)       # no trade yet
+    assert members.quote("NOTAMEMBER") == (None, None)
+
+
+def test_movers_by_change_from_previous_close(members):
+    gainers, losers = members.movers(2)
+    assert gainers["symbol"].tolist() == ["SBIN", "RELIANCE"]
+    assert losers["symbol"].tolist() == ["HDFCBANK", "TCS"]
+    assert gainers["value_cr"].tolist() == [100.0, 100.0]
+
+
+def test_frame_columns(members):
+    df = members.frame()
+    assert list(df.columns) == ["symbol", "name", "last", "pct_open", "pct_change", "value_cr"]
+    assert df.loc[df["symbol"] == "TCS", "name"].item() == "TCS Ltd"
+    assert np.isnan(df.loc[df["symbol"] == "ITC", "last"].item())
+
+
+def test_parse_constituents_from_raw_body():
+    raw = json.dumps({"name": "NIFTY 50", "timestamp": "19-Oct-2026 10:00:00", "data": ROWS}).encode()
+    parsed = parse_constituents("NIFTY 50", raw)
+    assert parsed.timestamp == "19-Oct-2026 10:00:00"
+    assert parsed.symbols.tolist() == [r["symbol"] for r in ROWS[1:]]
+    assert parsed.breadth()["advances"] == 2
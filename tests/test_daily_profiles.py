@@ -0,0 +1,80 @@
+from datetime import date, datetime
+
+import numpy as np
+
+import daily_profiles
+import history_mmap
+from daily_profiles import SLOTS, _day_slot, align, at_slot, compare_frame, current_slot, slot_labels
+from market_calendar import IST
+
+
+def _ts(day, hh, mm, ss=0):
+    return int(datetime(2026, 10, day, hh, mm, ss, tzinfo=IST).timestamp())
+
+
+def _day_number(day):
+    return (date(2026, 10, day) - date(1970, 1, 1)).days
+
+
+def _records(rows):
+    arr = np.zeros(len(rows), dtype=[("ts", "<i8"), ("CE_change", "<i4")])
+    arr["ts"] = [ts for ts, _ in rows]
+    arr["CE_change"] = [v for _, v in rows]
+    return arr
+
+
+def test_slot_grid_covers_the_session():
+    labels = slot_labels()
+    assert len(labels) == SLOTS
+    assert labels[0] == "09:15" and labels[-1] == "15:30"
+    assert current_slot(datetime(2026, 10, 19, 9, 0, tzinfo=IST)) == 0
+    assert current_slot(datetime(2026, 10, 19, 10, 0, 59, tzinfo=IST)) == 45
+    assert current_slot(datetime(2026, 10, 19, 18, 0, tzinfo=IST)) == SLOTS - 1
+
+
+def test_day_slot_in_and_out_of_session():
+    day, slot = _day_slot([_ts(19, 9, 14, 59), _ts(19, 9, 15), _ts(19, 15, 30, 59), _ts(19, 15, 31)])
+    assert (day == _day_number(19)).all()
+    assert slot.tolist() == [-1, 0, SLOTS - 1, -1]
+
+
+def test_align_last_value_per_minute_carried_forward():
+    arr = _records([(_ts(19, 9, 15, 3), 1), (_ts(19, 9, 15, 57), 2), (_ts(19, 9, 18, 0), 5)])
+    grid = align(arr, ("CE_change",), np.array([_day_number(19)]))["CE_change"][0]
+    assert grid[:4].tolist() == [2, 2, 2, 5]  # last value in 09:15, carried to 09:16/09:17
+    assert np.isnan(grid[4:]).all()  # nothing after the day's last observation
+
+
+def test_align_rows_follow_days_and_skip_unknown():
+    arr = _records([(_ts(16, 9, 20), 7), (_ts(17, 10, 0), 99), (_ts(19, 9, 15), 3), (_ts(19, 8, 0), 42)])
+    days = np.array([_day_number(16), _day_number(19)])
+    grid = align(arr, ("CE_change",), days)["CE_change"]
+    assert grid.shape == (2, SLOTS)
+    assert np.isnan(grid[0, :5]).all() and grid[0, 5] == 7  # 09:20 = slot 5
+    assert grid[1, 0] == 3  # pre-open 08:00 record ignored
+    assert 99 not in grid and 42 not in grid
+
+
+def test_align_empty_inputs():
+    out = align(_records([]), ("CE_change",), np.array([_day_number(19)]))
+    assert np.isnan(out["CE_change"]).all()
+    assert align(_records([(_ts(19, 9, 15), 1)]), ("CE_change",), np.array([], dtype=np.int64))["CE_change"].shape == (0, SLOTS)
+
+
+def test_build_and_compare_same_minute(tmp_path, monkeypatch):
+    monkeypatch.setattr(history_mmap, "DATA_DIR", str(tmp_path))
+    monkeypatch.setattr(daily_profiles, "PROFILES_FILE", str(tmp_path / "daily_profiles.npz"))
+    for day, change in ((15, 10), (16, 20), (19, 40)):
+        history_mmap.append("oi", {"CE_change": change, "PE_change": 0}, datetime(2026, 10, day, 10, 0, tzinfo=IST))
+    assert daily_profiles.build(include_today=True) == 3
+    profiles = daily_profiles.load_profiles(daily_profiles.PROFILES_FILE)
+    assert profiles.days == ["2026-10-15", "2026-10-16", "2026-10-19"]
+
+    today = date(2026, 10, 19)
+    frame = compare_frame(profiles, "CE_change", 5, today=today)
+    assert list(frame.columns) == ["today (2026-10-19)", "2026-10-15", "2026-10-16", "median"]
+    assert frame.loc["10:00"].tolist() == [40, 10, 20, 15]
+
+    slot, now, past, rank = at_slot(profiles, "CE_change", 5, current_slot(datetime(2026, 10, 19, 10, 7, tzinfo=IST)), today=today)
+    assert slot == 45  # back to today's latest observed minute
+    assert now == 40 and past.tolist() == [10, 20] and rank == 100
@@ -0,0 +1,97 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import downsample
+from downsample import chart_frame, chart_points, minmax_indices, visible_slice
+
+
+def _bound(points, k):
+    return ((points - 1) // 3) * (2 * k + 1) + 1
+
+
+def test_short_series_pass_through():
+    assert minmax_indices(np.arange(10.0), 20).tolist() == list(range(10))
+
+
+def test_keeps_first_last_and_each_bucket_min_max():
+    rng = np.random.default_rng(7)
+    values = rng.normal(size=10_000).cumsum()
+    values[1234], values[8765] = 1e6, -1e6  # single-row spikes
+    points = 301
+    keep = minmax_indices(values, points)
+
+    assert keep[0] == 0 and keep[-1] == len(values) - 1
+    assert 1234 in keep and 8765 in keep
+    assert np.all(np.diff(keep) > 0)
+
+    buckets = (points - 1) // 3
+    edges = np.linspace(0, len(values), buckets + 1).astype(int)
+    for lo, hi in zip(edges[:-1], edges[1:]):
+        assert lo in keep
+        assert lo + int(values[lo:hi].argmin()) in keep
+        assert lo + int(values[lo:hi].argmax()) in keep
+
+
+@pytest.mark.parametrize("n", [1_000, 10_000, 100_000])
+@pytest.mark.parametrize("points", [50, 1200, 4000])
+def test_one_series_stays_within_points(n, points):
+    values = np.sin(np.arange(n) / 37.0) + np.arange(n) % 11
+    assert len(minmax_indices(values, points)) <= points
+
+
+@pytest.mark.parametrize("k", [2, 3, 42])
+def test_each_series_gets_the_full_budget(k):
+    # Resolution must not shrink with the number of lines on the chart
+    n, points = 7_500, 1200
+    values = np.random.default_rng(k).normal(size=(n, k)).cumsum(axis=0)
+    spike = n // 2 + k
+    values[spike, k - 1] = 1e9
+    keep = minmax_indices(values, points)
+    assert len(keep) <= min(n, _bound(points, k))
+    assert spike in keep
+
+    buckets = (points - 1) // 3
+    edges = np.linspace(0, n, buckets + 1).astype(int)
+    for col in (0, k - 1):
+        for lo, hi in zip(edges[:-1], edges[1:]):
+            assert lo + int(values[lo:hi, col].argmax()) in keep
+
+
+def test_nan_rows_are_never_picked_as_extremes():
+    values = np.arange(1000, dtype=float)
+    values[450:650] = np.nan
+    keep = minmax_indices(values, 31)
+    firsts = np.linspace(0, 1000, 11).astype(int)[:-1]  # 10 buckets; their first rows are kept as is
+    assert set(keep[np.isnan(values[keep])]) <= set(firsts)
+    assert 449 in keep and 650 in keep  # the bucket extremes around the gap
+
+
+def test_visible_slice_last_minutes():
+    x = np.arange(0, 3600 * 3, 60)  # 3 h, one row a minute
+    assert visible_slice(x) == (0, len(x))
+    lo, hi = visible_slice(x, 30)
+    assert hi == len(x) and x[lo] == x[-1] - 30 * 60
+
+
+def test_chart_points_capped():
+    assert chart_points(600) == 1200
+    assert chart_points(10_000) == downsample.MAX_POINTS
+
+
+def test_chart_frame_range_budget_and_cache():
+    downsample._cache.clear()
+    n = 20_000
+    ts = 1_790_000_000 + np.arange(n) * 3
+    df = pd.DataFrame({"ts": ts, "a": np.sin(np.arange(n) / 50.0), "b": np.cos(np.arange(n) / 80.0)})
+
+    full = chart_frame("t", df, ["a", "b"], df["ts"], points=600)
+    assert 0 < len(full) <= _bound(600, 2) and full.index[0] == 0 and full.index[-1] == n - 1
+
+    hour = chart_frame("t", df, ["a", "b"], df["ts"], points=600, minutes=60)
+    assert hour["ts"].iloc[0] >= ts[-1] - 3600 and hour.index[-1] == n - 1
+
+    assert chart_frame("t", df, ["a", "b"], df["ts"], points=600) is full  # same version → cached
+    grown = pd.concat([df, pd.DataFrame({"ts": [ts[-1] + 3], "a": [5.0], "b": [0.0]})], ignore_index=True)
+    again = chart_frame("t", grown, ["a", "b"], grown["ts"], points=600)
+    assert again is not full and again["a"].max() == 5.0
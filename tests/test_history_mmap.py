@@ -0,0 +1,104 @@
+import json
+import os
+from datetime import datetime
+
+import numpy as np
+
+import history_mmap
+from history_mmap import HEADER_SIZE, MAGIC, SERIES, append, import_csv, open_series, query, query_day, to_epoch, to_frame
+from market_calendar import IST
+
+
+def _row(spot, ce=100.0, pe=90.0):
+    return {"NIFTY": spot, "CE": ce, "PE": pe}
+
+
+def test_header_layout(tmp_path, monkeypatch):
+    monkeypatch.setattr(history_mmap, "DATA_DIR", str(tmp_path))
+    append("atm", _row(25000.0), "2026-10-19 10:00:00")
+    with open(tmp_path / "atm.bin", "rb") as f:
+        header = f.read(HEADER_SIZE)
+    assert header.startswith(MAGIC)
+    meta = json.loads(header[len(MAGIC):].rstrip(b"\0"))
+    assert meta == {"series": "atm", "fields": [list(f) for f in SERIES["atm"]]}
+    assert os.path.getsize(tmp_path / "atm.bin") == HEADER_SIZE + np.dtype(SERIES["atm"]).itemsize
+
+
+def test_append_keeps_time_order(tmp_path, monkeypatch):
+    monkeypatch.setattr(history_mmap, "DATA_DIR", str(tmp_path))
+    assert append("atm", _row(25000.0), "2026-10-19 10:00:00")
+    assert append("atm", _row(25010.0), "2026-10-19 10:00:03")
+    assert not append("atm", _row(1.0), "2026-10-19 10:00:03")  # same stamp
+    assert not append("atm", _row(1.0), "2026-10-19 09:59:00")  # older
+    arr = open_series("atm")
+    assert arr["NIFTY"].tolist() == [25000.0, 25010.0]
+    assert np.all(np.diff(arr["ts"]) > 0)
+
+
+def test_append_missing_values_read_zero(tmp_path, monkeypatch):
+    monkeypatch.setattr(history_mmap, "DATA_DIR", str(tmp_path))
+    append("atm", {"NIFTY": 25000.0, "CE": None, "PE": float("nan")}, "2026-10-19 10:00:00")
+    rec = open_series("atm")[0]
+    assert (rec["CE"], rec["PE"]) == (0.0, 0.0)
+
+
+def test_append_overwrites_torn_tail(tmp_path, monkeypatch):
+    monkeypatch.setattr(history_mmap, "DATA_DIR", str(tmp_path))
+    append("atm", _row(25000.0), "2026-10-19 10:00:00")
+    with open(tmp_path / "atm.bin", "ab") as f:
+        f.write(b"\x01\x02\x03")  # a writer killed mid-record
+    assert len(open_series("atm")) == 1
+    assert append("atm", _row(25010.0), "2026-10-19 10:00:03")
+    assert open_series("atm")["NIFTY"].tolist() == [25000.0, 25010.0]
+
+
+def test_query_ranges_and_days(tmp_path, monkeypatch):
+    monkeypatch.setattr(history_mmap, "DATA_DIR", str(tmp_path))
+    for stamp in ("2026-10-16 15:29:00", "2026-10-19 09:15:00", "2026-10-19 12:00:00", "2026-10-20 09:15:00"):
+        append("atm", _row(float(stamp[-8:-6])), stamp)
+    assert len(query("atm")) == 4
+    assert query_day("atm", "2026-10-19")["NIFTY"].tolist() == [9.0, 12.0]
+    assert len(query_day("atm", "2026-10-17")) == 0
+    assert len(query("atm", "2026-10-19 09:15:00", "2026-10-19 12:00:00")) == 1  # end is exclusive
+    assert len(query("atm", start="2026-10-19")) == 3
+    assert isinstance(query("atm"), np.memmap)  # zero-copy view
+
+
+def test_query_missing_series_is_empty(tmp_path, monkeypatch):
+    monkeypatch.setattr(history_mmap, "DATA_DIR", str(tmp_path))
+    assert len(query_day("oi", "2026-10-19")) == 0
+
+
+def test_to_epoch_treats_naive_as_ist():
+    aware = datetime(2026, 10, 19, 10, 0, tzinfo=IST)
+    assert to_epoch("2026-10-19 10:00:00") == int(aware.timestamp())
+    assert to_epoch(("2026-10-19", "10:00:00")) == int(aware.timestamp())
+    assert to_epoch(aware) == int(aware.timestamp())
+
+
+def test_to_frame_clock_columns(tmp_path, monkeypatch):
+    monkeypatch.setattr(history_mmap, "DATA_DIR", str(tmp_path))
+    append("oi", {"CE_change": 5, "PE_change": -3}, ("2026-10-19", "10:00:00"))
+    df = to_frame(query("oi"), clock=True)
+    assert df[["date", "time", "CE_change"]].values.tolist() == [["2026-10-19", "10:00:00", 5]]
+
+
+def test_import_csv_merges_without_duplicates(tmp_path, monkeypatch):
+    monkeypatch.setattr(history_mmap, "DATA_DIR", str(tmp_path))
+    append("oi", {"CE_change": 1, "PE_change": 1}, ("2026-10-19", "10:00:00"))
+    csv_path = tmp_path / "oi_history_change.csv"
+    csv_path.write_text("date,time,CE_change,PE_change\n"
+                        "2026-10-19,09:59:57,7,7\n2026-10-19,10:00:00,9,9\n2026-10-19,10:00:03,8,8\n")
+    assert import_csv("oi", str(csv_path)) == 2
+    arr = open_series("oi")
+    assert arr["CE_change"].tolist() == [7, 1, 8]  # existing row wins the tie
+    assert import_csv("oi", str(csv_path)) == 0
+
+
+def test_import_csv_mixed_clock_formats(tmp_path, monkeypatch):
+    monkeypatch.setattr(history_mmap, "DATA_DIR", str(tmp_path))
+    csv_path = tmp_path / "oi_history_change.csv"
+    csv_path.write_text("date,time,CE_change,PE_change\n"
+                        "2026-10-19,10:00,1,1\n2026-10-19,10:00:03,2,2\n2026-10-19,10:01,3,3\n")
+    assert import_csv("oi", str(csv_path)) == 3
+    assert open_series("oi")["CE_change"].tolist() == [1, 2, 3]
@@ -0,0 +1,56 @@
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from history_schema import append_compact, clock, compact, timestamps
+from market_calendar import IST
+
+
+def _epoch(hh, mm, ss=0):
+    return int(datetime(2026, 10, 19, hh, mm, ss, tzinfo=IST).timestamp())
+
+
+def test_compact_mixed_clock_formats_keeps_every_row():
+    df = pd.DataFrame({"date": ["2026-10-19"] * 3, "time": ["10:00", "10:00:03", "10:01"],
+                       "CE_change": [1, 2, 3], "PE_change": [4, 5, 6]})
+    out = compact(df)
+    assert out["ts"].tolist() == [_epoch(10, 0), _epoch(10, 0, 3), _epoch(10, 1)]
+    assert out["CE_change"].tolist() == [1, 2, 3]
+
+
+def test_compact_seconds_first_then_minutes():
+    df = pd.DataFrame({"date": ["2026-10-19"] * 2, "time": ["10:00:03", "10:01"], "CE_change": [2, 3]})
+    assert len(compact(df)) == 2
+
+
+def test_compact_drops_unparseable_times_only():
+    df = pd.DataFrame({"date": ["2026-10-19"] * 2, "time": ["10:00", "not a time"], "CE_change": [1, 2]})
+    assert compact(df)["CE_change"].tolist() == [1]
+
+
+def test_compact_dtypes_and_dropped_time_columns():
+    df = pd.DataFrame({"date": ["2026-10-19"], "time": ["10:00:00"], "CE_change": [5],
+                       "CE_OI_total": [1000], "spot": [25012.3], "decision": ["📈 Bullish → BUY CE"]})
+    out = compact(df)
+    assert list(out.columns) == ["ts", "CE_change", "CE_OI_total", "spot", "decision"]
+    assert out["ts"].dtype == np.int64
+    assert out["CE_change"].dtype == np.int32 and out["spot"].dtype == np.float32
+    assert out["decision"].iloc[0] == "📈 Bullish → BUY CE"  # free text kept
+
+
+def test_compact_iso_timestamps_with_offsets():
+    df = pd.DataFrame({"time": ["2026-10-19T10:00:00+05:30", "2026-10-19 10:00:03+05:30"], "spot_delta": [0.0, 1.5]})
+    assert compact(df)["ts"].tolist() == [_epoch(10, 0), _epoch(10, 0, 3)]
+
+
+def test_compact_empty():
+    assert list(compact(None).columns) == ["ts"]
+
+
+def test_append_compact_keeps_dtypes_and_clock():
+    df = compact(pd.DataFrame({"date": ["2026-10-19"], "time": ["10:00"], "CE_change": [1]}))
+    df = append_compact(df, {"date": "2026-10-19", "time": "10:00:03", "CE_change": 2})
+    assert df["CE_change"].dtype == np.int32
+    assert clock(df).tolist() == ["10:00:00", "10:00:03"]
+    assert str(timestamps(df).dt.tz) == "Asia/Kolkata"
@@ -0,0 +1,74 @@
+import pandas as pd
+
+from history_store import OI_COLUMNS, append_row, read_history, tail_history
+
+
+def _snap(time, ce=10, pe=-5, date="2026-10-19"):
+    return {"date": date, "time": time, "CE_change": ce, "PE_change": pe, "CE_OI_total": 1000, "PE_OI_total": 900}
+
+
+def test_append_row_writes_header_once(tmp_path):
+    path = str(tmp_path / "oi.csv")
+    assert append_row(path, _snap("10:00:00"), OI_COLUMNS)
+    assert append_row(path, _snap("10:00:03"), OI_COLUMNS)
+    lines = open(path).read().splitlines()
+    assert lines[0] == ",".join(OI_COLUMNS)
+    assert len(lines) == 3
+
+
+def test_append_row_skips_duplicate_key(tmp_path):
+    path = str(tmp_path / "oi.csv")
+    assert append_row(path, _snap("10:00:00"), OI_COLUMNS)
+    assert not append_row(path, _snap("10:00:00", ce=99), OI_COLUMNS)  # another dashboard already wrote it
+    assert append_row(path, _snap("10:00:00", date="2026-10-20"), OI_COLUMNS)
+    df = read_history(path)
+    assert len(df) == 2
+    assert df["CE_change"].tolist() == [10, 10]
+
+
+def test_append_row_custom_key(tmp_path):
+    path = str(tmp_path / "atm.csv")
+    row = {"time": "2026-10-19 10:00:00+05:30", "NIFTY": 25012.3}
+    assert append_row(path, row, list(row), key=("time",))
+    assert not append_row(path, dict(row, NIFTY=1.0), list(row), key=("time",))
+    assert append_row(path, dict(row, NIFTY=1.0), list(row), key=None)  # no dedup
+    assert len(read_history(path)) == 2
+
+
+def test_append_row_migrates_wider_schema(tmp_path):
+    path = str(tmp_path / "oi.csv")
+    old = ["date", "time", "CE_change", "PE_change"]
+    assert append_row(path, {k: v for k, v in _snap("10:00:00").items() if k in old}, old)
+    assert append_row(path, _snap("10:00:03"), OI_COLUMNS)
+    df = read_history(path)
+    assert list(df.columns) == OI_COLUMNS
+    assert pd.isna(df.loc[0, "CE_OI_total"])  # old row kept, new column empty
+    assert df.loc[1, "CE_OI_total"] == 1000
+    assert not append_row(path, _snap("10:00:00"), OI_COLUMNS)  # dedup still sees migrated rows
+
+
+def test_read_history_ignores_torn_row(tmp_path):
+    path = str(tmp_path / "oi.csv")
+    append_row(path, _snap("10:00:00"), OI_COLUMNS)
+    with open(path, "a") as f:
+        f.write("2026-10-19,10:00:03,1")  # a writer mid-row
+    assert len(read_history(path)) == 1
+
+
+def test_read_history_missing_file_and_day_filter(tmp_path):
+    path = str(tmp_path / "oi.csv")
+    assert list(read_history(path, columns=OI_COLUMNS).columns) == OI_COLUMNS
+    append_row(path, _snap("10:00:00"), OI_COLUMNS)
+    append_row(path, _snap("10:00:00", date="2026-10-20"), OI_COLUMNS)
+    assert read_history(path, day="2026-10-20")["date"].tolist() == ["2026-10-20"]
+
+
+def test_tail_history_returns_only_new_rows(tmp_path):
+    path = str(tmp_path / "oi.csv")
+    append_row(path, _snap("10:00:00"), OI_COLUMNS)
+    rows, offset = tail_history(path)
+    assert [r["time"] for r in rows] == ["10:00:00"]
+    append_row(path, _snap("10:00:03"), OI_COLUMNS)
+    rows, offset = tail_history(path, offset)
+    assert [r["time"] for r in rows] == ["10:00:03"]
+    assert tail_history(path, offset) == ([], offset)
@@ -0,0 +1,83 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from indicators import DecisionGrid
+from market_calendar import IST
+
+NEAR, FAR = "21-Oct-2026", "28-Oct-2026"
+OPEN = datetime(2026, 10, 19, 9, 15, tzinfo=IST)
+
+
+def _chain(strikes, ce, pe):
+    return {"strike": np.asarray(strikes, dtype=float),
+            "CE_lastPrice": np.asarray(ce, dtype=float), "PE_lastPrice": np.asarray(pe, dtype=float)}
+
+
+def _decoded(**chains):
+    return {"chains": chains}
+
+
+def test_first_snapshot_sets_keys_and_row():
+    grid = DecisionGrid(capacity=4)
+    grid.update(_decoded(**{NEAR: _chain([25000, 24950], [100, 140], [90, 60])}), OPEN)
+    assert grid.rows == 1
+    assert (grid.keys % 1_000_000).tolist() == [24950, 25000]  # sorted by key
+    assert grid.ce[0].tolist() == [140, 100]
+
+
+def test_new_strikes_widen_columns_keeping_history():
+    grid = DecisionGrid(capacity=4)
+    grid.update(_decoded(**{NEAR: _chain([25000], [100], [90])}), OPEN)
+    grid.update(_decoded(**{NEAR: _chain([24950, 25000, 25050], [150, 110, 70], [50, 85, 120])}), OPEN + timedelta(seconds=3))
+    assert (grid.keys % 1_000_000).tolist() == [24950, 25000, 25050]
+    assert np.isnan(grid.ce[0, 0]) and grid.ce[0, 1] == 100 and np.isnan(grid.ce[0, 2])
+    assert grid.ce[1].tolist() == [150, 110, 70]
+
+
+def test_capacity_doubles_without_losing_rows():
+    grid = DecisionGrid(capacity=2)
+    for i in range(5):
+        grid.update(_decoded(**{NEAR: _chain([25000], [100 + i], [90 - i])}), OPEN + timedelta(seconds=3 * i))
+    assert grid.rows == 5
+    assert grid.capacity == 8
+    assert grid.ce[:5, 0].tolist() == [100, 101, 102, 103, 104]
+    assert np.isnan(grid.ce[5:]).all()
+    assert np.all(np.diff(grid.ts[:5]) == 3)
+
+
+def test_expiries_are_separate_keys():
+    grid = DecisionGrid()
+    grid.update(_decoded(**{NEAR: _chain([25000], [100], [90]), FAR: _chain([25000], [180], [160])}), OPEN)
+    assert len(grid.keys) == 2
+    expiries, strikes, codes = grid.heatmap()
+    assert expiries == [NEAR, FAR]
+    assert strikes.tolist() == [25000]
+
+
+def test_codes_over_window_and_late_quotes():
+    grid = DecisionGrid()
+    grid.update(_decoded(**{NEAR: _chain([25000, 25050], [100, np.nan], [90, 70])}), OPEN)
+    grid.update(_decoded(**{NEAR: _chain([25000, 25050], [120, 60], [80, 75])}), OPEN + timedelta(minutes=10))
+    grid.update(_decoded(**{NEAR: _chain([25000, 25050], [110, 80], [70, 65])}), OPEN + timedelta(minutes=20))
+    # Whole day: 25000 CE up / PE down = bullish; 25050 CE starts at its first quote (60)
+    assert grid.codes().tolist() == [1, 1]
+    # Last 5 minutes: from the 10-minute row, both legs fall at 25000 = premium decay
+    assert grid.codes(5).tolist() == [0, 1]
+
+
+def test_heatmap_limits_strikes_and_marks_missing():
+    grid = DecisionGrid()
+    grid.update(_decoded(**{NEAR: _chain([25000], [100], [90])}), OPEN)
+    grid.update(_decoded(**{NEAR: _chain([25000], [90], [80])}), OPEN + timedelta(minutes=1))
+    _, strikes, codes = grid.heatmap(strikes=(24950, 25000))
+    assert strikes.tolist() == [24950, 25000]
+    assert codes.tolist() == [[-1, 0]]
+
+
+def test_new_day_resets():
+    grid = DecisionGrid()
+    grid.update(_decoded(**{NEAR: _chain([25000], [100], [90])}), OPEN)
+    grid.update(_decoded(**{NEAR: _chain([24000], [100], [90])}), OPEN + timedelta(days=1))
+    assert grid.rows == 1
+    assert (grid.keys % 1_000_000).tolist() == [24000]
@@ -0,0 +1,111 @@
+import json
+from datetime import date, datetime, time as dt_time, timezone
+
+import pytest
+
+import market_calendar as mc
+from market_calendar import (FAST_POLL, IST, SLOW_POLL, is_capture_window, is_expiry_day, is_market_open,
+                             market_status, next_session_start, poll_interval, seconds_until_next_poll,
+                             session_hours)
+
+
+def at(day, hhmm):
+    return datetime.combine(date.fromisoformat(day), dt_time.fromisoformat(hhmm), IST)
+
+
+# -------------------------------------------------
+# Holidays and special sessions
+# -------------------------------------------------
+def test_holiday_is_closed_all_day():
+    assert session_hours(date(2026, 10, 2)) is None  # Gandhi Jayanti (Friday)
+    assert not is_market_open(at("2026-10-02", "11:00"))
+    assert not is_capture_window(at("2026-10-02", "09:05"))
+    assert poll_interval(at("2026-10-02", "11:00")) is None
+    assert market_status(at("2026-10-02", "11:00")) == "closed"
+
+
+def test_weekday_session_and_capture_window():
+    assert session_hours(date(2026, 10, 21)) == (mc.MARKET_OPEN, mc.MARKET_CLOSE)
+    assert market_status(at("2026-10-21", "08:59")) == "closed"
+    assert market_status(at("2026-10-21", "09:05")) == "pre-open"
+    assert market_status(at("2026-10-21", "12:00")) == "open"
+    assert market_status(at("2026-10-21", "15:40")) == "post-close"  # closing prices settle
+    assert market_status(at("2026-10-21", "15:46")) == "closed"
+
+
+def test_special_session_on_a_holiday():
+    day = date(2025, 10, 21)  # Muhurat trading on a Diwali holiday
+    assert day in mc.HOLIDAYS
+    assert session_hours(day) == (dt_time(13, 45), dt_time(14, 45))
+    assert not is_market_open(at("2025-10-21", "10:00"))
+    assert not is_capture_window(at("2025-10-21", "09:05"))  # no regular pre-open
+    assert is_market_open(at("2025-10-21", "14:00"))
+    assert is_capture_window(at("2025-10-21", "14:55"))
+    assert next_session_start(at("2025-10-20", "16:00")) == at("2025-10-21", "13:45")
+
+
+def test_naive_and_foreign_times_are_read_as_ist():
+    assert is_market_open(datetime(2026, 10, 21, 12, 0))
+    assert is_market_open(datetime(2026, 10, 21, 6, 30, tzinfo=timezone.utc))  # 12:00 IST
+    assert not is_market_open(datetime(2026, 10, 21, 12, 0, tzinfo=timezone.utc))  # 17:30 IST
+
+
+def test_next_session_skips_weekend_and_holiday():
+    # Friday after the close → Monday pre-open; Monday evening → Wednesday (Tuesday is a holiday)
+    assert next_session_start(at("2026-10-23", "16:00")) == at("2026-10-26", "09:00")
+    assert next_session_start(at("2026-10-19", "16:00")) == at("2026-10-21", "09:00")
+    assert seconds_until_next_poll(at("2026-10-23", "16:00")) == (at("2026-10-26", "09:00") - at("2026-10-23", "16:00")).total_seconds()
+
+
+def test_overrides_file_adds_holidays_and_sessions(tmp_path, monkeypatch):
+    monkeypatch.setattr(mc, "HOLIDAYS", set(mc.HOLIDAYS))
+    monkeypatch.setattr(mc, "SPECIAL_SESSIONS", dict(mc.SPECIAL_SESSIONS))
+    path = tmp_path / "calendar.json"
+    path.write_text(json.dumps({"holidays": ["2026-10-22"], "special_sessions": {"2026-11-08": ["18:00", "19:00"]}}))
+    mc._load_overrides(str(path))
+    assert session_hours(date(2026, 10, 22)) is None
+    assert session_hours(date(2026, 11, 8)) == (dt_time(18, 0), dt_time(19, 0))  # a Sunday
+
+
+# -------------------------------------------------
+# Weekly expiry
+# -------------------------------------------------
+def test_expiry_is_tuesday():
+    assert is_expiry_day(date(2026, 10, 27))
+    assert not is_expiry_day(date(2026, 10, 26))
+    assert not is_expiry_day(date(2026, 10, 28))
+
+
+def test_expiry_on_holiday_moves_to_previous_trading_day():
+    assert not is_expiry_day(date(2026, 10, 20))  # Tuesday holiday
+    assert is_expiry_day(date(2026, 10, 19))      # → Monday
+    assert is_expiry_day(date(2025, 10, 20))      # Muhurat Tuesday is still not a trading day
+
+
+# -------------------------------------------------
+# Adaptive polling
+# -------------------------------------------------
+@pytest.mark.parametrize("hhmm, expected", [
+    ("08:59", None),        # before pre-open: idle
+    ("09:00", FAST_POLL),   # pre-open, within 15 min of the open
+    ("09:29", FAST_POLL),
+    ("09:31", SLOW_POLL),   # mid-session
+    ("12:00", SLOW_POLL),
+    ("15:14", SLOW_POLL),
+    ("15:16", FAST_POLL),   # close approaching
+    ("15:40", FAST_POLL),   # post-close settle
+    ("15:46", None),        # after the grace period: idle
+])
+def test_poll_interval_fast_at_open_and_close(hhmm, expected):
+    assert poll_interval(at("2026-10-21", hhmm)) == expected
+
+
+def test_poll_interval_fast_for_expiry_tail():
+    assert poll_interval(at("2026-10-27", "13:59")) == SLOW_POLL
+    assert poll_interval(at("2026-10-27", "14:00")) == FAST_POLL   # last 90 minutes of expiry day
+    assert poll_interval(at("2026-10-19", "14:30")) == FAST_POLL   # holiday-shifted expiry
+    assert poll_interval(at("2026-10-21", "14:30")) == SLOW_POLL
+
+
+def test_poll_interval_custom_base():
+    assert poll_interval(at("2026-10-21", "12:00"), base=20) == 20
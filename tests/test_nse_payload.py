@@ -0,0 +1,121 @@
+import json
+
+import numpy as np
+import pytest
+
+import nse_payload
+from nse_payload import decode_chain, is_new_payload, make_payload
+
+NEAR, FAR = "21-Oct-2026", "28-Oct-2026"
+
+
+def _row(strike, expiry, ce=None, pe=None, underlying=24990.5):
+    row = {"strikePrice": strike, "expiryDate": expiry}
+    if ce is not None:
+        row["CE"] = {"lastPrice": ce, "openInterest": 100, "changeinOpenInterest": 5, "underlyingValue": underlying}
+    if pe is not None:
+        row["PE"] = {"lastPrice": pe, "openInterest": 200, "changeinOpenInterest": -5, "underlyingValue": underlying}
+    return row
+
+
+def _body(rows, underlying=25012.3, timestamp="19-Oct-2026 10:00:00"):
+    # NSE key order: expiryDates, data, then timestamp / underlyingValue after the rows
+    return json.dumps({
+        "records": {"expiryDates": [NEAR, FAR], "data": rows, "timestamp": timestamp,
+                    "underlyingValue": underlying, "strikePrices": sorted({r["strikePrice"] for r in rows})},
+        "filtered": {"data": rows[:1], "CE": {"totOI": 1}, "PE": {"totOI": 2}},
+    }, indent=1).encode()
+
+
+ROWS = [
+    _row(25050, NEAR, ce=80.0, pe=110.0),
+    _row(24950, NEAR, ce=140.0, pe=70.0),
+    _row(25000, NEAR, ce=105.0),
+    _row(25000, FAR, ce=190.0, pe=160.0),
+]
+
+
+BACKENDS = pytest.mark.parametrize("backend", ["orjson", "stdlib"])
+
+
+def _use(backend, monkeypatch):
+    if backend == "orjson":
+        pytest.importorskip("orjson")
+    else:
+        monkeypatch.setattr(nse_payload, "orjson", None)
+
+
+@BACKENDS
+def test_decode_chain_nearest_expiry_sorted_by_strike(backend, monkeypatch):
+    _use(backend, monkeypatch)
+    out = decode_chain(_body(ROWS))
+    assert out["expiryDates"] == [NEAR, FAR]
+    assert list(out["chains"]) == [NEAR]
+    chain = out["chains"][NEAR]
+    assert chain["strike"].tolist() == [24950, 25000, 25050]
+    assert chain["CE_lastPrice"].tolist() == [140.0, 105.0, 80.0]
+    assert np.isnan(chain["PE_lastPrice"][1])  # missing leg reads NaN
+
+
+@BACKENDS
+def test_decode_chain_underlying_comes_from_records_not_a_row(backend, monkeypatch):
+    _use(backend, monkeypatch)
+    assert decode_chain(_body(ROWS))["underlyingValue"] == 25012.3
+
+
+@BACKENDS
+def test_decode_chain_underlying_before_data(backend, monkeypatch):
+    _use(backend, monkeypatch)
+    raw = json.dumps({"records": {"underlyingValue": 25100.0, "expiryDates": [NEAR], "data": ROWS[:1]}}).encode()
+    assert decode_chain(raw)["underlyingValue"] == 25100.0
+
+
+@BACKENDS
+def test_decode_chain_all_expiries_and_fields(backend, monkeypatch):
+    _use(backend, monkeypatch)
+    out = decode_chain(_body(ROWS), expiries=None, fields=("openInterest",))
+    assert list(out["chains"]) == [NEAR, FAR]
+    assert set(out["chains"][FAR]) == {"strike", "CE_openInterest", "PE_openInterest"}
+    assert out["chains"][FAR]["PE_openInterest"].tolist() == [200.0]
+
+
+def test_decode_chain_backends_agree(monkeypatch):
+    pytest.importorskip("orjson")
+    raw = _body(ROWS)
+    fast = decode_chain(raw, expiries=None)
+    monkeypatch.setattr(nse_payload, "orjson", None)
+    slow = decode_chain(raw, expiries=None)
+    assert fast["underlyingValue"] == slow["underlyingValue"]
+    for expiry, chain in fast["chains"].items():
+        for name, values in chain.items():
+            np.testing.assert_array_equal(values, slow["chains"][expiry][name])
+
+
+def test_make_payload_reads_timestamp_without_decoding():
+    payload = make_payload(_body(ROWS))
+    assert payload.timestamp == "19-Oct-2026 10:00:00"
+    assert payload._data is None
+    assert payload.fingerprint.startswith("19-Oct-2026 10:00:00|")
+
+
+def test_fingerprint_changes_with_body():
+    a = make_payload(_body(ROWS))
+    assert make_payload(_body(ROWS)).fingerprint == a.fingerprint
+    assert make_payload(_body(ROWS, underlying=25013.0)).fingerprint != a.fingerprint
+
+
+def test_is_new_payload_once_per_fingerprint_and_key():
+    payload = make_payload(_body(ROWS, timestamp="19-Oct-2026 10:00:03"))
+    assert is_new_payload("tests.a", payload)
+    assert not is_new_payload("tests.a", payload)
+    assert is_new_payload("tests.b", payload)
+    assert is_new_payload("tests.a", make_payload(_body(ROWS, timestamp="19-Oct-2026 10:00:06")))
+
+
+def test_exchange_time_localizes():
+    from market_calendar import IST
+    stamp = make_payload(_body(ROWS)).exchange_time(IST)
+    assert stamp.utcoffset().total_seconds() == 5.5 * 3600
+    pytz = pytest.importorskip("pytz")
+    stamp = make_payload(_body(ROWS)).exchange_time(pytz.timezone("Asia/Kolkata"))
+    assert stamp.utcoffset().total_seconds() == 5.5 * 3600
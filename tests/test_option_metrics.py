@@ -0,0 +1,86 @@
+import numpy as np
+import pytest
+
+from option_metrics import atm_oi_table, atm_strikes, chain_window, strike_premiums, strike_window
+
+STRIKES = list(range(24500, 25550, 50))  # 24500 … 25500
+
+
+def _nearest(strikes, underlying, n):
+    """Reference: the n strikes closest to `underlying` (ties to the lower strike), sorted."""
+    return sorted(sorted(strikes, key=lambda s: (abs(s - underlying), s))[:n])
+
+
+@pytest.mark.parametrize("underlying", [24012.0, 24500.0, 24523.0, 25000.0, 25024.9, 25025.0, 25049.0, 25500.0, 26000.0])
+@pytest.mark.parametrize("n", [1, 5, 11, 21, 40])
+def test_strike_window_matches_nearest(underlying, n):
+    lo, hi = strike_window(STRIKES, underlying, n)
+    assert STRIKES[lo:hi] == _nearest(STRIKES, underlying, n)
+
+
+def test_strike_window_centered_on_atm():
+    lo, hi = strike_window(STRIKES, 25010.0, 5)
+    assert STRIKES[lo:hi] == [24900, 24950, 25000, 25050, 25100]
+
+
+def test_strike_window_at_edges_grows_inwards():
+    assert strike_window(STRIKES, 24000.0, 3) == (0, 3)
+    assert strike_window(STRIKES, 26000.0, 3) == (len(STRIKES) - 3, len(STRIKES))
+
+
+def test_strike_window_short_or_empty_chain():
+    assert strike_window([25000, 25050], 25010.0, 5) == (0, 2)
+    assert strike_window([], 25010.0, 5) == (0, 0)
+
+
+def test_strike_window_accepts_numpy_strikes():
+    lo, hi = strike_window(np.asarray(STRIKES, dtype=float), 25010.0, 3)
+    assert STRIKES[lo:hi] == [24950, 25000, 25050]
+
+
+def test_atm_strikes_step_grid():
+    assert atm_strikes(25012.3, 5, 50) == [24900, 24950, 25000, 25050, 25100]
+    assert atm_strikes(25030.0, 4, 50) == [24950, 25000, 25050, 25100]
+
+
+def _decoded(underlying=25010.0):
+    strikes = np.asarray(STRIKES, dtype=float)
+    ce_oi = np.arange(len(strikes), dtype=float) * 10
+    ce_oi[STRIKES.index(25050)] = np.nan  # CE leg not quoted
+    return {"underlyingValue": underlying, "chains": {"21-Oct-2026": {
+        "strike": strikes,
+        "CE_openInterest": ce_oi,
+        "PE_openInterest": np.full(len(strikes), 7.0),
+        "CE_changeinOpenInterest": np.ones(len(strikes)),
+        "PE_changeinOpenInterest": np.full(len(strikes), 2.0),
+    }}}
+
+
+def test_chain_window_slices_every_column():
+    chain = _decoded()["chains"]["21-Oct-2026"]
+    atm = chain_window(chain, 25010.0, 3)
+    assert atm["strike"].tolist() == [24950, 25000, 25050]
+    assert all(len(v) == 3 for v in atm.values())
+
+
+def test_atm_oi_table_missing_leg():
+    df = atm_oi_table(_decoded(), 5)
+    assert df["strike"].tolist() == [24900, 24950, 25000, 25050, 25100]
+    assert df.loc[df["strike"] == 25050, "CE_OI"].item() == 0  # missing leg reads 0
+    paired = atm_oi_table(_decoded(), 5, paired=True)
+    assert 25050 not in paired["strike"].tolist()
+    assert len(paired) == 5
+    assert paired["diff"].tolist() == [abs(s - 25010.0) for s in paired["strike"]]
+
+
+def test_strike_premiums_nearest_expiry():
+    decoded = _decoded()
+    chain = decoded["chains"]["21-Oct-2026"]
+    chain["CE_lastPrice"] = chain["strike"] / 100
+    chain["PE_lastPrice"] = np.full(len(STRIKES), 5.0)
+    chain["PE_lastPrice"][STRIKES.index(25100)] = np.nan  # PE leg not quoted
+    assert strike_premiums(decoded, 25000) == (250.0, 5.0)
+    assert strike_premiums(decoded, 25100) == (251.0, None)
+    assert strike_premiums(decoded, 25025) == (None, None)  # off the strike grid
+    assert strike_premiums(decoded, 30000) == (None, None)
+    assert strike_premiums({"underlyingValue": None, "chains": {}}, 25000) == (None, None)
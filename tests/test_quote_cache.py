@@ -0,0 +1,60 @@
+import threading
+import time
+
+import pytest
+
+from nse_client import cached_quote, quote_info
+
+
+def _loader(values):
+    calls = []
+
+    def load():
+        calls.append(threading.get_ident())
+        value = values[len(calls) - 1]
+        if isinstance(value, Exception):
+            raise value
+        return value
+    return load, calls
+
+
+def _age(source, key, seconds):
+    entry = quote_info(source, key)
+    entry.fetched -= seconds
+    entry.checked -= seconds
+    return entry
+
+
+def test_display_callers_get_last_good_value_while_refresh_fails():
+    load, calls = _loader([1, ConnectionError("blocked")] * 3)
+    assert cached_quote("nse_index", "tests.display", load).value == 1
+    _age("nse_index", "tests.display", 600)
+    entry = cached_quote("nse_index", "tests.display", load)  # served at once, refreshed behind
+    assert entry.value == 1
+    deadline = time.monotonic() + 2  # the background refresh records its failure
+    while quote_info("nse_index", "tests.display").error is None:
+        assert time.monotonic() < deadline
+        time.sleep(0.005)
+    assert quote_info("nse_index", "tests.display").error.startswith("ConnectionError")
+    assert entry.stale
+
+
+def test_max_age_reloads_an_old_entry_in_the_foreground():
+    load, calls = _loader([1, 2])
+    assert cached_quote("nse_index", "tests.fresh", load, max_age=30).value == 1
+    assert cached_quote("nse_index", "tests.fresh", load, max_age=30).value == 1  # young enough
+    _age("nse_index", "tests.fresh", 60)
+    assert cached_quote("nse_index", "tests.fresh", load, max_age=30).value == 2
+    assert calls[-1] == threading.get_ident()
+
+
+def test_max_age_raises_instead_of_serving_a_frozen_value():
+    load, calls = _loader([1, ConnectionError("blocked"), ConnectionError("blocked"), 3])
+    cached_quote("nse_index", "tests.frozen", load)
+    _age("nse_index", "tests.frozen", 60)
+    with pytest.raises(ConnectionError):
+        cached_quote("nse_index", "tests.frozen", load, max_age=30)
+    assert cached_quote("nse_index", "tests.frozen", load).value == 1  # the banner still has it
+    with pytest.raises(ConnectionError):
+        cached_quote("nse_index", "tests.frozen", load, max_age=30)  # retried, not cached as good
+    assert cached_quote("nse_index", "tests.frozen", load, max_age=30).value == 3
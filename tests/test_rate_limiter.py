@@ -0,0 +1,144 @@
+import threading
+import time
+
+import pytest
+
+import nse_client
+from nse_client import RateLimited, RateLimiter, TokenBucket
+
+LIMITS = {"chain": (50.0, 5, 0), "index": (50.0, 5, 1), "constituents": (50.0, 5, 1),
+          "stock": (50.0, 5, 2), "slow": (0.01, 1, 0)}
+
+
+def _limiter(host_rate=5.0, host_burst=1):
+    return RateLimiter(LIMITS, {"nse": (host_rate, host_burst)})
+
+
+def _acquire_in_thread(limiter, endpoint, done, **kw):
+    def run():
+        limiter.acquire(endpoint, "nse", **kw)
+        done.append(endpoint)
+    t = threading.Thread(target=run, daemon=True)
+    t.start()
+    return t
+
+
+def _wait_queued(limiter, n, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while limiter.state()["queued"] < n:
+        assert time.monotonic() < deadline, "waiters never queued"
+        time.sleep(0.005)
+
+
+def test_token_bucket_refills_up_to_burst():
+    bucket = TokenBucket(rate=10.0, burst=2)
+    now = bucket.stamp
+    assert bucket.delay(now) == 0
+    bucket.take()
+    bucket.take()
+    assert bucket.delay(now) == pytest.approx(0.1)
+    assert bucket.delay(now + 0.05) == pytest.approx(0.05)
+    assert bucket.delay(now + 10) == 0
+    assert bucket.tokens == 2  # capped at burst
+
+
+def test_burst_is_free_then_host_rate_applies():
+    limiter = _limiter(host_rate=10.0, host_burst=2)
+    assert limiter.acquire("chain", "nse") < 0.01
+    assert limiter.acquire("chain", "nse") < 0.01
+    assert limiter.acquire("chain", "nse") == pytest.approx(0.1, abs=0.06)
+
+
+def test_waiters_are_served_by_priority():
+    limiter = _limiter()
+    limiter.acquire("stock", "nse")  # host bucket now empty for ~0.2s
+    done = []
+    threads = [_acquire_in_thread(limiter, "stock", done)]
+    _wait_queued(limiter, 1)
+    threads.append(_acquire_in_thread(limiter, "index", done))
+    _wait_queued(limiter, 2)
+    threads.append(_acquire_in_thread(limiter, "chain", done))
+    _wait_queued(limiter, 3)
+    for t in threads:
+        t.join(3)
+    assert done == ["chain", "index", "stock"]
+
+
+def test_same_priority_in_arrival_order():
+    limiter = _limiter()
+    limiter.acquire("index", "nse")
+    done = []
+    first = _acquire_in_thread(limiter, "constituents", done)
+    _wait_queued(limiter, 1)
+    second = _acquire_in_thread(limiter, "index", done)
+    _wait_queued(limiter, 2)
+    first.join(3)
+    second.join(3)
+    assert done == ["constituents", "index"]
+
+
+def test_exhausted_endpoint_does_not_block_others():
+    limiter = _limiter(host_rate=50.0, host_burst=5)
+    limiter.acquire("slow", "nse")  # its own bucket is empty for ~100s
+    done = []
+    _acquire_in_thread(limiter, "slow", done, timeout=1.0)
+    _wait_queued(limiter, 1)
+    assert limiter.acquire("stock", "nse", timeout=0.5) < 0.1  # not stuck behind the higher-priority waiter
+    assert done == []
+
+
+def test_queue_timeout_raises():
+    limiter = _limiter()
+    limiter.acquire("slow", "nse")
+    with pytest.raises(RateLimited):
+        limiter.acquire("slow", "nse", timeout=0.1)
+    assert limiter.state()["queued"] == 0
+
+
+def test_penalty_doubles_and_resets(monkeypatch):
+    monkeypatch.setattr(nse_client, "BLOCK_COOLDOWN", (15, 40))
+    limiter = _limiter()
+    limiter.penalize("nse")
+    assert limiter.state()["hosts"]["nse"]["blocked_for"] == pytest.approx(15, abs=0.2)
+    limiter.penalize("nse")
+    assert limiter.state()["hosts"]["nse"]["blocked_for"] == pytest.approx(30, abs=0.2)
+    limiter.penalize("nse")
+    assert limiter.state()["hosts"]["nse"]["blocked_for"] == pytest.approx(40, abs=0.2)  # capped
+    limiter.succeeded("nse")
+    limiter.penalize("nse")
+    assert limiter.state()["hosts"]["nse"]["blocked_for"] == pytest.approx(15, abs=0.2)
+
+
+def test_penalty_pauses_every_endpoint_on_the_host(monkeypatch):
+    monkeypatch.setattr(nse_client, "BLOCK_COOLDOWN", (0.3, 1))
+    limiter = _limiter(host_rate=50.0, host_burst=5)
+    start = time.monotonic()
+    limiter.penalize("nse")
+    with pytest.raises(RateLimited):
+        limiter.acquire("chain", "nse", timeout=0.1)
+    limiter.acquire("chain", "nse", timeout=2)
+    assert time.monotonic() - start == pytest.approx(0.3, abs=0.1)
+
+
+class _Impatient(RateLimiter):
+    def acquire(self, endpoint, host, timeout=0.1):
+        return super().acquire(endpoint, host, timeout)
+
+
+def test_session_warmup_goes_through_the_limiter(monkeypatch):
+    limiter = _Impatient({"home": (0.01, 1, 0)}, {"nse": (50.0, 5)})
+    calls = []
+    monkeypatch.setattr(nse_client, "limiter", limiter)
+    monkeypatch.setattr(nse_client.requests.Session, "get", lambda self, url, **kw: calls.append(url))
+    nse_client.reset_session()
+    try:
+        nse_client.get_session()
+        assert calls == [nse_client.NSE_HOME]
+        assert limiter.state()["endpoints"]["home"] == pytest.approx(0, abs=0.01)
+
+        # No budget left: the warm-up is skipped, not sent past the limiter
+        nse_client.reset_session()
+        assert nse_client.get_session() is not None
+        assert calls == [nse_client.NSE_HOME]
+    finally:
+        nse_client.reset_session()
@@ -0,0 +1,112 @@
+import math
+
+import numpy as np
+import pytest
+
+from scenarios import Leg, bs_price, breakevens, expiry_payoff, norm_cdf, scenario_grid, strategy_spec
+
+
+def _cdf(x):
+    return 0.5 * (1 + math.erf(x / math.sqrt(2)))
+
+
+def _bs_put(spot, strike, years, vol, rate):
+    """Textbook put formula, independent of bs_price's parity shortcut."""
+    d1 = (math.log(spot / strike) + (rate + vol * vol / 2) * years) / (vol * math.sqrt(years))
+    d2 = d1 - vol * math.sqrt(years)
+    return strike * math.exp(-rate * years) * _cdf(-d2) - spot * _cdf(-d1)
+
+
+# -------------------------------------------------
+# Normal CDF
+# -------------------------------------------------
+def test_norm_cdf_matches_erf():
+    x = np.linspace(-6, 6, 2001)
+    assert np.max(np.abs(norm_cdf(x) - [_cdf(v) for v in x])) < 1.5e-7
+
+
+def test_norm_cdf_scalar_and_symmetry():
+    assert norm_cdf(0.0) == pytest.approx(0.5, abs=1e-7)
+    assert np.ndim(norm_cdf(1.0)) == 0
+    assert norm_cdf(1.96) == pytest.approx(0.9750021, abs=1e-6)
+    assert norm_cdf(-1.3) + norm_cdf(1.3) == pytest.approx(1.0, abs=1e-7)
+
+
+def test_norm_cdf_leaves_input_untouched():
+    x = np.array([-1.0, 0.5, 2.0])
+    norm_cdf(x)
+    assert x.tolist() == [-1.0, 0.5, 2.0]
+
+
+# -------------------------------------------------
+# Black-Scholes
+# -------------------------------------------------
+@pytest.mark.parametrize("spot, strike, years, vol, rate, call, put", [
+    (100.0, 100.0, 1.0, 0.20, 0.05, 10.4506, 5.5735),   # standard reference case
+    (42.0, 40.0, 0.5, 0.20, 0.10, 4.7594, 0.8086),      # Hull, Options, Futures and Other Derivatives
+])
+def test_bs_price_known_values(spot, strike, years, vol, rate, call, put):
+    assert bs_price("CE", spot, strike, years, vol, rate) == pytest.approx(call, abs=1e-3 * max(call, 1) + 5e-4)
+    assert bs_price("PE", spot, strike, years, vol, rate) == pytest.approx(put, abs=1e-3 * max(put, 1) + 5e-4)
+
+
+def test_put_matches_textbook_formula():
+    for spot in (24000.0, 25000.0, 26000.0):
+        for years in (1 / 365, 0.1, 0.5):
+            for vol in (0.08, 0.15, 0.4):
+                assert bs_price("PE", spot, 25000.0, years, vol, 0.065) == \
+                    pytest.approx(_bs_put(spot, 25000.0, years, vol, 0.065), rel=1e-5, abs=1e-3)
+
+
+def test_put_call_parity_over_a_grid():
+    spot = np.linspace(22000, 28000, 61)[:, None, None]
+    years = np.array([1, 7, 30, 90]) / 365.0
+    years = years[None, :, None]
+    vol = np.array([0.08, 0.15, 0.3])[None, None, :]
+    strike, rate = 25000.0, 0.065
+    call = bs_price("CE", spot, strike, years, vol, rate)
+    put = bs_price("PE", spot, strike, years, vol, rate)
+    assert call.shape == put.shape == (61, 4, 3)
+    np.testing.assert_allclose(call - put, spot - strike * np.exp(-rate * years) + 0 * vol, atol=1e-6)
+
+
+def test_expired_options_are_intrinsic():
+    spot = np.array([24900.0, 25000.0, 25100.0])
+    assert bs_price("CE", spot, 25000.0, np.zeros(3), 0.15).tolist() == [0.0, 0.0, 100.0]
+    assert bs_price("PE", spot, 25000.0, np.zeros(3), 0.15).tolist() == [100.0, 0.0, 0.0]
+
+
+def test_price_increases_with_vol_and_time():
+    vols = np.linspace(0.05, 0.6, 12)
+    assert np.all(np.diff(bs_price("CE", 25000.0, 25000.0, 0.1, vols)) > 0)
+    years = np.linspace(0.01, 1, 12)
+    assert np.all(np.diff(bs_price("PE", 25000.0, 25000.0, years, 0.15)) > 0)
+
+
+# -------------------------------------------------
+# Position grid
+# -------------------------------------------------
+def test_scenario_grid_is_flat_at_entry_and_matches_expiry_payoff():
+    days, iv, spot = 7.0, 15.0, 25000.0
+    ce = float(bs_price("CE", spot, 25000.0, days / 365, iv / 100))
+    pe = float(bs_price("PE", spot, 25000.0, days / 365, iv / 100))
+    legs = [Leg("CE", 25000.0, -1, ce, iv, days), Leg("PE", 25000.0, -1, pe, iv, days)]
+    spots = np.linspace(24000, 26000, 401)
+    pnl = scenario_grid(legs, spots, [0.0, days], [-5.0, 0.0, 5.0], lot_size=75)
+    assert pnl.shape == (401, 2, 3) and pnl.dtype == np.float32
+    assert pnl[200, 0, 1] == pytest.approx(0, abs=1.0)               # entry: nothing moved
+    assert pnl[200, 0, 0] > 0 > pnl[200, 0, 2]                        # short vol gains on an IV drop
+    np.testing.assert_allclose(pnl[:, 1, 1], expiry_payoff(legs, spots, 75), rtol=1e-5, atol=1.0)
+
+
+def test_expiry_payoff_and_breakevens_long_straddle():
+    legs = [Leg("CE", 25000.0, 1, 150.0, 15.0, 7.0), Leg("PE", 25000.0, 1, 140.0, 15.0, 7.0)]
+    spots = np.linspace(24000, 26000, 2001)
+    pnl = expiry_payoff(legs, spots, lot_size=1)
+    assert pnl.min() == pytest.approx(-290.0)
+    np.testing.assert_allclose(breakevens(spots, pnl), [24710.0, 25290.0])
+
+
+def test_strategy_spec_offsets_by_step():
+    assert strategy_spec("Iron Condor", 25000, 50) == [("CE", 25100, -1), ("CE", 25200, 1),
+                                                      ("PE", 24900, -1), ("PE", 24800, 1)]